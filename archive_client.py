@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Browserless client for the examinations.ie material archive
+Replays the archive form postbacks with requests and parses the returned
+dropdowns and download rows, with Selenium available as a fallback backend
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import requests
+import http_session
+import metrics
+from cascade_wait import CASCADE
+from cascade_walker import CascadeWalker
+
+BACKENDS = ('auto', 'http', 'selenium')
+
+# Tags that start a new line in the visible text of a cell or link
+_BLOCK_TAGS = {'br', 'p', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+class ArchiveClientError(Exception):
+    """The archive page could not be navigated over plain HTTP"""
+
+
+class OptionNotOffered(ArchiveClientError):
+    """A dropdown is populated but does not offer the requested value"""
+
+
+def _visible_text(parts):
+    """Join collected text fragments the way a browser would render them"""
+    lines = ''.join(parts).split('\n')
+    lines = [re.sub(r'\s+', ' ', line).strip() for line in lines]
+    return '\n'.join(line for line in lines if line)
+
+
+class _Form:
+    def __init__(self, attrs):
+        self.action = attrs.get('action') or ''
+        self.method = (attrs.get('method') or 'get').lower()
+        self.inputs = []    # dicts of input attributes
+        self.selects = []   # select ids/names, in document order
+
+
+class _Select:
+    def __init__(self, attrs, form):
+        self.id = attrs.get('id')
+        self.name = attrs.get('name')
+        self.form = form
+        self.options = []   # (value, text, selected)
+
+
+class ArchivePageParser(HTMLParser):
+    """Collects forms, dropdowns, links and table rows from an archive page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self.selects = {}
+        self.anchors = []   # {'href', 'text'}
+        self.rows = []      # {'cells': [{'text', 'href'}], 'fileid', 'depth'}
+
+        self._form = None
+        self._select = None
+        self._option = None
+        self._anchor_stack = []
+        self._row_stack = []
+        self._cell = None
+        self._table_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v if v is not None else '') for k, v in attrs}
+
+        if tag == 'form':
+            self._form = _Form(attrs)
+            self.forms.append(self._form)
+        elif tag == 'select':
+            self._select = _Select(attrs, self._form)
+            key = self._select.id or self._select.name
+            if key:
+                self.selects[key] = self._select
+                if self._form is not None:
+                    self._form.selects.append(key)
+        elif tag == 'option' and self._select is not None:
+            self._option = {'value': attrs.get('value'), 'selected': 'selected' in attrs,
+                            'text': []}
+        elif tag == 'input':
+            if self._form is not None:
+                self._form.inputs.append(attrs)
+            if (self._row_stack and attrs.get('type', '').lower() == 'hidden'
+                    and attrs.get('name') == 'fileid'
+                    and self._row_stack[-1]['fileid'] is None):
+                self._row_stack[-1]['fileid'] = attrs.get('value', '')
+        elif tag == 'a':
+            anchor = {'href': attrs.get('href'), 'text': []}
+            self._anchor_stack.append(anchor)
+            self.anchors.append(anchor)
+            if self._cell is not None and self._cell['href'] is None:
+                self._cell['href'] = attrs.get('href')
+        elif tag == 'table':
+            self._table_depth += 1
+        elif tag == 'tr':
+            # </tr> is optional; a new row in the same table closes the open one
+            if self._row_stack and self._row_stack[-1]['depth'] == self._table_depth:
+                self.rows.append(self._row_stack.pop())
+            self._row_stack.append({'cells': [], 'fileid': None,
+                                    'depth': self._table_depth})
+        elif tag == 'td' and self._row_stack:
+            self._cell = {'text': [], 'href': None}
+            self._row_stack[-1]['cells'].append(self._cell)
+
+        if tag in _BLOCK_TAGS:
+            self._add_text('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self._form = None
+        elif tag == 'select':
+            self._finish_option()
+            self._select = None
+        elif tag == 'option':
+            self._finish_option()
+        elif tag == 'a' and self._anchor_stack:
+            self._anchor_stack.pop()
+        elif tag == 'td':
+            self._cell = None
+        elif tag == 'tr' and self._row_stack:
+            self.rows.append(self._row_stack.pop())
+            self._cell = None
+        elif tag == 'table':
+            while self._row_stack and self._row_stack[-1]['depth'] == self._table_depth:
+                self.rows.append(self._row_stack.pop())
+            self._cell = None
+            self._table_depth = max(self._table_depth - 1, 0)
+
+        if tag in _BLOCK_TAGS:
+            self._add_text('\n')
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option['text'].append(data)
+        self._add_text(data)
+
+    def _add_text(self, data):
+        for anchor in self._anchor_stack:
+            anchor['text'].append(data)
+        if self._cell is not None:
+            self._cell['text'].append(data)
+
+    def _finish_option(self):
+        if self._option is None or self._select is None:
+            self._option = None
+            return
+        text = _visible_text(self._option['text'])
+        value = self._option['value']
+        if value is None:
+            value = text
+        self._select.options.append((value, text, self._option['selected']))
+        self._option = None
+
+
+class ArchivePage:
+    """Parsed snapshot of one archive page"""
+
+    def __init__(self, html, url):
+        self.url = url
+        parser = ArchivePageParser()
+        parser.feed(html)
+        parser.close()
+        self.parser = parser
+        self.form = self._find_form()
+
+    def _find_form(self):
+        for form in self.parser.forms:
+            if any(key in form.selects for key in CASCADE):
+                return form
+        return self.parser.forms[0] if self.parser.forms else None
+
+    def get_options(self, select_id):
+        """Options with a value as (value, text), like get_dropdown_options"""
+        select = self.parser.selects.get(select_id)
+        if select is None:
+            return []
+        return [(value, text) for value, text, _ in select.options if value]
+
+    def selected_value(self, select_id):
+        select = self.parser.selects.get(select_id)
+        if select is None or not select.options:
+            return None
+        for value, _, selected in select.options:
+            if selected:
+                return value
+        return select.options[0][0]
+
+    def find_pdf_links(self):
+        """Same dicts as exam_scraper.find_pdf_links, from the HTML alone"""
+        pdf_links = []
+
+        # First try: links with .pdf in the URL
+        for anchor in self.parser.anchors:
+            href = anchor['href']
+            if href and href.lower().endswith('.pdf'):
+                pdf_links.append({
+                    'url': urljoin(self.url, href),
+                    'text': _visible_text(anchor['text'])
+                })
+
+        # Second try: exam material download rows (with ?fp= parameter)
+        if not pdf_links:
+            for row in self.parser.rows:
+                cells = row['cells']
+                if len(cells) < 2:
+                    continue
+                desc = _visible_text(cells[0]['text'])
+                href = cells[1]['href']
+                if href and '?fp=' in href and desc:
+                    pdf_links.append({
+                        'url': urljoin(self.url, href),
+                        'text': desc,
+                        'filename_hint': row['fileid']
+                    })
+
+        return pdf_links
+
+    def form_fields(self, overrides=None):
+        """
+        Name/value pairs the browser would post for the archive form
+
+        Args:
+            overrides: Dict of select id or name -> value to set
+        """
+        if self.form is None:
+            raise ArchiveClientError("No form found on the archive page")
+        overrides = overrides or {}
+
+        fields = []
+        checkbox_seen = False
+        for attrs in self.form.inputs:
+            name = attrs.get('name')
+            kind = attrs.get('type', 'text').lower()
+            if not name or kind in ('submit', 'button', 'image', 'reset', 'file'):
+                continue
+            if kind == 'checkbox':
+                # The first checkbox is the terms and conditions box; always accept it
+                if not checkbox_seen or 'checked' in attrs:
+                    fields.append((name, attrs.get('value') or 'on'))
+                checkbox_seen = True
+                continue
+            if kind == 'radio' and 'checked' not in attrs:
+                continue
+            fields.append((name, attrs.get('value', '')))
+
+        for key in self.form.selects:
+            select = self.parser.selects[key]
+            if not select.name:
+                continue
+            if select.id in overrides:
+                value = overrides[select.id]
+            elif select.name in overrides:
+                value = overrides[select.name]
+            else:
+                value = self.selected_value(key)
+            if value is not None:
+                fields.append((select.name, value))
+
+        return fields
+
+
+class ArchiveClient:
+    """
+    Navigates the archive form over plain HTTP
+
+    Each dropdown change is replayed as a form postback. The pages of the
+    current selection chain are kept (one per cascade depth), so walking
+    many subjects of one year only posts the subject step again, while a
+    full crawl holds a handful of pages rather than every one it visited.
+    """
+
+    def __init__(self, base_url, http=None, timeout=30):
+        """
+        Args:
+            base_url: URL to the exam archive page
+            http: requests.Session to use (default: the shared pooled session)
+            timeout: Seconds before a page request is abandoned
+        """
+        self.base_url = base_url
+        self.http = http or http_session.get_session()
+        self.timeout = timeout
+        self._pages = {}
+        self.requests_made = 0
+
+    def load(self):
+        """Fetch the archive page with nothing selected"""
+        if () not in self._pages:
+            with metrics.phase('archive_request'):
+                response = self.http.get(self.base_url, timeout=self.timeout)
+            self.requests_made += 1
+            metrics.count('archive_requests')
+            response.raise_for_status()
+            self._pages[()] = ArchivePage(response.text, response.url)
+        return self._pages[()]
+
+    def select(self, selections):
+        """
+        Apply dropdown selections in order and return the resulting page
+
+        Args:
+            selections: Dict mapping select id (or name) to value, in cascade order
+        """
+        page = self.load()
+        prefix = ()
+        for select_id, value in selections.items():
+            value = str(value)
+            prefix = prefix + ((select_id, value),)
+            if prefix in self._pages:
+                page = self._pages[prefix]
+                continue
+
+            if select_id not in page.parser.selects:
+                raise ArchiveClientError(f"Dropdown {select_id} not found on the archive page")
+            offered = [v for v, _ in page.get_options(select_id)]
+            if not offered:
+                raise ArchiveClientError(f"Dropdown {select_id} has no options over HTTP")
+            if value not in offered:
+                raise OptionNotOffered(f"'{value}' is not offered in {select_id}")
+
+            page = self._post(page, select_id, value)
+            # Pages off this chain belong to earlier selections; drop them
+            self._pages = {key: kept for key, kept in self._pages.items()
+                           if prefix[:len(key)] == key}
+            self._pages[prefix] = page
+
+        return page
+
+    def _post(self, page, select_id, value):
+        select = page.parser.selects[select_id]
+        fields = page.form_fields({select_id: value})
+
+        # WebForms pages post back through __EVENTTARGET
+        fields = [(name, select.name if name == '__EVENTTARGET' else v)
+                  for name, v in fields]
+
+        action = urljoin(page.url, page.form.action or page.url)
+        with metrics.phase('archive_request', select=select_id, value=value):
+            if page.form.method == 'post':
+                response = self.http.post(action, data=fields, timeout=self.timeout)
+            else:
+                response = self.http.get(action, params=fields, timeout=self.timeout)
+        self.requests_made += 1
+        metrics.count('archive_requests')
+        response.raise_for_status()
+        return ArchivePage(response.text, response.url)
+
+    def get_options(self, selections, select_id):
+        """Options of select_id after applying selections"""
+        return self.select(selections).get_options(select_id)
+
+    def find_pdf_links(self, selections):
+        """PDF links listed after applying selections"""
+        return self.select(selections).find_pdf_links()
+
+    def close(self):
+        self._pages.clear()
+
+
+class BrowserArchive:
+    """Selenium backend with the same interface as ArchiveClient"""
+
+    def __init__(self, base_url, session):
+        """
+        Args:
+            base_url: URL to the exam archive page
+            session: BrowserSession providing the driver
+        """
+        self.base_url = base_url
+        self.session = session
+        self.walker = CascadeWalker(base_url, session)
+
+    def _navigate(self, selections):
+        # Only the dropdowns that differ from the page's are changed
+        return self.walker.goto(selections)
+
+    def get_options(self, selections, select_id):
+        from selenium.webdriver.common.by import By
+        from exam_scraper import get_dropdown_options
+
+        driver = self._navigate(selections)
+        return get_dropdown_options(driver.find_element(By.ID, select_id))
+
+    def find_pdf_links(self, selections):
+        from exam_scraper import find_pdf_links
+
+        return find_pdf_links(self._navigate(selections))
+
+    def close(self):
+        if self.walker.from_scratch:
+            print(f"✓ Cascade: {self.walker.describe_stats()}")
+
+
+class FallbackArchive:
+    """Uses the HTTP client and switches to the browser if it fails"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.base_url = primary.base_url
+        self.failed = False
+
+    def _call(self, method, *args):
+        if not self.failed:
+            try:
+                return getattr(self.primary, method)(*args)
+            except OptionNotOffered:
+                # A real answer from the archive, not an HTTP failure
+                raise
+            except (ArchiveClientError, requests.RequestException) as e:
+                print(f"⚠ HTTP discovery failed ({e}), falling back to the browser")
+                self.failed = True
+        return getattr(self.fallback, method)(*args)
+
+    def get_options(self, selections, select_id):
+        return self._call('get_options', selections, select_id)
+
+    def find_pdf_links(self, selections):
+        return self._call('find_pdf_links', selections)
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+def open_archive(backend, base_url, session):
+    """
+    Build the discovery backend
+
+    Args:
+        backend: 'http', 'selenium' or 'auto' (HTTP with Selenium fallback)
+        base_url: URL to the exam archive page
+        session: BrowserSession for the Selenium backend (started only if used)
+    """
+    if backend == 'http':
+        return ArchiveClient(base_url)
+    if backend == 'selenium':
+        return BrowserArchive(base_url, session)
+    if backend == 'auto':
+        return FallbackArchive(ArchiveClient(base_url), BrowserArchive(base_url, session))
+    raise ValueError(f"Unknown backend: {backend}")
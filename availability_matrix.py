@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Availability matrix of the material archive
+One pass over every year and examination records which subjects (and
+optionally which material types) exist, so subject queries need no crawl
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+DEFAULT_PATH = Path.home() / '.cache' / 'exam-scraper' / 'availability.json'
+
+MATERIAL_TYPES = ['exampapers', 'markingschemes', 'deferredexams', 'deferredmarkingschemes']
+
+# Filename prefix of each material type when several share one folder;
+# papers keep their usual names
+TYPE_TAGS = {
+    'exampapers': '',
+    'markingschemes': 'MarkingScheme',
+    'deferredexams': 'Deferred',
+    'deferredmarkingschemes': 'DeferredMarkingScheme',
+}
+
+
+def material_types_arg(value):
+    """argparse type for --type: one material type, a comma-separated list, or 'all'"""
+    if value.lower() == 'all':
+        return list(MATERIAL_TYPES)
+    types = [t.strip() for t in value.split(',') if t.strip()]
+    unknown = [t for t in types if t not in MATERIAL_TYPES]
+    if unknown or not types:
+        raise argparse.ArgumentTypeError(
+            f"unknown material type '{', '.join(unknown)}' "
+            f"(choose from {', '.join(MATERIAL_TYPES)}, or all)")
+    return list(dict.fromkeys(types))
+
+
+class AvailabilityMatrix:
+    """Subjects offered per (material type, year, examination)"""
+
+    def __init__(self, crawled_at=None, url=None):
+        self.cells = {}  # (material_type, year, cert) -> [(value, text)]
+        self.crawled_at = crawled_at
+        self.url = url  # archive page the matrix was crawled from
+
+    def add(self, material_type, year, cert, subjects):
+        self.cells[(material_type, str(year), cert)] = [tuple(s) for s in subjects]
+
+    @property
+    def material_types(self):
+        return sorted({t for t, _, _ in self.cells})
+
+    def years(self, material_type='exampapers'):
+        return sorted({y for t, y, _ in self.cells if t == material_type})
+
+    def certs_for(self, year, material_type='exampapers'):
+        return sorted(c for t, y, c in self.cells if t == material_type and y == str(year))
+
+    def subjects_for(self, cert, year, material_type='exampapers'):
+        return self.cells.get((material_type, str(year), cert), [])
+
+    def matching_subjects(self, cert, year, subject_name, material_type='exampapers'):
+        """Subjects whose name contains subject_name, as check_availability matches them"""
+        return [s for s in self.subjects_for(cert, year, material_type)
+                if subject_name.lower() in s[1].lower()]
+
+    def years_for(self, cert, subject_name, material_type='exampapers'):
+        """Years in which a matching subject is offered for cert"""
+        return [year for year in self.years(material_type)
+                if self.matching_subjects(cert, year, subject_name, material_type)]
+
+    def save(self, path=DEFAULT_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'url': self.url,
+            'crawled_at': self.crawled_at,
+            'cells': [
+                {'type': t, 'year': y, 'cert': c, 'subjects': subjects}
+                for (t, y, c), subjects in sorted(self.cells.items())
+            ],
+        }
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(json.dumps(data, indent=1))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH, url=None):
+        """
+        Load a saved matrix, or return None if there is none
+
+        Args:
+            path: Matrix file
+            url: Archive page the matrix must have been crawled from; a
+                 matrix of another archive (such as a mock) counts as missing
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        if url is not None and data.get('url') != url:
+            return None
+        matrix = cls(crawled_at=data.get('crawled_at'), url=data.get('url'))
+        for cell in data['cells']:
+            matrix.add(cell['type'], cell['year'], cell['cert'], cell['subjects'])
+        return matrix
+
+
+def crawl_matrix(archive, material_types=('exampapers',)):
+    """
+    Walk YearSelect x ExaminationSelect once per material type
+
+    Args:
+        archive: Discovery backend (see archive_client), ideally cached
+        material_types: ViewType values to record
+
+    Returns:
+        AvailabilityMatrix with every subject list seen
+    """
+    matrix = AvailabilityMatrix(crawled_at=time.time(), url=archive.base_url)
+
+    for material_type in material_types:
+        selections = {VIEW_TYPE_SELECT: material_type}
+        years = [value for value, _ in archive.get_options(selections, YEAR_SELECT)]
+        print(f"{material_type}: {len(years)} year(s)")
+
+        for year in years:
+            year_selections = dict(selections, **{YEAR_SELECT: year})
+            try:
+                certs = [value for value, _ in
+                         archive.get_options(year_selections, EXAMINATION_SELECT)]
+            except Exception as e:
+                print(f"  ✗ {year}: Error - {e}")
+                continue
+
+            counts = []
+            for cert in certs:
+                cert_selections = dict(year_selections, **{EXAMINATION_SELECT: cert})
+                try:
+                    subjects = archive.get_options(cert_selections, SUBJECT_SELECT)
+                except Exception as e:
+                    print(f"  ✗ {year} {cert.upper()}: Error - {e}")
+                    continue
+                matrix.add(material_type, year, cert, subjects)
+                counts.append(f"{cert.upper()} {len(subjects)}")
+
+            print(f"  ✓ {year}: {', '.join(counts) or 'no examinations'}")
+
+    return matrix
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against the local mock archive
+Runs the scrapers and the command line downloaders on mock_archive_server
+and reports wall time, files/s, MB/s and time per phase for each
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import http_session
+from archive_client import ArchiveClient, BrowserArchive
+from browser_session import BrowserSession
+from download_engine import DownloadEngine
+from exam_scraper import ExamScraper
+from download_exams_v2 import EnhancedExamScraper
+from manifest import Manifest
+from mock_archive_server import MockArchiveServer, add_mock_arguments, config_from_args
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+SCENARIOS = ['scrape', 'enhanced', 'all-subjects', 'v2', 'sharded']
+
+HERE = Path(__file__).parent
+
+# Phases reported for each scenario, when recorded
+PHASES = ['browser_start', 'page_load', 'dropdown_wait', 'archive_request', 'list_subjects',
+          'discovery', 'download', 'transfer']
+
+# "✓ Pipeline: discovery 1.2s, downloads finished 3.4s after start, ..."
+_PIPELINE_RE = re.compile(r'Pipeline: discovery ([\d.]+)s, downloads finished ([\d.]+)s')
+
+
+class TimedArchive:
+    """Discovery backend wrapper that adds up the time spent in it"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.seconds = 0.0
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return getattr(self.archive, method)(*args)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def get_options(self, selections, select_id):
+        return self._timed('get_options', selections, select_id)
+
+    def find_pdf_links(self, selections):
+        return self._timed('find_pdf_links', selections)
+
+    def close(self):
+        self.archive.close()
+
+
+class BenchmarkResult:
+    """Outcome of one scenario run"""
+
+    def __init__(self, scenario, wall, files, size, phases=None, error=None):
+        self.scenario = scenario
+        self.wall = wall
+        self.files = files
+        self.bytes = size
+        self.phases = phases or {}
+        self.error = error
+
+    def row(self):
+        mb = self.bytes / (1024 * 1024)
+        files_rate = self.files / self.wall if self.wall > 0 else 0.0
+        mb_rate = mb / self.wall if self.wall > 0 else 0.0
+        phases = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        line = (f"{self.scenario:14s} {self.wall:7.2f}s {self.files:6d} files "
+                f"{files_rate:7.1f} files/s {mb_rate:7.1f} MB/s")
+        if phases:
+            line += f"  ({phases})"
+        if self.error:
+            line += f"  ✗ {self.error}"
+        return line
+
+    def as_dict(self):
+        return {'scenario': self.scenario, 'wall': self.wall, 'files': self.files,
+                'bytes': self.bytes, 'phases': self.phases, 'error': self.error}
+
+
+def count_pdfs(directory):
+    """(number, total bytes) of the PDFs under directory"""
+    files = size = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.lower().endswith('.pdf'):
+                files += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def _subjects(archive, args):
+    selections = {VIEW_TYPE_SELECT: args.type, YEAR_SELECT: args.year, EXAMINATION_SELECT: args.cert}
+    return selections, archive.get_options(selections, SUBJECT_SELECT)
+
+
+def run_scraper(scenario, url, output, args, session):
+    """
+    Scrape every subject of one year and examination in this process
+
+    Args:
+        scenario: 'scrape' (ExamScraper.scrape) or 'enhanced' (EnhancedExamScraper.scrape)
+    """
+    backend = ArchiveClient(url) if args.backend == 'http' else BrowserArchive(url, session)
+    archive = TimedArchive(backend)
+    engine = DownloadEngine(workers=args.workers, per_host=args.per_host, delay=args.delay,
+                            manifest=Manifest(output))
+    start = time.perf_counter()
+    try:
+        selections, subjects = _subjects(archive, args)
+        for value, text in subjects:
+            subject_selections = dict(selections, **{SUBJECT_SELECT: value})
+            if scenario == 'scrape':
+                scraper = ExamScraper(url, str(Path(output) / text), session=session,
+                                      archive=archive, engine=engine)
+            else:
+                scraper = EnhancedExamScraper(url, output, args.year, args.cert, text,
+                                              session=session, archive=archive, engine=engine)
+            scraper.scrape(subject_selections)
+    finally:
+        archive.close()
+        engine.manifest.close()
+    wall = time.perf_counter() - start
+
+    discovery = archive.seconds
+    download = engine.total.elapsed
+    return wall, {'discovery': discovery, 'download': download,
+                  'other': max(0.0, wall - discovery - download)}
+
+
+def cli_command(scenario, url, output, args):
+    """Command line of a downloader scenario"""
+    common = ['--url', url, '--output', output, '--backend', args.backend, '--no-cache',
+              '--workers', str(args.workers), '--per-host', str(args.per_host),
+              '--delay', str(args.delay)]
+    if scenario == 'all-subjects':
+        return [sys.executable, str(HERE / 'download_all_subjects.py'), '--type', args.type,
+                '--year', args.year, '--level', args.cert] + common
+    if scenario == 'v2':
+        return [sys.executable, str(HERE / 'download_exams_v2.py'), '--type', args.type,
+                '--cert', args.cert, '--subject', args.subject, '--year-range', args.year_range] + common
+    if scenario == 'sharded':
+        return [sys.executable, str(HERE / 'sharded.py'), '--type', args.type,
+                '--cert', args.cert, '--year-range', f"{args.year}-{args.year}",
+                '--shards', str(args.shards)] + common
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def run_cli(scenario, url, output, args):
+    """Run a command line downloader in a subprocess and read its phase times"""
+    command = cli_command(scenario, url, output, args)
+    metrics_file = Path(output) / '.metrics.jsonl'
+    if scenario != 'sharded':
+        command += ['--metrics-json', str(metrics_file)]
+    start = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=HERE)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:]
+        raise RuntimeError(f"exit {completed.returncode}: {' '.join(tail)}")
+
+    phases = {}
+    if metrics_file.exists():
+        final = json.loads(metrics_file.read_text().splitlines()[-1])
+        phases = {name: final['phases'][name]['seconds'] for name in PHASES
+                  if name in final['phases']}
+    match = _PIPELINE_RE.search(completed.stdout)
+    if match:
+        # Discovery and downloads run at once; this is when the last download finished
+        phases['pipeline'] = float(match.group(2))
+    return wall, phases
+
+
+def run_scenario(scenario, url, args, session):
+    """Run one scenario into a fresh directory and measure it"""
+    with tempfile.TemporaryDirectory(prefix=f'bench-{scenario}-') as output:
+        try:
+            if scenario in ('scrape', 'enhanced'):
+                # The scrapers print every step; keep the benchmark output readable
+                with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(
+                        sys.stdout if args.verbose else quiet):
+                    wall, phases = run_scraper(scenario, url, output, args, session)
+            else:
+                wall, phases = run_cli(scenario, url, output, args)
+        except Exception as e:
+            files, size = count_pdfs(output)
+            return BenchmarkResult(scenario, 0.0, files, size, error=str(e))
+        files, size = count_pdfs(output)
+    return BenchmarkResult(scenario, wall, files, size, phases)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the scrapers and downloaders against a local mock archive'
+    )
+    parser.add_argument(
+        '--scenarios',
+        default=','.join(SCENARIOS),
+        help=f'Comma-separated scenarios to run (default: {",".join(SCENARIOS)})'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Runs of each scenario (default: 1)'
+    )
+    parser.add_argument(
+        '--url',
+        help='Benchmark an archive that is already running instead of starting the mock'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['http', 'selenium'],
+        default='http',
+        help='Discovery backend for every scenario (default: http)'
+    )
+    parser.add_argument('--type', default='exampapers', help='Material type (default: exampapers)')
+    parser.add_argument('--year', default='2024', help='Year for single-year scenarios (default: 2024)')
+    parser.add_argument('--year-range', default='2015-2024',
+                        help='Years for the v2 scenario (default: 2015-2024)')
+    parser.add_argument('--cert', default='lc', help='Examination (default: lc)')
+    parser.add_argument('--subject', default='Mathematics',
+                        help='Subject for the v2 scenario (default: Mathematics)')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel downloads (default: 4)')
+    parser.add_argument('--per-host', type=int, default=4,
+                        help='Simultaneous downloads from one host (default: 4)')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Seconds between download starts per host (default: 0)')
+    parser.add_argument('--shards', type=int, default=2,
+                        help='Processes for the sharded scenario (default: 2)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show the output of the in-process scrapers')
+    add_mock_arguments(parser)
+
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    http_session.configure(pool_size=max(args.workers, 4))
+
+    server = None
+    url = args.url
+    if url is None:
+        server = MockArchiveServer(config=config_from_args(args)).start()
+        url = server.url
+    print(f"Benchmarking against {url}")
+    print("="*60)
+
+    results = []
+    with BrowserSession() as session:
+        try:
+            for scenario in scenarios:
+                for run in range(1, args.repeat + 1):
+                    print(f"\n⏳ {scenario} (run {run}/{args.repeat})...")
+                    result = run_scenario(scenario, url, args, session)
+                    results.append(result)
+                    print(f"{'✗' if result.error else '✓'} {result.row()}")
+        finally:
+            if server is not None:
+                server.stop()
+
+    print("\n" + "="*60)
+    for result in results:
+        print(result.row())
+    if server is not None:
+        print(f"\n✓ Mock server: {server.stats.describe()}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([result.as_dict() for result in results], f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Shared headless Chrome session for the exam scrapers
+Starts Chrome once, accepts the archive terms once and hands the same
+driver to every discovery and download step
+"""
+
+from pathlib import Path
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    WebDriverException,
+)
+from cascade_wait import CascadeWaiter
+import http_session
+import metrics
+
+
+def create_driver():
+    """Start a new headless Chrome, preferring the local chromedriver"""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+
+    # Check for local chromedriver first
+    local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
+    if local_driver.exists():
+        from selenium.webdriver.chrome.service import Service
+        service = Service(executable_path=str(local_driver))
+        return webdriver.Chrome(service=service, options=options)
+
+    # Fall back to system chromedriver
+    return webdriver.Chrome(options=options)
+
+
+def accept_terms(driver, waiter=None):
+    """
+    Tick the terms and conditions checkbox if it is present and unticked
+
+    Args:
+        driver: WebDriver on the archive page
+        waiter: CascadeWaiter used to wait for the page to react to the click
+
+    Returns:
+        True if the checkbox was clicked
+    """
+    try:
+        checkbox = driver.find_element(By.CSS_SELECTOR, 'input[type="checkbox"]')
+    except NoSuchElementException:
+        return False
+
+    if checkbox.is_selected():
+        return False
+
+    waiter = waiter or CascadeWaiter.for_driver(driver)
+    waiter.click(checkbox, label='terms')
+    return True
+
+
+class BrowserSession:
+    """
+    Owns one live Chrome driver and restarts it only after a crash
+
+    The browser is started lazily on first use, so a session that is never
+    asked for a driver never launches Chrome.
+    """
+
+    def __init__(self, driver=None, wait_timeout=10):
+        """
+        Args:
+            driver: Existing WebDriver to adopt. An adopted driver is not
+                    quit by close(); the caller keeps ownership of it.
+            wait_timeout: Upper bound in seconds for each page-update wait
+        """
+        self._driver = driver
+        self.wait_timeout = wait_timeout
+        self.owns_driver = driver is None
+        self.terms_accepted = False
+        self.starts = 0
+        self.restarts = 0
+
+    @property
+    def driver(self):
+        """The live WebDriver, starting Chrome if needed"""
+        if self._driver is None:
+            self.start()
+        return self._driver
+
+    def start(self):
+        """Start Chrome"""
+        print("Starting Chrome...")
+        with metrics.phase('browser_start'):
+            self._driver = create_driver()
+        self.owns_driver = True
+        self.terms_accepted = False
+        self.starts += 1
+        return self._driver
+
+    def is_alive(self):
+        """Check whether the driver still answers commands"""
+        if self._driver is None:
+            return False
+        try:
+            self._driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def restart(self):
+        """Throw away the current browser and start a fresh one"""
+        print("⟳ Restarting Chrome...")
+        self._quit_driver()
+        self.restarts += 1
+        metrics.count('browser_restarts')
+        return self.start()
+
+    def ensure_alive(self):
+        """Return a working driver, restarting Chrome if it has crashed"""
+        if self._driver is None:
+            return self.start()
+        if not self.is_alive():
+            if not self.owns_driver:
+                raise WebDriverException("Adopted browser session is no longer alive")
+            return self.restart()
+        return self._driver
+
+    def waiter(self):
+        """New CascadeWaiter on the live driver, bounded by wait_timeout"""
+        return CascadeWaiter.for_driver(self.driver, self.wait_timeout)
+
+    def load_archive(self, url, waiter=None):
+        """
+        Load the archive page and accept the terms if they are still pending
+
+        Args:
+            url: URL of the exam archive page
+            waiter: CascadeWaiter to record the waits in (default: a new one)
+        """
+        driver = self.ensure_alive()
+        waiter = waiter or self.waiter()
+        with metrics.phase('page_load'):
+            driver.get(url)
+            waiter.wait_for_page()
+
+        if accept_terms(driver, waiter) and not self.terms_accepted:
+            print("✓ Accepted terms and conditions")
+        if not self.terms_accepted:
+            # Downloads share the browser's cookies and user agent
+            http_session.copy_browser_state(driver)
+            self.terms_accepted = True
+        return driver
+
+    def close(self):
+        """Quit the browser if this session started it"""
+        if self.owns_driver:
+            self._quit_driver()
+        self._driver = None
+
+    def _quit_driver(self):
+        if self._driver is None:
+            return
+        try:
+            self._driver.quit()
+        except WebDriverException:
+            pass
+        self._driver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
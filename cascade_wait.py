@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Condition-based waits for the material archive dropdown cascade
+Replaces fixed sleeps with a check for the page actually having updated
+"""
+
+import time
+import uuid
+import metrics
+import tracing
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException,
+)
+
+
+VIEW_TYPE_SELECT = 'MaterialArchive__noTable__sbv__ViewType'
+YEAR_SELECT = 'MaterialArchive__noTable__sbv__YearSelect'
+EXAMINATION_SELECT = 'MaterialArchive__noTable__sbv__ExaminationSelect'
+SUBJECT_SELECT = 'MaterialArchive__noTable__sbv__SubjectSelect'
+
+# Order of the dropdowns on the archive page; each one repopulates the next
+CASCADE = (VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT)
+
+# Marker name left on window before an action. It disappears on a postback.
+_MARK = '__examScraperMark'
+
+# Returns a cheap fingerprint of the next select's options, or of the
+# download links in the results table when there is no next select
+_SNAPSHOT_JS = """
+var id = arguments[0];
+if (id) {
+    var el = document.getElementById(id);
+    if (!el) { return null; }
+    return Array.prototype.map.call(el.options, function (o) {
+        return o.value + '=' + o.text;
+    }).join('\\n');
+}
+var links = document.querySelectorAll('a[href*="?fp="], a[href$=".pdf"], a[href$=".PDF"]');
+return links.length + ':' + Array.prototype.map.call(links, function (a) {
+    return a.href;
+}).join('\\n');
+"""
+
+_STATE_JS = """
+var target = arguments[0], mark = arguments[1], element = arguments[2];
+var detached = false, checked = null;
+if (element) { detached = !element.isConnected; checked = !!element.checked; }
+return {
+    reloaded: window['%s'] !== mark,
+    detached: detached,
+    checked: checked,
+    ready: document.readyState,
+    snapshot: (function () { %s }).apply(null, [target])
+};
+""" % (_MARK, _SNAPSHOT_JS)
+
+
+def next_in_cascade(select_id):
+    """Return the id of the dropdown repopulated by select_id (None = results)"""
+    if select_id in CASCADE:
+        idx = CASCADE.index(select_id)
+        if idx + 1 < len(CASCADE):
+            return CASCADE[idx + 1]
+    return None
+
+
+class CascadeWaiter:
+    """
+    Waits for the archive page to react to a dropdown change
+
+    A wait finishes as soon as any of these is seen:
+      - the page was posted back (the marker set on window is gone)
+      - the changed select was replaced in the DOM
+      - the next select in the cascade (or the results table) changed
+
+    Every wait is bounded by the WebDriverWait timeout and its real
+    duration is recorded in self.timings.
+    """
+
+    def __init__(self, wait):
+        """
+        Args:
+            wait: WebDriverWait used for polling; its timeout is the upper bound
+        """
+        self.wait = wait
+        self.driver = wait._driver
+        self.timings = []
+
+    @classmethod
+    def for_driver(cls, driver, timeout=10):
+        """Build a waiter with its own WebDriverWait"""
+        return cls(WebDriverWait(driver, timeout, poll_frequency=0.05))
+
+    def select(self, dropdown, value, label=None):
+        """
+        Select a value in a dropdown and wait for the cascade to update
+
+        Args:
+            dropdown: Select WebElement or its element id
+            value: Option value to select
+            label: Name recorded in the timings (default: the select id)
+
+        Returns:
+            Seconds spent waiting
+        """
+        if isinstance(dropdown, str):
+            dropdown = self.driver.find_element(By.ID, dropdown)
+        select_id, current = self.driver.execute_script(
+            "return [arguments[0].id, arguments[0].value];", dropdown)
+        select = Select(dropdown)
+        label = label or select_id or 'select'
+
+        # Re-selecting the current value fires no change event
+        if current == value:
+            self._record(label, 0.0, False)
+            return 0.0
+
+        return self.run(lambda: select.select_by_value(value),
+                        target=next_in_cascade(select_id),
+                        element=dropdown, label=label)
+
+    def run(self, action, target=None, element=None, label='action', checked=None):
+        """
+        Perform an action and wait until the page reacts to it
+
+        Args:
+            action: Callable that changes the page (select, click, ...)
+            target: Id of the select expected to change (None = results table)
+            element: Element expected to be replaced on update, if any
+            label: Name recorded in the timings
+            checked: If set, the element reaching this checked state also
+                     counts as an update
+
+        Returns:
+            Seconds spent waiting
+        """
+        mark = uuid.uuid4().hex
+        before = self.driver.execute_script(
+            "window['%s'] = arguments[1];" % _MARK + _SNAPSHOT_JS, target, mark)
+
+        with tracing.span(label, 'dropdown', target=target) as span:
+            action()
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                self.wait.until(self._updated(target, mark, element, before, checked))
+            except TimeoutException:
+                timed_out = True
+                span['timed_out'] = True
+            elapsed = time.perf_counter() - start
+
+        metrics.get_metrics().observe('dropdown_wait', elapsed)
+        self._record(label, elapsed, timed_out)
+        return elapsed
+
+    def click(self, element, label='click'):
+        """
+        Click a checkbox or button and wait for the page to react
+
+        Besides a postback or a DOM change, a checkbox flipping its checked
+        state counts as the page having reacted.
+
+        Returns:
+            Seconds spent waiting
+        """
+        was_checked = element.is_selected()
+        return self.run(element.click, element=element, label=label,
+                        checked=not was_checked)
+
+    def wait_for_page(self, label='page load'):
+        """Wait until the document has loaded and a dropdown or checkbox is present"""
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            self.wait.until(lambda d: d.execute_script(
+                "return document.readyState !== 'loading' && "
+                "!!document.querySelector('select, input[type=\"checkbox\"]');"))
+        except TimeoutException:
+            timed_out = True
+        elapsed = time.perf_counter() - start
+
+        self._record(label, elapsed, timed_out)
+        return elapsed
+
+    def _updated(self, target, mark, element, before, checked=None):
+        def check(driver):
+            try:
+                state = driver.execute_script(_STATE_JS, target, mark, element)
+            except StaleElementReferenceException:
+                # The element went away with the old page
+                return driver.execute_script("return document.readyState") != 'loading'
+
+            if state['ready'] == 'loading':
+                return False
+            if state['reloaded'] or state['detached']:
+                return True
+            if checked is not None and state['checked'] == checked:
+                return True
+            return state['snapshot'] is not None and state['snapshot'] != before
+        return check
+
+    def _record(self, label, elapsed, timed_out):
+        self.timings.append((label, elapsed, timed_out))
+        if timed_out:
+            metrics.count('wait_timeouts')
+            print(f"  ⏳ No update seen for {label} after {elapsed:.1f}s, continuing")
+
+    def summary(self):
+        """Aggregate wait statistics"""
+        durations = [t for _, t, _ in self.timings]
+        return {
+            'waits': len(durations),
+            'total': sum(durations),
+            'max': max(durations) if durations else 0.0,
+            'timeouts': sum(1 for _, _, timed_out in self.timings if timed_out),
+        }
+
+    def report(self):
+        """Print how long the waits took"""
+        stats = self.summary()
+        if not stats['waits']:
+            return
+        line = (f"⏱ Waited {stats['total']:.2f}s over {stats['waits']} page update(s) "
+                f"(max {stats['max']:.2f}s)")
+        if stats['timeouts']:
+            line += f", {stats['timeouts']} hit the {self.wait._timeout:g}s limit"
+        print(line)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Dropdown cascade walker
+Moves the browser between archive selections by changing only the dropdowns
+that differ from what the page already shows, instead of reloading the page
+and re-selecting ViewType, Year, Examination and Subject every time
+"""
+
+from selenium.common.exceptions import WebDriverException
+import metrics
+from cascade_wait import CASCADE
+
+
+# Current value of each select (null when the page has no such select)
+_VALUES_JS = """
+return arguments[0].map(function (id) {
+    var el = document.getElementById(id);
+    return el ? el.value : null;
+});
+"""
+
+
+class CascadeWalker:
+    """
+    Keeps one browser on the archive page and walks it between selections
+
+    The dropdowns already on the page are read before every move, so the
+    walker stays correct when something else has used the browser in
+    between (it simply reloads the page if it is no longer there).
+    """
+
+    def __init__(self, base_url, session):
+        """
+        Args:
+            base_url: URL to the exam archive page
+            session: BrowserSession providing the driver
+        """
+        self.base_url = base_url
+        self.session = session
+        self.page_loads = 0
+        self.selects = 0
+        self.from_scratch = 0
+
+    def _current(self, driver, select_ids):
+        """Values the page shows for select_ids, or None if the archive form is not loaded"""
+        try:
+            values = driver.execute_script(_VALUES_JS, list(select_ids))
+        except WebDriverException:
+            return None
+        if not values or values[0] is None:
+            return None
+        return values
+
+    def goto(self, selections):
+        """
+        Make the page show selections, changing as few dropdowns as possible
+
+        Args:
+            selections: Dict mapping select id to value, in cascade order
+
+        Returns:
+            The WebDriver, on the selected page
+        """
+        path = [(select_id, str(value)) for select_id, value in selections.items()]
+        before = self.interactions
+        self.from_scratch += 1 + len(path)
+
+        driver = self.session.ensure_alive()
+        waiter = self.session.waiter()
+        ids = [select_id for select_id, _ in path] or list(CASCADE[:1])
+        current = self._current(driver, ids)
+        if current is None:
+            driver = self.session.load_archive(self.base_url, waiter)
+            self.page_loads += 1
+            current = self._current(driver, ids) or [None] * len(ids)
+
+        # Changing a dropdown resets every one below it, so everything from
+        # the first difference down is selected again
+        start = len(path)
+        for depth, (_, value) in enumerate(path):
+            if current[depth] != value:
+                start = depth
+                break
+        for select_id, value in path[start:]:
+            waiter.select(select_id, value)
+            self.selects += 1
+
+        metrics.count('cascade_interactions_saved', 1 + len(path) - (self.interactions - before))
+        return driver
+
+    @property
+    def interactions(self):
+        return self.page_loads + self.selects
+
+    def describe_stats(self):
+        saved = self.from_scratch - self.interactions
+        return (f"{self.interactions} page interaction(s) instead of {self.from_scratch} "
+                f"({saved} saved, {self.page_loads} page load(s))")
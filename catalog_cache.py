@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache of archive listings
+Stores dropdown option lists and PDF listings in SQLite so repeated runs
+only go to the archive for entries that are missing or stale
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from cascade_wait import YEAR_SELECT
+
+
+DEFAULT_PATH = Path.home() / '.cache' / 'exam-scraper' / 'catalog.sqlite'
+
+# Listings for the current (or a future) year change while papers are being
+# published; past years are treated as immutable unless a TTL is given
+CURRENT_YEAR_TTL = 6 * 3600
+
+
+class CatalogCache:
+    """SQLite store of archive listings with a per-entry TTL"""
+
+    def __init__(self, path=DEFAULT_PATH, current_ttl=CURRENT_YEAR_TTL, past_ttl=None):
+        """
+        Args:
+            path: SQLite database file
+            current_ttl: Seconds entries for the current year (or with no
+                         year, like the year list itself) stay fresh
+            past_ttl: Seconds entries for past years stay fresh (None = forever)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.current_ttl = current_ttl
+        self.past_ttl = past_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Sharded runs and the daemon share one cache file; wait for their locks
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                year INTEGER,
+                value TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._db.commit()
+
+    def ttl_for(self, year):
+        """Seconds an entry for year stays fresh (None = never expires)"""
+        if year is None or year >= date.today().year:
+            return self.current_ttl
+        return self.past_ttl
+
+    def get(self, kind, key):
+        """Cached value, or None if it is missing or stale"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, year, fetched_at FROM catalog WHERE kind = ? AND key = ?",
+                (kind, key)).fetchone()
+
+        if row is not None:
+            value, year, fetched_at = row
+            ttl = self.ttl_for(year)
+            if ttl is None or time.time() - fetched_at < ttl:
+                self.hits += 1
+                return json.loads(value)
+
+        self.misses += 1
+        return None
+
+    def put(self, kind, key, value, year=None):
+        """Store a value fetched now"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO catalog (kind, key, year, value, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, key, year, json.dumps(value), time.time()))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def describe_stats(self):
+        return f"{self.hits} cached listing(s) used, {self.misses} fetched from the archive"
+
+
+def _year_of(selections):
+    value = selections.get(YEAR_SELECT)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedArchive:
+    """
+    Wraps a discovery backend (see archive_client) with a CatalogCache
+
+    Entries are keyed by the backend's base URL as well as the selections,
+    so one cache file can serve the live archive and a mock or mirror
+    without either seeing the other's listings.
+    """
+
+    def __init__(self, archive, cache, refresh=False):
+        """
+        Args:
+            archive: Backend with base_url, get_options() and find_pdf_links()
+            cache: CatalogCache to read and fill
+            refresh: Ignore cached entries and fetch everything again
+        """
+        self.archive = archive
+        self.base_url = archive.base_url
+        self.cache = cache
+        self.refresh = refresh
+
+    def _key(self, selections, select_id=None):
+        return json.dumps([self.base_url]
+                          + [list(map(str, item)) for item in selections.items()] + [select_id])
+
+    def get_options(self, selections, select_id):
+        key = self._key(selections, select_id)
+        if not self.refresh:
+            cached = self.cache.get('options', key)
+            if cached is not None:
+                return [tuple(option) for option in cached]
+
+        options = self.archive.get_options(selections, select_id)
+        # An empty listing may be a failed load; do not pin it
+        if options:
+            self.cache.put('options', key, options, _year_of(selections))
+        return options
+
+    def find_pdf_links(self, selections):
+        key = self._key(selections)
+        if not self.refresh:
+            cached = self.cache.get('pdf_links', key)
+            if cached is not None:
+                return cached
+
+        pdf_links = self.archive.find_pdf_links(selections)
+        if pdf_links:
+            self.cache.put('pdf_links', key, pdf_links, _year_of(selections))
+        return pdf_links
+
+    def close(self):
+        self.archive.close()
+        self.cache.close()
+
+
+def add_cache_arguments(parser):
+    """Add the --cache/--no-cache/--refresh-cache options to an argparse parser"""
+    parser.add_argument(
+        '--cache',
+        default=str(DEFAULT_PATH),
+        help=f'Catalog cache file (default: {DEFAULT_PATH})'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the catalog cache'
+    )
+    parser.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help='Fetch every listing again and update the cache'
+    )
+
+
+def wrap_archive(archive, args):
+    """Wrap a backend with the cache selected by add_cache_arguments options"""
+    if args.no_cache:
+        return archive
+    return CachedArchive(archive, CatalogCache(args.cache), refresh=args.refresh_cache)
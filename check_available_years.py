@@ -3,80 +3,60 @@
 Check what years and levels are available for a subject
 """
 
-import time
-from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.service import Service
-
-
-def check_availability(cert_level, subject_name):
-    """Check what years are available for a cert level and subject"""
-    base_url = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
-
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-
-    local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
-    if local_driver.exists():
-        service = Service(executable_path=str(local_driver))
-        driver = webdriver.Chrome(service=service, options=options)
-    else:
-        driver = webdriver.Chrome(options=options)
+import metrics
+from browser_session import BrowserSession
+from archive_client import BACKENDS, BrowserArchive, open_archive
+from catalog_cache import add_cache_arguments, wrap_archive
+from availability_matrix import (
+    AvailabilityMatrix, DEFAULT_PATH as MATRIX_PATH, MATERIAL_TYPES, crawl_matrix,
+)
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+BASE_URL = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
+
+
+def check_availability(cert_level, subject_name, wait_timeout=10, archive=None):
+    """
+    Check what years are available for a cert level and subject
+
+    Args:
+        archive: Discovery backend (optionally cached). If None, a browser
+                 is started for this call and quit afterwards.
+
+    Returns:
+        List of the years the subject is available in
+    """
+    session = BrowserSession(wait_timeout=wait_timeout)
+    archive = archive or BrowserArchive(BASE_URL, session)
 
     try:
         print(f"Checking availability for {cert_level.upper()} {subject_name}...")
-        driver.get(base_url)
-        time.sleep(2)
-
-        # Accept terms
-        try:
-            checkbox = driver.find_element(By.CSS_SELECTOR, 'input[type="checkbox"]')
-            if not checkbox.is_selected():
-                checkbox.click()
-                time.sleep(1)
-        except:
-            pass
-
-        # Select material type
-        type_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__ViewType')
-        Select(type_dropdown).select_by_value('exampapers')
-        time.sleep(2)
 
         # Get all years
-        year_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__YearSelect')
-        year_select = Select(year_dropdown)
-        all_years = [opt.get_attribute('value') for opt in year_select.options if opt.get_attribute('value')]
+        selections = {VIEW_TYPE_SELECT: 'exampapers'}
+        with metrics.phase('list_years'):
+            all_years = [value for value, _ in archive.get_options(selections, YEAR_SELECT)]
 
         print(f"\nTotal years available: {len(all_years)}")
 
         available_years = []
 
         for year in all_years:
-            # Select year
-            Select(driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__YearSelect')).select_by_value(year)
-            time.sleep(1)
+            selections = {VIEW_TYPE_SELECT: 'exampapers', YEAR_SELECT: year}
 
             # Check if cert level is available
             try:
-                level_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__ExaminationSelect')
-                level_select = Select(level_dropdown)
-                level_values = [opt.get_attribute('value') for opt in level_select.options if opt.get_attribute('value')]
+                with metrics.phase('list_levels'):
+                    level_values = [value for value, _ in
+                                    archive.get_options(selections, EXAMINATION_SELECT)]
 
                 if cert_level in level_values:
-                    # Select level
-                    Select(level_dropdown).select_by_value(cert_level)
-                    time.sleep(1)
-
                     # Check if subject is available
                     try:
-                        subject_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__SubjectSelect')
-                        subject_select = Select(subject_dropdown)
-                        subjects = [(opt.get_attribute('value'), opt.text)
-                                   for opt in subject_select.options if opt.get_attribute('value')]
+                        selections[EXAMINATION_SELECT] = cert_level
+                        with metrics.phase('list_subjects'):
+                            subjects = archive.get_options(selections, SUBJECT_SELECT)
 
                         # Check if our subject matches
                         matching = [s for s in subjects
@@ -97,18 +77,92 @@ def check_availability(cert_level, subject_name):
         print(f"\n{'='*60}")
         print(f"Summary: {len(available_years)} years available for {cert_level.upper()} {subject_name}")
         print(f"Years: {', '.join(available_years)}")
+        return available_years
 
     finally:
-        driver.quit()
+        session.close()
+
+
+def check_availability_from_matrix(matrix, cert_level, subject_name, material_type='exampapers'):
+    """Answer the same question as check_availability from a saved matrix"""
+    print(f"Checking availability for {cert_level.upper()} {subject_name} (from availability matrix)...")
+
+    all_years = matrix.years(material_type)
+    print(f"\nTotal years available: {len(all_years)}")
+
+    available_years = []
+    for year in all_years:
+        level_values = matrix.certs_for(year, material_type)
+        if cert_level not in level_values:
+            print(f"  ✗ {year}: {cert_level.upper()} not available (available: {level_values})")
+            continue
+
+        matching = matrix.matching_subjects(cert_level, year, subject_name, material_type)
+        if matching:
+            available_years.append(year)
+            print(f"  ✓ {year}: Available ({len(matching)} matching subject(s))")
+        else:
+            print(f"  ✗ {year}: Subject '{subject_name}' not found")
+
+    print(f"\n{'='*60}")
+    print(f"Summary: {len(available_years)} years available for {cert_level.upper()} {subject_name}")
+    print(f"Years: {', '.join(available_years)}")
+    return available_years
 
 
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser(description='Check year availability for a subject')
-    parser.add_argument('--cert', required=True, help='Certificate level (lc, jc, lca)')
-    parser.add_argument('--subject', required=True, help='Subject name')
+    parser.add_argument('--cert', help='Certificate level (lc, jc, lca)')
+    parser.add_argument('--subject', help='Subject name')
+    parser.add_argument('--type', choices=MATERIAL_TYPES, default='exampapers',
+                        help='Material type to check in matrix mode (default: exampapers)')
+    parser.add_argument('--matrix', action='store_true',
+                        help='Answer from the availability matrix, crawling it first if missing')
+    parser.add_argument('--build-matrix', action='store_true',
+                        help='Crawl every year and examination once and save the availability matrix')
+    parser.add_argument('--matrix-types', default='exampapers',
+                        help='Comma-separated material types to record in the matrix, or "all" (default: exampapers)')
+    parser.add_argument('--matrix-file', default=str(MATRIX_PATH),
+                        help=f'Availability matrix file (default: {MATRIX_PATH})')
+    parser.add_argument('--backend', choices=BACKENDS, default='auto',
+                        help='Discovery backend: http, selenium, or auto (default)')
+    parser.add_argument('--wait-timeout', type=float, default=10.0,
+                        help='Maximum seconds to wait for each dropdown update (default: 10)')
+    parser.add_argument('--url', default=BASE_URL,
+                        help='Archive page URL (default: the examinations.ie material archive)')
+    add_cache_arguments(parser)
+    metrics.add_metrics_arguments(parser)
 
     args = parser.parse_args()
+    metrics.start_export(args)
 
-    check_availability(args.cert, args.subject)
+    if not args.build_matrix and not (args.cert and args.subject):
+        parser.error('--cert and --subject are required unless --build-matrix is given')
+
+    if args.matrix_types.lower() == 'all':
+        matrix_types = MATERIAL_TYPES
+    else:
+        matrix_types = [t.strip() for t in args.matrix_types.split(',')]
+    if args.type not in matrix_types:
+        matrix_types.append(args.type)
+
+    with BrowserSession(wait_timeout=args.wait_timeout) as session:
+        archive = wrap_archive(open_archive(args.backend, args.url, session), args)
+
+        if args.build_matrix or args.matrix:
+            matrix = None if args.build_matrix else AvailabilityMatrix.load(args.matrix_file, args.url)
+            if matrix is None or args.type not in matrix.material_types:
+                print("Building availability matrix...")
+                matrix = crawl_matrix(archive, matrix_types)
+                matrix.save(args.matrix_file)
+                print(f"✓ Saved availability matrix to {args.matrix_file}")
+
+            if args.cert and args.subject:
+                print()
+                check_availability_from_matrix(matrix, args.cert, args.subject, args.type)
+        else:
+            check_availability(args.cert, args.subject, args.wait_timeout, archive=archive)
+
+    metrics.finish()
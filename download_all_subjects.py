@@ -4,81 +4,76 @@ Download exam materials for all subjects in a given year and level
 """
 
 import sys
-import time
 import argparse
 from pathlib import Path
-from exam_scraper import ExamScraper
-from selenium import webdriver
+from exam_scraper import ExamScraper, get_dropdown_options
+import http_session
+import metrics
+import rate_control
+import stream_writer
+import tracing
+from download_engine import DownloadEngine, add_engine_arguments
+from sync_state import SyncState
+from object_store import ObjectStore, add_store_argument
+from manifest import Manifest
+from pipeline import DEFAULT_QUEUE_SIZE, Pipeline
+from browser_session import BrowserSession
+from archive_client import BACKENDS, open_archive
+from catalog_cache import add_cache_arguments, wrap_archive
+from availability_matrix import TYPE_TAGS, material_types_arg
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.service import Service
 
 
-def get_all_subjects(base_url, material_type, year, level):
-    """Get list of all available subjects for given parameters"""
+def get_all_subjects(base_url, material_type, year, level, session=None, archive=None):
+    """
+    Get list of all available subjects for given parameters
+
+    Args:
+        session: Shared BrowserSession to reuse. If None, a browser is
+                 started for this call and quit afterwards.
+        archive: Discovery backend from archive_client.open_archive. When
+                 set, the subject list comes from it instead of the browser.
+    """
     print("Fetching list of available subjects...")
 
-    # Setup Selenium with Chrome
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
+    if archive is not None:
+        with metrics.phase('list_subjects'):
+            subjects = archive.get_options({
+                VIEW_TYPE_SELECT: material_type,
+                YEAR_SELECT: year,
+                EXAMINATION_SELECT: level,
+            }, SUBJECT_SELECT)
+        print(f"Found {len(subjects)} subjects")
+        return subjects
 
-    # Check for local chromedriver
-    local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
-    if local_driver.exists():
-        service = Service(executable_path=str(local_driver))
-        driver = webdriver.Chrome(service=service, options=options)
-    else:
-        driver = webdriver.Chrome(options=options)
+    own_session = session is None
+    if own_session:
+        session = BrowserSession()
 
     try:
-        driver.get(base_url)
-        time.sleep(2)
-
-        # Accept terms
-        try:
-            checkbox = driver.find_element(By.CSS_SELECTOR, 'input[type="checkbox"]')
-            if not checkbox.is_selected():
-                checkbox.click()
-                time.sleep(1)
-        except:
-            pass
-
-        # Select material type
-        type_dropdown = driver.find_element(
-            By.ID, 'MaterialArchive__noTable__sbv__ViewType'
-        )
-        Select(type_dropdown).select_by_value(material_type)
-        time.sleep(2)
-
-        # Select year
-        year_dropdown = driver.find_element(
-            By.ID, 'MaterialArchive__noTable__sbv__YearSelect'
-        )
-        Select(year_dropdown).select_by_value(year)
-        time.sleep(2)
-
-        # Select level
-        level_dropdown = driver.find_element(
-            By.ID, 'MaterialArchive__noTable__sbv__ExaminationSelect'
-        )
-        Select(level_dropdown).select_by_value(level)
-        time.sleep(2)
-
-        # Get subjects
-        subject_dropdown = driver.find_element(
-            By.ID, 'MaterialArchive__noTable__sbv__SubjectSelect'
-        )
-        select = Select(subject_dropdown)
-        subjects = [(opt.get_attribute('value'), opt.text)
-                   for opt in select.options if opt.get_attribute('value')]
+        with metrics.phase('list_subjects'):
+            waiter = session.waiter()
+            driver = session.load_archive(base_url, waiter)
+
+            # Select material type, year and level, waiting for each to repopulate the next
+            waiter.select('MaterialArchive__noTable__sbv__ViewType', material_type)
+            waiter.select('MaterialArchive__noTable__sbv__YearSelect', year)
+            waiter.select('MaterialArchive__noTable__sbv__ExaminationSelect', level)
+
+            # Get subjects
+            subject_dropdown = driver.find_element(
+                By.ID, 'MaterialArchive__noTable__sbv__SubjectSelect'
+            )
+            subjects = get_dropdown_options(subject_dropdown)
 
         print(f"Found {len(subjects)} subjects")
+        waiter.report()
         return subjects
 
     finally:
-        driver.quit()
+        if own_session:
+            session.close()
 
 
 def main():
@@ -87,9 +82,11 @@ def main():
     )
     parser.add_argument(
         '--type',
-        choices=['exampapers', 'markingschemes', 'deferredexams', 'deferredmarkingschemes'],
-        default='exampapers',
-        help='Type of material to download (default: exampapers)'
+        type=material_types_arg,
+        default=['exampapers'],
+        help='Type of material to download: exampapers, markingschemes, deferredexams, '
+             'deferredmarkingschemes, a comma-separated list of them, or all. Several types are '
+             'fetched in one pass and saved side by side (default: exampapers)'
     )
     parser.add_argument(
         '--year',
@@ -113,74 +110,176 @@ def main():
         default='downloads',
         help='Output directory (default: downloads)'
     )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Re-check files that already exist with conditional requests and refresh any that changed'
+    )
+    add_store_argument(parser)
+    rate_control.add_adaptive_argument(parser)
+    stream_writer.add_writer_arguments(parser)
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f'Discovered files allowed to wait for a download worker (default: {DEFAULT_QUEUE_SIZE})'
+    )
+    add_engine_arguments(parser)
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default='auto',
+        help='Discovery backend: http (no browser), selenium, or auto (http, falling back to selenium). Default: auto'
+    )
+    parser.add_argument(
+        '--wait-timeout',
+        type=float,
+        default=10.0,
+        help='Maximum seconds to wait for the page to update after each dropdown selection (default: 10)'
+    )
     parser.add_argument(
         '--list-subjects',
         action='store_true',
         help='List all available subjects and exit'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--url',
+        default='https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104',
+        help='Archive page URL (default: the examinations.ie material archive)'
+    )
 
-    base_url = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
+    add_cache_arguments(parser)
+    metrics.add_metrics_arguments(parser)
+    tracing.add_trace_arguments(parser)
 
-    # Get list of subjects
-    subjects = get_all_subjects(base_url, args.type, args.year, args.level)
+    args = parser.parse_args()
+    metrics.start_export(args)
+    tracing.start(args)
+
+    http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+
+    base_url = args.url
+
+    # One browser for the whole run, restarted only if it crashes
+    with BrowserSession(wait_timeout=args.wait_timeout) as session:
+        archive = wrap_archive(open_archive(args.backend, base_url, session), args)
+        engine = DownloadEngine(workers=args.workers, per_host=args.per_host, delay=args.delay,
+                                sync=SyncState(args.output) if args.sync else None,
+                                store=ObjectStore(args.store) if args.store else None,
+                                manifest=Manifest(args.output),
+                                rate_control=rate_control.from_args(args),
+                                writer=stream_writer.from_args(args))
+
+        material_types = args.type
+        multi_type = len(material_types) > 1
+
+        # Get list of subjects of each type
+        subjects_by_type = {}
+        for material_type in material_types:
+            try:
+                subjects_by_type[material_type] = get_all_subjects(
+                    base_url, material_type, args.year, args.level, session=session, archive=archive)
+            except Exception as e:
+                print(f"✗ Could not list {material_type} subjects: {e}")
+                subjects_by_type[material_type] = []
+
+        if args.list_subjects:
+            for material_type, subjects in subjects_by_type.items():
+                print(f"\nAvailable subjects for {args.level.upper()} {args.year} {material_type}:")
+                print("="*60)
+                for value, text in subjects:
+                    print(f"  {value:30s} - {text}")
+            return
+
+        # Filter to specific subject if requested
+        if args.subject:
+            subjects_by_type = {
+                material_type: [(v, t) for v, t in subjects
+                                if args.subject.lower() in v.lower() or args.subject.lower() in t.lower()]
+                for material_type, subjects in subjects_by_type.items()
+            }
 
-    if args.list_subjects:
-        print(f"\nAvailable subjects for {args.level.upper()} {args.year} {args.type}:")
-        print("="*60)
-        for value, text in subjects:
-            print(f"  {value:30s} - {text}")
-        return
-
-    # Filter to specific subject if requested
-    if args.subject:
-        subjects = [(v, t) for v, t in subjects
-                   if args.subject.lower() in v.lower() or args.subject.lower() in t.lower()]
-        if not subjects:
-            print(f"Error: Subject '{args.subject}' not found")
+        # One pass, type by type, so each type's part of the cascade is walked once
+        tasks = [(material_type, value, text)
+                 for material_type, subjects in subjects_by_type.items() for value, text in subjects]
+        if not tasks:
+            print(f"Error: Subject '{args.subject}' not found" if args.subject else "Error: No subjects found")
             print("Use --list-subjects to see available subjects")
             sys.exit(1)
 
-    print(f"\nDownloading {args.type} for {len(subjects)} subject(s)")
-    print(f"Year: {args.year}, Level: {args.level.upper()}")
-    print(f"Output directory: {args.output}")
-    print("="*60)
-
-    # Create output directory structure
-    output_base = Path(args.output) / f"{args.year}_{args.level}_{args.type}"
-    output_base.mkdir(parents=True, exist_ok=True)
-
-    # Download each subject
-    for i, (subject_value, subject_text) in enumerate(subjects, 1):
-        print(f"\n[{i}/{len(subjects)}] Processing: {subject_text}")
-        print("-" * 60)
-
-        # Create subject-specific output directory
-        subject_dir = output_base / subject_text.replace('/', '_')
-        subject_dir.mkdir(exist_ok=True)
-
-        try:
-            scraper = ExamScraper(base_url, str(subject_dir))
-
-            selections = {
-                'MaterialArchive__noTable__sbv__ViewType': args.type,
-                'MaterialArchive__noTable__sbv__YearSelect': args.year,
-                'MaterialArchive__noTable__sbv__ExaminationSelect': args.level,
-                'MaterialArchive__noTable__sbv__SubjectSelect': subject_value
-            }
-
-            scraper.scrape(dropdown_selections=selections)
-
-        except Exception as e:
-            print(f"  ✗ Error processing {subject_text}: {e}")
-            continue
+        subject_count = len({text for _, _, text in tasks})
+        print(f"\nDownloading {', '.join(material_types)} for {subject_count} subject(s)")
+        print(f"Year: {args.year}, Level: {args.level.upper()}")
+        print(f"Output directory: {args.output}")
+        print("="*60)
 
-        # Small delay between subjects
-        time.sleep(1)
+        # Create output directory structure; several types share one folder per subject
+        if multi_type:
+            output_base = Path(args.output) / f"{args.year}_{args.level}"
+        else:
+            output_base = Path(args.output) / f"{args.year}_{args.level}_{material_types[0]}"
+        output_base.mkdir(parents=True, exist_ok=True)
+
+        def discover():
+            """Yield the DownloadJobs of every subject in turn"""
+            for i, (material_type, subject_value, subject_text) in enumerate(tasks, 1):
+                print(f"\n[{i}/{len(tasks)}] Processing: {subject_text}"
+                      + (f" ({material_type})" if multi_type else ""))
+                print("-" * 60)
+
+                # Create subject-specific output directory
+                subject_dir = output_base / subject_text.replace('/', '_')
+                subject_dir.mkdir(exist_ok=True)
+
+                try:
+                    scraper = ExamScraper(base_url, str(subject_dir), session=session,
+                                          archive=archive, engine=engine,
+                                          meta={'subject': subject_text})
+
+                    selections = {
+                        'MaterialArchive__noTable__sbv__ViewType': material_type,
+                        'MaterialArchive__noTable__sbv__YearSelect': args.year,
+                        'MaterialArchive__noTable__sbv__ExaminationSelect': args.level,
+                        'MaterialArchive__noTable__sbv__SubjectSelect': subject_value
+                    }
+
+                    with tracing.span(subject_text, 'subject'), metrics.phase('discovery'):
+                        pdf_links = archive.find_pdf_links(selections)
+
+                except Exception as e:
+                    print(f"  ✗ Error processing {subject_text}: {e}")
+                    continue
+
+                if not pdf_links:
+                    print("No PDF links found")
+                    continue
+                print(f"Found {len(pdf_links)} PDF link(s)")
+                yield from scraper.link_jobs(pdf_links, selections,
+                                             tag=TYPE_TAGS[material_type] if multi_type else None)
+
+        # Discovery runs on its own thread while the engine downloads what it found
+        pipeline = Pipeline(engine, queue_size=args.queue_size)
+        report = pipeline.run(discover)
 
     print("\n" + "="*60)
     print(f"✓ Complete! Files saved to: {output_base}")
+    print(f"✓ Downloads: {engine.total.summary()}")
+    print(f"✓ Pipeline: {pipeline.describe_stats(report)}")
+    if engine.sync is not None:
+        print(f"✓ Sync: {engine.total.sync_summary()}")
+    if engine.store is not None:
+        print(f"✓ Store: {engine.total.dedup_summary()}")
+        print(f"✓ Store: {engine.store.describe_stats()}")
+    print(f"✓ Manifest: {engine.manifest.describe_stats()}")
+    if args.adaptive:
+        print(f"✓ Rate: {engine.rate_control.describe_stats()}")
+    if engine.writer.fsync is not None:
+        print(f"✓ Fsync: {engine.writer.fsync.describe_stats()}")
+    print(f"✓ Connections: {http_session.describe_stats()}")
+    metrics.finish()
+    tracing.finish()
+    engine.manifest.close()
 
 
 if __name__ == '__main__':
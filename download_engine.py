@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+Concurrent PDF download engine
+Fetches many files at once with a bounded worker pool, a per-host
+concurrency cap and a politeness interval between requests to one host
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from urllib.parse import urlparse
+import requests
+import urllib3
+try:
+    import fcntl
+except ImportError:  # Windows: path locks become no-ops
+    fcntl = None
+import http_session
+import metrics
+import tracing
+from sync_state import conditional_headers, unchanged
+from object_store import HASH_CHUNK, sha256_file
+from stream_writer import StreamWriter
+
+
+_print_lock = threading.Lock()
+
+PART_SUFFIX = '.part'
+
+# A PDF starts with %PDF- and ends with %%EOF; readers accept a little junk
+# around either marker, so each is looked for in a window at that end
+PDF_HEADER = b'%PDF-'
+PDF_TRAILER = b'%%EOF'
+PDF_WINDOW = 1024
+
+
+class IncompleteDownload(requests.exceptions.ConnectionError):
+    """The connection ended before the advertised number of bytes arrived"""
+
+
+class InvalidPDF(Exception):
+    """The server answered with something that is not a complete PDF (often an HTML error page)"""
+
+
+class ServerBusy(Exception):
+    """The server answered 429 or 503 (only seen when urllib3 does not retry them itself)"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.retry_after = retry_after
+
+
+# Failures worth retrying; a partial .part file is kept and resumed. Bodies
+# are read from the raw urllib3 response, so its errors are listed too.
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout,
+                    urllib3.exceptions.ProtocolError,
+                    urllib3.exceptions.ReadTimeoutError,
+                    InvalidPDF,
+                    ServerBusy)
+
+
+def pdf_problem(head, tail):
+    """
+    Why the first and last bytes of a file do not look like a PDF
+
+    Args:
+        head: At least the first PDF_WINDOW bytes (or the whole file)
+        tail: At least the last PDF_WINDOW bytes (or the whole file)
+
+    Returns:
+        A short description of the problem, or None if the file looks valid
+    """
+    if PDF_HEADER not in head[:PDF_WINDOW]:
+        if head.lstrip()[:1] == b'<':
+            return 'HTML instead of PDF'
+        return 'missing %PDF- header'
+    if PDF_TRAILER not in tail[-PDF_WINDOW:]:
+        return 'missing %%EOF trailer (truncated)'
+    return None
+
+
+def part_path(path):
+    """Temporary file a download is written to before it is renamed into place"""
+    path = Path(path)
+    return path.with_name(path.name + PART_SUFFIX)
+
+
+def _retry_after(header):
+    """Seconds from a Retry-After header given in seconds, or None"""
+    if header and header.strip().isdigit():
+        return int(header.strip())
+    return None
+
+
+def _content_range(header):
+    """(start, total size) from a 'bytes start-end/total' Content-Range header, or None"""
+    match = re.match(r'bytes (\d+)-\d+/(\d+)', header or '')
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class PathLock:
+    """
+    Exclusive lock on one output path, shared between processes
+
+    Lock files live in their own directory, named by a hash of the path, and
+    are never deleted, so two processes always lock the same inode.
+    """
+
+    def __init__(self, lock_dir, path):
+        name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        self.lock_path = Path(lock_dir) / f'{name}.lock'
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def log(message):
+    """Print a progress line without interleaving output from worker threads"""
+    with _print_lock:
+        print(message, flush=True)
+
+
+class DownloadJob:
+    """One file to fetch"""
+
+    def __init__(self, url, path, label=None, meta=None, replace=False):
+        """
+        Args:
+            url: Download URL
+            path: Final file path
+            label: Name shown in progress lines (default: the file name)
+            meta: Extra details about the file (cert, year, subject, ...)
+            replace: Download even if path exists; the old file stays in place
+                     until the new one is complete (used to repair bad files)
+        """
+        self.url = url
+        self.path = Path(path)
+        self.label = label or self.path.name
+        self.meta = meta or {}
+        self.replace = replace
+
+
+class DownloadResult:
+    """Outcome of one DownloadJob"""
+
+    def __init__(self, job, status, size=0, seconds=0.0, attempts=0, error=None,
+                 sha256=None, duplicate=False):
+        self.job = job
+        # 'downloaded' (new file), 'updated', 'unchanged', 'exists' or 'failed'
+        self.status = status
+        self.size = size
+        self.seconds = seconds
+        self.attempts = attempts
+        self.error = error
+        self.sha256 = sha256  # hex digest of a file written by this run
+        self.duplicate = duplicate  # content was already in the object store
+
+    @property
+    def ok(self):
+        return self.status != 'failed'
+
+
+class DownloadReport:
+    """Aggregate of many DownloadResults"""
+
+    def __init__(self):
+        self.results = []
+        self.elapsed = 0.0
+
+    def add(self, result):
+        self.results.append(result)
+
+    def extend(self, report):
+        self.results.extend(report.results)
+        self.elapsed += report.elapsed
+
+    def count(self, status):
+        return sum(1 for r in self.results if r.status == status)
+
+    @property
+    def bytes(self):
+        return sum(r.size for r in self.results if r.status in ('downloaded', 'updated'))
+
+    @property
+    def failed(self):
+        return [r for r in self.results if r.status == 'failed']
+
+    def summary(self):
+        """One-line description of the run"""
+        mb = self.bytes / (1024 * 1024)
+        rate = mb / self.elapsed if self.elapsed > 0 else 0.0
+        parts = [f"{self.count('downloaded')} downloaded"]
+        if self.count('updated') or self.count('unchanged'):
+            parts.append(f"{self.count('updated')} updated")
+            parts.append(f"{self.count('unchanged')} unchanged")
+        parts.append(f"{self.count('exists')} already present")
+        parts.append(f"{self.count('failed')} failed")
+        return f"{', '.join(parts)} - {mb:.1f} MB in {self.elapsed:.1f}s ({rate:.1f} MB/s)"
+
+    def dedup_summary(self):
+        """Files of this run whose content was already in the object store"""
+        duplicates = [r for r in self.results if r.duplicate]
+        mb = sum(r.job.path.stat().st_size for r in duplicates if r.job.path.exists()) / (1024 * 1024)
+        return f"{len(duplicates)} duplicate(s) linked to stored copies, {mb:.1f} MB not stored again"
+
+    def sync_summary(self):
+        """Unchanged/updated/new counts of an incremental sync"""
+        return (f"{self.count('unchanged')} unchanged, {self.count('updated')} updated, "
+                f"{self.count('downloaded')} new")
+
+
+class HostRateLimiter:
+    """Spaces out the start of requests to each host by a minimum interval"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        """Block until a request to host may start"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class FixedRateControl:
+    """A fixed number of simultaneous requests and a fixed interval per host"""
+
+    def __init__(self, per_host, delay):
+        self.per_host = max(1, per_host)
+        self.rate_limiter = HostRateLimiter(delay)
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def slot(self, host):
+        """Semaphore holding one of host's concurrent request slots"""
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+    def acquire(self, host):
+        self.rate_limiter.acquire(host)
+
+    def success(self, host, latency):
+        pass
+
+    def congestion(self, host, reason, retry_after=None):
+        pass
+
+    def describe_stats(self):
+        return f"fixed: {self.per_host} concurrent per host, {self.rate_limiter.interval}s apart"
+
+
+class DownloadEngine:
+    """
+    Downloads DownloadJobs on a bounded thread pool
+
+    The delay is a politeness interval: workers wait for it only before
+    starting a request to the same host, never after a download finishes.
+    """
+
+    def __init__(self, workers=4, per_host=2, delay=0.5, max_retries=3, timeout=30,
+                 session=None, sync=None, store=None, manifest=None, lock_dir=None,
+                 rate_control=None, writer=None):
+        """
+        Args:
+            workers: Number of download threads
+            per_host: Maximum simultaneous downloads from one host
+            delay: Minimum seconds between starting requests to one host
+            max_retries: Attempts per file on connection errors
+            timeout: Seconds before a stalled request is abandoned
+            session: requests.Session to download with (default: the shared pooled session)
+            sync: SyncState. When set, existing files are revalidated with
+                  conditional requests and replaced if they changed.
+            store: ObjectStore. When set, every downloaded file is hardlinked
+                   to its copy in the content-addressed store.
+            manifest: Manifest. When set, it decides which files are already
+                      present and every downloaded file is recorded in it.
+            lock_dir: Directory for PathLocks. Set it when several processes
+                      may write the same output paths (see sharded).
+            rate_control: Adaptive per-host limits (see rate_control.AIMDController)
+                          used instead of per_host and delay.
+            writer: StreamWriter that saves response bodies (default: 64 KB
+                    buffers, preallocated files, no fsync)
+        """
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = session or http_session.get_session()
+        self.rate_control = rate_control or FixedRateControl(per_host, delay)
+        self.writer = writer or StreamWriter()
+        self.sync = sync
+        self.store = store
+        self.manifest = manifest
+        self.lock_dir = Path(lock_dir) if lock_dir else None
+        if self.lock_dir is not None:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.total = DownloadReport()
+
+    def run(self, jobs, on_result=None):
+        """
+        Download every job and return a DownloadReport
+
+        Args:
+            jobs: Iterable of DownloadJobs. It is consumed lazily, keeping at
+                  most a couple of jobs per worker in flight.
+            on_result: Called with each DownloadResult as soon as it is known
+                       (e.g. to report progress)
+        """
+        report = DownloadReport()
+        start = time.perf_counter()
+        max_pending = self.workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for job in jobs:
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect(report, future.result(), on_result)
+                pending.add(pool.submit(self.fetch, job))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._collect(report, future.result(), on_result)
+
+        self.writer.flush()
+        report.elapsed = time.perf_counter() - start
+        self.total.extend(report)
+        return report
+
+    @staticmethod
+    def _collect(report, result, on_result):
+        report.add(result)
+        if on_result is not None:
+            on_result(result)
+
+    def fetch(self, job):
+        """Download one job, retrying connection failures"""
+        with tracing.span(job.label, 'fetch', url=job.url) as span:
+            if self.lock_dir is None:
+                result = self._fetch(job)
+            else:
+                # Another process may be writing this path; it will have finished
+                # (and the file will exist) by the time the lock is ours
+                with PathLock(self.lock_dir, job.path):
+                    result = self._fetch(job)
+            span.update(status=result.status, bytes=result.size, attempts=result.attempts)
+        metrics.record_download(result)
+        return result
+
+    def _fetch(self, job):
+        known = self.manifest is not None and self.manifest.has(job.path)
+        if known and self.sync is not None and not job.replace and not job.path.exists():
+            # --sync asks the server anyway, so a file deleted since it was
+            # recorded is downloaded again rather than revalidated
+            self.manifest.forget(job.path)
+            known = False
+        refresh = (known or job.path.exists()) and not job.replace
+        if refresh and self.sync is None:
+            log(f"  ✓ Already exists: {job.label}")
+            if known:
+                return DownloadResult(job, 'exists', size=self.manifest.size_of(job.path) or 0)
+            size = job.path.stat().st_size
+            if self.manifest is not None:
+                # Downloaded before the manifest existed
+                self.manifest.record(job, size)
+            return DownloadResult(job, 'exists', size=size)
+
+        job.path.parent.mkdir(parents=True, exist_ok=True)
+        host = urlparse(job.url).netloc
+        start = time.perf_counter()
+
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                wait_time = 5 * (attempt + 1)
+                log(f"  ⏳ Retry {attempt + 1}/{self.max_retries} for {job.label}, waiting {wait_time}s...")
+                time.sleep(wait_time)
+
+            try:
+                with self.rate_control.slot(host):
+                    self.rate_control.acquire(host)
+                    status, size, sha256, duplicate = self._transfer(job, refresh)
+
+                if self.manifest is not None and (status != 'unchanged' or not known):
+                    self.manifest.record(job, job.path.stat().st_size, sha256)
+
+                if status == 'unchanged':
+                    log(f"  ✓ Unchanged: {job.label}")
+                elif status == 'updated':
+                    log(f"  ✓ Updated: {job.label}")
+                else:
+                    log(f"  ✓ Downloaded: {job.label}")
+                return DownloadResult(job, status, size=size,
+                                      seconds=time.perf_counter() - start,
+                                      attempts=attempt + 1, sha256=sha256, duplicate=duplicate)
+
+            except TRANSIENT_ERRORS as e:
+                self.rate_control.congestion(host, f"{type(e).__name__}: {e}",
+                                             getattr(e, 'retry_after', None))
+                if attempt == self.max_retries - 1:
+                    log(f"  ✗ Failed after {self.max_retries} attempts: {job.label} ({e})")
+                    return DownloadResult(job, 'failed', seconds=time.perf_counter() - start,
+                                          attempts=attempt + 1, error=e)
+            except Exception as e:
+                log(f"  ✗ Error downloading {job.label}: {e}")
+                return DownloadResult(job, 'failed', seconds=time.perf_counter() - start,
+                                      attempts=attempt + 1, error=e)
+
+    def _transfer(self, job, refresh=False):
+        """
+        Fetch job.url into job.path
+
+        The body is written to a .part file next to job.path, resumed with a
+        Range request if an earlier attempt left one behind, and renamed over
+        job.path only once the size the server advertised has arrived and the
+        content type, %PDF- header and %%EOF trailer look right. Its SHA-256
+        is computed while streaming; a refreshed file whose hash matches the
+        one on disk is left alone and reported unchanged.
+
+        Returns:
+            (status, bytes written, sha256, duplicate) where status is
+            'downloaded', 'updated' or 'unchanged' and duplicate tells whether
+            the object store already held the content
+        """
+        headers = {}
+        state = None
+        if refresh:
+            state = self.sync.get(job.path)
+            if state is not None:
+                headers = conditional_headers(state)
+
+        part = part_path(job.path)
+        offset = part.stat().st_size if part.exists() else 0
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        sent = time.perf_counter()
+        response = self.session.get(job.url, stream=True, timeout=self.timeout, headers=headers)
+        try:
+            if response.status_code in (429, 503):
+                raise ServerBusy(response.status_code, _retry_after(response.headers.get('Retry-After')))
+            self.rate_control.success(urlparse(job.url).netloc, time.perf_counter() - sent)
+
+            if response.status_code == 304:
+                part.unlink(missing_ok=True)
+                return 'unchanged', 0, None, False
+            if response.status_code == 416:
+                # The partial file does not fit the current resource; start over
+                part.unlink(missing_ok=True)
+                raise IncompleteDownload(f"Range not satisfiable, restarting {job.label}")
+            response.raise_for_status()
+
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type.startswith('text/'):
+                raise InvalidPDF(f"Server sent {content_type} instead of a PDF")
+
+            if state is not None and unchanged(state, response.headers):
+                part.unlink(missing_ok=True)
+                return 'unchanged', 0, None, False
+
+            digest = hashlib.sha256()
+            head = b''
+            content_range = _content_range(response.headers.get('Content-Range'))
+            if response.status_code == 206 and content_range and content_range[0] == offset:
+                expected = content_range[1]
+                with open(part, 'rb') as f:
+                    for block in iter(lambda: f.read(HASH_CHUNK), b''):
+                        digest.update(block)
+                        if len(head) < PDF_WINDOW:
+                            head += block[:PDF_WINDOW - len(head)]
+            else:
+                # Full body (server ignored the Range header)
+                offset, expected = 0, None
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and 'Content-Encoding' not in response.headers:
+                    expected = int(length)
+
+            # Read the body as requests would, decompressing any Content-Encoding
+            response.raw.decode_content = True
+            # Stop early rather than saving a whole error page
+            written = self.writer.write(response.raw, part, offset=offset, expected=expected,
+                                        digest=digest, head=head,
+                                        check_head=lambda head: PDF_HEADER in head)
+            head, tail = written.head, written.tail
+            size = offset + written.written
+
+            if expected is not None and size < expected and PDF_HEADER in head:
+                # Keep the .part file so the next attempt resumes it
+                raise IncompleteDownload(f"Got {size} of {expected} bytes")
+            problem = pdf_problem(head, tail)
+            if problem:
+                part.unlink(missing_ok=True)
+                raise InvalidPDF(problem)
+            if expected is not None and size != expected:
+                raise IncompleteDownload(f"Got {size} of {expected} bytes")
+
+            sha256 = digest.hexdigest()
+            if refresh and sha256 == sha256_file(job.path):
+                # No validators could tell, but the bytes are the ones already on disk
+                part.unlink(missing_ok=True)
+                self._record_validators(job, response.headers, size)
+                return 'unchanged', 0, sha256, False
+            duplicate = self.store.adopt(part, sha256) if self.store is not None else False
+            os.replace(part, job.path)
+            self.writer.finished(job.path)
+            self._record_validators(job, response.headers, size)
+            return ('updated' if refresh else 'downloaded'), size - offset, sha256, duplicate
+        finally:
+            response.close()
+
+    def _record_validators(self, job, headers, size):
+        if self.sync is not None:
+            validators = headers.copy()
+            validators['Content-Length'] = str(size)
+            self.sync.record(job.path, job.url, validators)
+
+
+def add_engine_arguments(parser, workers=4, pool_size=10, workers_option='--workers', scope=None):
+    """
+    Add the --workers/--pool-size/--per-host/--delay options to an argparse parser
+
+    Args:
+        parser: Parser or subparser to add them to
+        workers: Default number of parallel downloads
+        pool_size: Default keep-alive connections per host
+        workers_option: Name of the parallel downloads option, for tools
+                        whose --workers means something else
+        scope: Option name -> phrase appended to its help, saying what the
+               limit applies to (e.g. {'--workers': 'per shard'})
+    """
+    scope = scope or {}
+
+    def text(option, description, default):
+        where = f" {scope[option]}" if option in scope else ''
+        return f'{description}{where} (default: {default})'
+
+    parser.add_argument(
+        workers_option,
+        type=int,
+        default=workers,
+        help=text(workers_option, 'Number of parallel downloads', workers)
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=pool_size,
+        help=text('--pool-size', 'HTTP connections kept alive per host and shared by all downloads', pool_size)
+    )
+    parser.add_argument(
+        '--per-host',
+        type=int,
+        default=2,
+        help=text('--per-host', 'Maximum simultaneous downloads from one host', 2)
+    )
+    parser.add_argument(
+        '--delay',
+        type=float,
+        default=0.5,
+        help=text('--delay', 'Minimum seconds between starting downloads from the same host', 0.5)
+    )
@@ -7,6 +7,16 @@ Downloads all PDFs for specified material type and year
 import sys
 import argparse
 from exam_scraper import ExamScraper
+import http_session
+import metrics
+import rate_control
+import stream_writer
+import tracing
+from download_engine import DownloadEngine, add_engine_arguments
+from sync_state import SyncState
+from object_store import ObjectStore, add_store_argument
+from manifest import Manifest
+from browser_session import BrowserSession
 
 
 def main():
@@ -36,55 +46,101 @@ def main():
         default='downloads',
         help='Output directory (default: downloads)'
     )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Re-check files that already exist with conditional requests and refresh any that changed'
+    )
+    add_store_argument(parser)
+    rate_control.add_adaptive_argument(parser)
+    stream_writer.add_writer_arguments(parser)
+    add_engine_arguments(parser)
+    parser.add_argument(
+        '--url',
+        default='https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104',
+        help='Archive page URL (default: the examinations.ie material archive)'
+    )
     parser.add_argument(
         '--show-dropdowns',
         action='store_true',
         help='Show all available dropdowns and options'
     )
 
+    metrics.add_metrics_arguments(parser)
+    tracing.add_trace_arguments(parser)
+
     args = parser.parse_args()
+    metrics.start_export(args)
+    tracing.start(args)
 
+    http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+
+    # One browser shared by every level, restarted only if it crashes
+    session = BrowserSession()
     scraper = ExamScraper(
-        'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104',
-        args.output
+        args.url,
+        args.output,
+        session=session,
+        engine=DownloadEngine(workers=args.workers, per_host=args.per_host, delay=args.delay,
+                              sync=SyncState(args.output) if args.sync else None,
+                              store=ObjectStore(args.store) if args.store else None,
+                              manifest=Manifest(args.output),
+                              rate_control=rate_control.from_args(args),
+                              writer=stream_writer.from_args(args))
     )
 
-    if args.show_dropdowns:
-        # Just discover and display dropdowns
-        scraper.scrape()
-    else:
-        # Map level argument to actual values
-        level_map = {
-            'lca': 'lca',  # Leaving Certificate Applied
-            'lc': 'lc',    # Leaving Certificate
-            'jc': 'jc',    # Junior Certificate / Cycle
-        }
+    try:
+        if args.show_dropdowns:
+            # Just discover and display dropdowns
+            scraper.scrape()
+        else:
+            # Map level argument to actual values
+            level_map = {
+                'lca': 'lca',  # Leaving Certificate Applied
+                'lc': 'lc',    # Leaving Certificate
+                'jc': 'jc',    # Junior Certificate / Cycle
+            }
 
-        # Download with specified selections
-        print(f"Downloading {args.type} for year {args.year}")
-        print(f"Level: {args.level}")
-        print(f"Output directory: {args.output}")
-        print("="*60)
+            # Download with specified selections
+            print(f"Downloading {args.type} for year {args.year}")
+            print(f"Level: {args.level}")
+            print(f"Output directory: {args.output}")
+            print("="*60)
 
-        if args.level == 'all':
-            # Download for all levels
-            for level_key, level_val in level_map.items():
-                print(f"\n--- Processing {level_key} ---")
+            if args.level == 'all':
+                # Download for all levels
+                for level_key, level_val in level_map.items():
+                    print(f"\n--- Processing {level_key} ---")
+                    selections = {
+                        'MaterialArchive__noTable__sbv__ViewType': args.type,
+                        'MaterialArchive__noTable__sbv__YearSelect': args.year,
+                        'MaterialArchive__noTable__sbv__ExaminationSelect': level_val
+                    }
+                    with tracing.span(level_key, 'level'):
+                        scraper.scrape(dropdown_selections=selections)
+            else:
+                # Download for single level
                 selections = {
                     'MaterialArchive__noTable__sbv__ViewType': args.type,
                     'MaterialArchive__noTable__sbv__YearSelect': args.year,
-                    'MaterialArchive__noTable__sbv__ExaminationSelect': level_val
+                    'MaterialArchive__noTable__sbv__ExaminationSelect': level_map[args.level]
                 }
                 scraper.scrape(dropdown_selections=selections)
-        else:
-            # Download for single level
-            selections = {
-                'MaterialArchive__noTable__sbv__ViewType': args.type,
-                'MaterialArchive__noTable__sbv__YearSelect': args.year,
-                'MaterialArchive__noTable__sbv__ExaminationSelect': level_map[args.level]
-            }
-            scraper.scrape(dropdown_selections=selections)
+    finally:
+        session.close()
 
+    if scraper.engine.sync is not None:
+        print(f"\n✓ Sync: {scraper.engine.total.sync_summary()}")
+    if scraper.engine.store is not None:
+        print(f"\n✓ Store: {scraper.engine.total.dedup_summary()}")
+        print(f"✓ Store: {scraper.engine.store.describe_stats()}")
+    print(f"\n✓ Manifest: {scraper.engine.manifest.describe_stats()}")
+    if args.adaptive:
+        print(f"\n✓ Rate: {scraper.engine.rate_control.describe_stats()}")
+    print(f"\n✓ Connections: {http_session.describe_stats()}")
+    metrics.finish()
+    tracing.finish()
+    scraper.engine.manifest.close()
     print("\nDone!")
 
 
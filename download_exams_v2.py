@@ -5,83 +5,105 @@ Structure: Examination/Subject/Level/YEAR_filename.pdf
 """
 
 import sys
-import time
 import re
 import argparse
 from pathlib import Path
-from exam_scraper import ExamScraper
-from selenium import webdriver
+from exam_scraper import ExamScraper, get_dropdown_options, paper_level
+import http_session
+import metrics
+import rate_control
+import stream_writer
+import tracing
+from download_engine import DownloadEngine, DownloadJob, add_engine_arguments
+from sync_state import SyncState
+from object_store import ObjectStore, add_store_argument
+from manifest import Manifest
+from pipeline import DEFAULT_QUEUE_SIZE, Pipeline
+from browser_session import BrowserSession
+from archive_client import BACKENDS, open_archive
+from catalog_cache import CachedArchive, add_cache_arguments, wrap_archive
+from availability_matrix import TYPE_TAGS, material_types_arg
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.chrome.service import Service
 
 
-def get_all_subjects(base_url, material_type, year, cert_level):
-    """Get list of all available subjects for given parameters"""
+def get_all_subjects(base_url, material_type, year, cert_level, session=None, archive=None):
+    """
+    Get list of all available subjects for given parameters
+
+    Args:
+        session: Shared BrowserSession to reuse. If None, a browser is
+                 started for this call and quit afterwards.
+        archive: Discovery backend from archive_client.open_archive. When
+                 set, the subject list comes from it instead of the browser.
+    """
     print(f"Fetching list of available subjects for {cert_level.upper()} {year}...")
 
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
+    if archive is not None:
+        with metrics.phase('list_subjects'):
+            return archive.get_options({
+                VIEW_TYPE_SELECT: material_type,
+                YEAR_SELECT: str(year),
+                EXAMINATION_SELECT: cert_level,
+            }, SUBJECT_SELECT)
 
-    local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
-    if local_driver.exists():
-        service = Service(executable_path=str(local_driver))
-        driver = webdriver.Chrome(service=service, options=options)
-    else:
-        driver = webdriver.Chrome(options=options)
+    own_session = session is None
+    if own_session:
+        session = BrowserSession()
 
     try:
-        driver.get(base_url)
-        time.sleep(2)
+        with metrics.phase('list_subjects'):
+            waiter = session.waiter()
+            driver = session.load_archive(base_url, waiter)
 
-        # Accept terms
-        try:
-            checkbox = driver.find_element(By.CSS_SELECTOR, 'input[type="checkbox"]')
-            if not checkbox.is_selected():
-                checkbox.click()
-                time.sleep(1)
-        except:
-            pass
-
-        # Select material type
-        type_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__ViewType')
-        Select(type_dropdown).select_by_value(material_type)
-        time.sleep(2)
-
-        # Select year
-        year_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__YearSelect')
-        Select(year_dropdown).select_by_value(str(year))
-        time.sleep(2)
-
-        # Select level
-        level_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__ExaminationSelect')
-        Select(level_dropdown).select_by_value(cert_level)
-        time.sleep(2)
-
-        # Get subjects
-        subject_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__SubjectSelect')
-        select = Select(subject_dropdown)
-        subjects = [(opt.get_attribute('value'), opt.text)
-                   for opt in select.options if opt.get_attribute('value')]
+            # Select material type, year and level, waiting for each to repopulate the next
+            waiter.select('MaterialArchive__noTable__sbv__ViewType', material_type)
+            waiter.select('MaterialArchive__noTable__sbv__YearSelect', str(year))
+            waiter.select('MaterialArchive__noTable__sbv__ExaminationSelect', cert_level)
 
+            # Get subjects
+            subject_dropdown = driver.find_element(By.ID, 'MaterialArchive__noTable__sbv__SubjectSelect')
+            subjects = get_dropdown_options(subject_dropdown)
+
+        waiter.report()
         return subjects
 
     finally:
-        driver.quit()
+        if own_session:
+            session.close()
+
+
+def list_years(archive, material_type):
+    """
+    Years the archive offers for a material type, oldest first
+
+    Read from the YearSelect dropdown (and kept in the catalog cache when the
+    archive is cached), so new years are picked up as soon as they are listed.
+    """
+    with metrics.phase('list_years'):
+        options = archive.get_options({VIEW_TYPE_SELECT: material_type}, YEAR_SELECT)
+    return sorted(value for value, _ in options)
+
+
+def offers_cert(archive, material_type, year, cert_level):
+    """Whether the ExaminationSelect dropdown lists cert_level for a year"""
+    with metrics.phase('list_levels'):
+        options = archive.get_options({VIEW_TYPE_SELECT: material_type, YEAR_SELECT: str(year)},
+                                      EXAMINATION_SELECT)
+    return cert_level in [value for value, _ in options]
 
 
 class EnhancedExamScraper(ExamScraper):
     """Extended scraper with better file organization"""
 
-    def __init__(self, base_url, download_dir, year, exam_level, subject_name, language_filter=None):
-        # Don't call parent __init__ yet, we need to set up directory first
-        self.base_url = base_url
+    def __init__(self, base_url, download_dir, year, exam_level, subject_name, language_filter=None,
+                 driver=None, session=None, archive=None, engine=None, type_tag=None):
         self.year = year
         self.exam_level = exam_level  # LC, JC, LCA
         self.subject_name = subject_name
         self.language_filter = language_filter or ['EV', 'BV']  # Default: English and Bilingual only
+        # Filename prefix telling material types apart when they share a level folder
+        self.type_tag = type_tag
 
         # Create directory structure: Examination/Subject/Level/
         base_path = Path(download_dir)
@@ -97,42 +119,15 @@ class EnhancedExamScraper(ExamScraper):
         self.base_download_dir = base_path / exam_dir / subject_name
         self.base_download_dir.mkdir(parents=True, exist_ok=True)
 
-        # We'll set download_dir per level when we find PDFs
-        self.download_dir = self.base_download_dir
-        self.download_dir.mkdir(exist_ok=True)
-
-        # Now initialize the rest from parent
-        from selenium import webdriver
-        from selenium.webdriver.support.ui import WebDriverWait
-
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-
-        local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
-        if local_driver.exists():
-            from selenium.webdriver.chrome.service import Service
-            service = Service(executable_path=str(local_driver))
-            self.driver = webdriver.Chrome(service=service, options=options)
-        else:
-            self.driver = webdriver.Chrome(options=options)
-
-        self.wait = WebDriverWait(self.driver, 10)
+        # Parent sets download_dir and the browser session
+        super().__init__(base_url, self.base_download_dir, driver=driver, session=session,
+                         archive=archive, engine=engine,
+                         meta={'year': year, 'cert': exam_level.lower(), 'subject': subject_name})
 
     def organize_file(self, pdf_info):
         """Determine the level subdirectory and filename with year prefix"""
-        text = pdf_info['text'].lower()
-
         # Determine level from text
-        if 'higher' in text or 'higher level' in text:
-            level_dir = 'Higher'
-        elif 'ordinary' in text or 'ordinary level' in text:
-            level_dir = 'Ordinary'
-        elif 'foundation' in text:
-            level_dir = 'Foundation'
-        else:
-            level_dir = 'Other'
+        level_dir = paper_level(pdf_info['text'])
 
         # Create level directory
         level_path = self.base_download_dir / level_dir
@@ -146,124 +141,84 @@ class EnhancedExamScraper(ExamScraper):
             if not filename.endswith('.pdf'):
                 filename = f"{filename}.pdf"
 
+        if self.type_tag:
+            filename = f"{self.type_tag}_{filename}"
+
         # Add year prefix if not already there
         if not filename.startswith(str(self.year)):
             filename = f"{self.year}_{filename}"
 
         return level_path / filename
 
+    def discover_jobs(self, dropdown_selections=None):
+        """
+        Find this subject's PDFs and turn them into organized DownloadJobs
+
+        Returns:
+            List of DownloadJobs (empty if nothing matched)
+        """
+        with metrics.phase('discovery'):
+            if self.archive is not None and dropdown_selections:
+                pdf_links = self.archive.find_pdf_links(dropdown_selections)
+            else:
+                print(f"Loading page: {self.base_url}")
+                self.session.load_archive(self.base_url, self.waiter)
+
+                # Apply selections
+                if dropdown_selections:
+                    for selector, value in dropdown_selections.items():
+                        try:
+                            dropdown = self.driver.find_element(
+                                By.CSS_SELECTOR,
+                                f'select[id="{selector}"], select[name="{selector}"]'
+                            )
+                            self.select_dropdown_option(dropdown, value)
+                        except Exception as e:
+                            print(f"✗ Error selecting {selector}: {e}")
+
+                # Find PDF links
+                pdf_links = self.find_pdf_links()
+
+        if not pdf_links:
+            print("No PDF links found")
+            return []
+
+        print(f"Found {len(pdf_links)} PDF link(s)")
+
+        # Filter by language
+        if self.language_filter:
+            original_count = len(pdf_links)
+            pdf_links = [
+                pdf for pdf in pdf_links
+                if any(f"({lang})" in pdf['text'] or f"({lang.lower()})" in pdf['text'].lower()
+                       for lang in self.language_filter)
+            ]
+            if original_count != len(pdf_links):
+                print(f"Filtered to {len(pdf_links)} PDF(s) based on language: {', '.join(self.language_filter)}")
+
+        if not pdf_links:
+            print("No PDFs match the language filter")
+            return []
+
+        # Build download jobs with new organization
+        jobs = []
+        for pdf in pdf_links:
+            filepath = self.organize_file(pdf)
+            jobs.append(DownloadJob(pdf['url'], filepath,
+                                    label=f"{filepath.parent.name}/{filepath.name}",
+                                    meta=self.job_meta(pdf, dropdown_selections)))
+        return jobs
+
     def scrape(self, dropdown_selections=None):
         """Override scrape to use new organization"""
         try:
-            print(f"Loading page: {self.base_url}")
-            self.driver.get(self.base_url)
-            time.sleep(2)
-
-            # Accept terms
-            try:
-                checkbox = self.driver.find_element(By.CSS_SELECTOR, 'input[type="checkbox"]')
-                if not checkbox.is_selected():
-                    checkbox.click()
-                    time.sleep(1)
-            except:
-                pass
-
-            # Apply selections
-            if dropdown_selections:
-                for selector, value in dropdown_selections.items():
-                    try:
-                        time.sleep(1)
-                        dropdown = self.driver.find_element(
-                            By.CSS_SELECTOR,
-                            f'select[id="{selector}"], select[name="{selector}"]'
-                        )
-                        from selenium.webdriver.support.ui import Select
-                        Select(dropdown).select_by_value(value)
-                        time.sleep(2)
-                    except Exception as e:
-                        print(f"✗ Error selecting {selector}: {e}")
-
-            # Find PDF links
-            pdf_links = self.find_pdf_links()
-
-            if not pdf_links:
-                print("No PDF links found")
-                return
-
-            print(f"Found {len(pdf_links)} PDF link(s)")
-
-            # Filter by language
-            if self.language_filter:
-                original_count = len(pdf_links)
-                pdf_links = [
-                    pdf for pdf in pdf_links
-                    if any(f"({lang})" in pdf['text'] or f"({lang.lower()})" in pdf['text'].lower()
-                           for lang in self.language_filter)
-                ]
-                if original_count != len(pdf_links):
-                    print(f"Filtered to {len(pdf_links)} PDF(s) based on language: {', '.join(self.language_filter)}")
-
-            if not pdf_links:
-                print("No PDFs match the language filter")
-                return
-
-            # Download PDFs with new organization
-            for pdf in pdf_links:
-                filepath = self.organize_file(pdf)
-
-                # Skip if already downloaded
-                if filepath.exists():
-                    print(f"  ✓ Already exists: {filepath.name}")
-                    continue
-
-                # Download with retry logic
-                import requests
-                from requests.adapters import HTTPAdapter
-                from urllib3.util.retry import Retry
-
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        # Create session with retry strategy
-                        session = requests.Session()
-                        retry_strategy = Retry(
-                            total=3,
-                            backoff_factor=2,
-                            status_forcelist=[429, 500, 502, 503, 504],
-                        )
-                        adapter = HTTPAdapter(max_retries=retry_strategy)
-                        session.mount("http://", adapter)
-                        session.mount("https://", adapter)
-
-                        # Add delay between downloads to avoid rate limiting
-                        if attempt > 0:
-                            wait_time = 5 * (attempt + 1)
-                            print(f"  ⏳ Retry {attempt + 1}/{max_retries}, waiting {wait_time}s...")
-                            time.sleep(wait_time)
-
-                        response = session.get(pdf['url'], stream=True, timeout=30)
-                        response.raise_for_status()
-
-                        with open(filepath, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                f.write(chunk)
-
-                        print(f"  ✓ Downloaded: {filepath.parent.name}/{filepath.name}")
-
-                        # Configurable delay between successful downloads
-                        time.sleep(2)  # Default 2 seconds between files
-                        break
-
-                    except requests.exceptions.ConnectionError as e:
-                        if attempt == max_retries - 1:
-                            print(f"  ✗ Connection failed after {max_retries} attempts: {filepath.name}")
-                        continue
-                    except Exception as e:
-                        print(f"  ✗ Error downloading {filepath.name}: {e}")
-                        break
+            jobs = self.discover_jobs(dropdown_selections)
+            if jobs:
+                self.download_jobs(jobs)
 
         finally:
-            self.driver.quit()
+            self.report_waits()
+            self.close()
 
 
 def main():
@@ -291,7 +246,7 @@ def main():
     parser.add_argument(
         '--year',
         type=str,
-        help='Specific year (e.g., 2024) or leave blank for all years'
+        help='Specific year (e.g., 2024) or leave blank for every year the archive lists'
     )
     parser.add_argument(
         '--year-range',
@@ -300,9 +255,11 @@ def main():
     )
     parser.add_argument(
         '--type',
-        choices=['exampapers', 'markingschemes', 'deferredexams', 'deferredmarkingschemes'],
-        default='exampapers',
-        help='Material type (default: exampapers)'
+        type=material_types_arg,
+        default=['exampapers'],
+        help='Material type: exampapers, markingschemes, deferredexams, deferredmarkingschemes, '
+             'a comma-separated list of them, or all. Several types are fetched in one pass '
+             'and saved side by side (default: exampapers)'
     )
     parser.add_argument(
         '--output',
@@ -310,10 +267,31 @@ def main():
         help='Output base directory (default: downloads)'
     )
     parser.add_argument(
-        '--delay',
+        '--sync',
+        action='store_true',
+        help='Re-check files that already exist with conditional requests and refresh any that changed'
+    )
+    add_store_argument(parser)
+    rate_control.add_adaptive_argument(parser)
+    stream_writer.add_writer_arguments(parser)
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f'Discovered files allowed to wait for a download worker (default: {DEFAULT_QUEUE_SIZE})'
+    )
+    add_engine_arguments(parser)
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default='auto',
+        help='Discovery backend: http (no browser), selenium, or auto (http, falling back to selenium). Default: auto'
+    )
+    parser.add_argument(
+        '--wait-timeout',
         type=float,
-        default=2.0,
-        help='Delay in seconds between downloads (default: 2.0, increase if getting connection errors)'
+        default=10.0,
+        help='Maximum seconds to wait for the page to update after each dropdown selection (default: 10)'
     )
     parser.add_argument(
         '--language',
@@ -322,20 +300,63 @@ def main():
         help='Language versions to download: EV (English), IV (Irish), BV (Bilingual), or "all". Comma-separated. Default: EV,BV'
     )
 
+    parser.add_argument(
+        '--url',
+        default='https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104',
+        help='Archive page URL (default: the examinations.ie material archive)'
+    )
+
+    add_cache_arguments(parser)
+    metrics.add_metrics_arguments(parser)
+    tracing.add_trace_arguments(parser)
+
     args = parser.parse_args()
+    metrics.start_export(args)
+    tracing.start(args)
 
-    # Determine years to download
-    years = []
+    http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+
+    base_url = args.url
+
+    # One browser for the whole run, restarted only if it crashes
+    session = BrowserSession(wait_timeout=args.wait_timeout)
+    archive = wrap_archive(open_archive(args.backend, base_url, session), args)
+
+    material_types = args.type
+    multi_type = len(material_types) > 1
+
+    requested = None
     if args.year:
-        years = [args.year]
+        requested = [args.year]
     elif args.year_range:
         start, end = args.year_range.split('-')
-        years = [str(y) for y in range(int(start), int(end) + 1)]
-    else:
-        # All available years
-        years = [str(y) for y in range(1995, 2026)]
+        requested = [str(y) for y in range(int(start), int(end) + 1)]
 
-    base_url = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
+    # Plan only the years the archive actually lists, type by type, so one
+    # pass walks each material type's part of the cascade once
+    schedule = []
+    for material_type in material_types:
+        try:
+            offered = list_years(archive, material_type)
+        except Exception as e:
+            offered = None
+            print(f"✗ Could not read the archive's year list for {material_type}: {e}")
+
+        type_years = requested if requested is not None else (offered or [])
+        if offered:
+            skipped = [year for year in type_years if year not in offered]
+            type_years = [year for year in type_years if year in offered]
+            if skipped:
+                print(f"Skipping {len(skipped)} {material_type} year(s) the archive does not list: "
+                      f"{', '.join(skipped)}")
+        schedule += [(material_type, year) for year in type_years]
+
+    years = sorted({year for _, year in schedule})
+    if not years:
+        print("✗ No years to download")
+        archive.close()
+        session.close()
+        sys.exit(1)
 
     # Parse language filter
     if args.language.lower() == 'all':
@@ -343,7 +364,7 @@ def main():
     else:
         language_filter = [lang.strip().upper() for lang in args.language.split(',')]
 
-    print(f"Downloading {args.type} for {args.cert.upper()} {args.subject}")
+    print(f"Downloading {', '.join(material_types)} for {args.cert.upper()} {args.subject}")
     print(f"Years: {years[0]}-{years[-1]} ({len(years)} years)")
     print(f"Languages: {', '.join(language_filter) if language_filter else 'All'}")
     print(f"Output: {args.output}")
@@ -351,60 +372,110 @@ def main():
 
     total_downloaded = 0
 
-    for year in years:
-        print(f"\n{'='*60}")
-        print(f"Processing year: {year}")
-        print('='*60)
+    engine = DownloadEngine(workers=args.workers, per_host=args.per_host, delay=args.delay,
+                            sync=SyncState(args.output) if args.sync else None,
+                            store=ObjectStore(args.store) if args.store else None,
+                            manifest=Manifest(args.output),
+                            rate_control=rate_control.from_args(args),
+                            writer=stream_writer.from_args(args))
+
+    def discover():
+        """Yield the DownloadJobs of every matching subject, year by year"""
+        nonlocal total_downloaded
+        for material_type, year in schedule:
+            with tracing.span(year, 'year', material_type=material_type):
+                print(f"\n{'='*60}")
+                print(f"Processing year: {year}" + (f" ({material_type})" if multi_type else ""))
+                print('='*60)
+
+                # Get subjects for this year
+                try:
+                    if not offers_cert(archive, material_type, year, args.cert):
+                        print(f"✗ {args.cert.upper()} is not offered for {year}")
+                        continue
+                    subjects = get_all_subjects(base_url, material_type, year, args.cert,
+                                                session=session, archive=archive)
+                except Exception as e:
+                    print(f"✗ Error fetching subjects for {year}: {e}")
+                    continue
 
-        # Get subjects for this year
-        try:
-            subjects = get_all_subjects(base_url, args.type, year, args.cert)
-        except Exception as e:
-            print(f"✗ Error fetching subjects for {year}: {e}")
-            continue
-
-        # Find matching subject
-        matching_subjects = [(v, t) for v, t in subjects
-                            if args.subject.lower() in t.lower() or args.subject.lower() in v.lower()]
-
-        if not matching_subjects:
-            print(f"✗ Subject '{args.subject}' not found for {year}")
-            continue
-
-        # Download for each matching subject
-        for subject_value, subject_text in matching_subjects:
-            print(f"\nDownloading: {subject_text}")
-
-            try:
-                scraper = EnhancedExamScraper(
-                    base_url,
-                    args.output,
-                    year,
-                    args.cert,
-                    subject_text.replace('/', '_'),
-                    language_filter=language_filter
-                )
-
-                selections = {
-                    'MaterialArchive__noTable__sbv__ViewType': args.type,
-                    'MaterialArchive__noTable__sbv__YearSelect': year,
-                    'MaterialArchive__noTable__sbv__ExaminationSelect': args.cert,
-                    'MaterialArchive__noTable__sbv__SubjectSelect': subject_value
-                }
-
-                scraper.scrape(dropdown_selections=selections)
-                total_downloaded += 1
-
-            except Exception as e:
-                print(f"✗ Error processing {subject_text} for {year}: {e}")
-
-        # Longer delay between years to avoid rate limiting
-        if len(years) > 1:
-            print(f"⏳ Waiting 5 seconds before next year...")
-            time.sleep(5)
+                # Find matching subject
+                matching_subjects = [(v, t) for v, t in subjects
+                                    if args.subject.lower() in t.lower() or args.subject.lower() in v.lower()]
+
+                if not matching_subjects:
+                    print(f"✗ Subject '{args.subject}' not found for {year}")
+                    continue
+
+                # Queue the files of each matching subject
+                for subject_value, subject_text in matching_subjects:
+                    print(f"\nDiscovering: {subject_text} {year}")
+
+                    try:
+                        scraper = EnhancedExamScraper(
+                            base_url,
+                            args.output,
+                            year,
+                            args.cert,
+                            subject_text.replace('/', '_'),
+                            language_filter=language_filter,
+                            session=session,
+                            archive=archive,
+                            engine=engine,
+                            type_tag=TYPE_TAGS[material_type] if multi_type else None
+                        )
+
+                        selections = {
+                            'MaterialArchive__noTable__sbv__ViewType': material_type,
+                            'MaterialArchive__noTable__sbv__YearSelect': year,
+                            'MaterialArchive__noTable__sbv__ExaminationSelect': args.cert,
+                            'MaterialArchive__noTable__sbv__SubjectSelect': subject_value
+                        }
+
+                        with tracing.span(subject_text, 'subject', year=year):
+                            jobs = scraper.discover_jobs(selections)
+                        scraper.report_waits()
+                        total_downloaded += 1
+
+                    except Exception as e:
+                        print(f"✗ Error processing {subject_text} for {year}: {e}")
+                        continue
+
+                    yield from jobs
+
+    # Discovery runs on its own thread while the engine downloads what it found
+    pipeline = Pipeline(engine, queue_size=args.queue_size)
+    try:
+        report = pipeline.run(discover)
+    finally:
+        archive.close()
+        session.close()
 
     print("\n" + "="*60)
     print(f"✓ Complete! Processed {total_downloaded} year/subject combinations")
+    print(f"✓ Downloads: {engine.total.summary()}")
+    print(f"✓ Pipeline: {pipeline.describe_stats(report)}")
+    if engine.sync is not None:
+        print(f"✓ Sync: {engine.total.sync_summary()}")
+    if engine.store is not None:
+        print(f"✓ Store: {engine.total.dedup_summary()}")
+        print(f"✓ Store: {engine.store.describe_stats()}")
+    if args.adaptive:
+        print(f"✓ Rate: {engine.rate_control.describe_stats()}")
+    if engine.writer.fsync is not None:
+        print(f"✓ Fsync: {engine.writer.fsync.describe_stats()}")
+    print(f"✓ Connections: {http_session.describe_stats()}")
+    metrics.finish()
+    tracing.finish()
+    if isinstance(archive, CachedArchive):
+        print(f"✓ Catalog: {archive.cache.describe_stats()}")
+
+    on_record = engine.manifest.query(cert=args.cert, subject=args.subject,
+                                      years=(years[0], years[-1]),
+                                      material_type=None if multi_type else material_types[0])
+    print(f"✓ Manifest: {len(on_record)} {args.cert.upper()} {args.subject} file(s) "
+          f"for {years[0]}-{years[-1]} on record ({engine.manifest.describe_stats()} in total)")
+    engine.manifest.close()
 
     # Show directory structure
     exam_names = {
@@ -5,131 +5,242 @@ Downloads PDFs from the State Examination Commission archive
 """
 
 import os
-import time
 import re
 from pathlib import Path
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import requests
+from selenium.common.exceptions import TimeoutException
+import metrics
+from browser_session import BrowserSession
+from cascade_wait import (
+    CascadeWaiter, VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT,
+)
+from download_engine import DownloadEngine, DownloadJob
+
+
+# Reads every option of a select in one round trip. o.value matches
+# get_attribute('value'); o.text is the whitespace-collapsed option text.
+_OPTIONS_JS = """
+return Array.prototype.map.call(arguments[0].options, function (o) {
+    return [o.value, o.text];
+});
+"""
+
+# Collects the PDF links and ?fp= download rows in one round trip,
+# following the same two-step search as the per-element version did
+_PDF_LINKS_JS = """
+var links = [], i;
+var anchors = document.getElementsByTagName('a');
+for (i = 0; i < anchors.length; i++) {
+    var href = anchors[i].href;
+    if (href && href.toLowerCase().slice(-4) === '.pdf') {
+        links.push({url: href, text: anchors[i].innerText});
+    }
+}
+if (links.length) { return {pdf: links, rows: []}; }
+
+var rows = [], trs = document.getElementsByTagName('tr');
+for (i = 0; i < trs.length; i++) {
+    var cells = trs[i].getElementsByTagName('td');
+    if (cells.length < 2) { continue; }
+    var link = cells[1].getElementsByTagName('a')[0];
+    if (!link) { continue; }
+    var hidden = trs[i].querySelector('input[type="hidden"][name="fileid"]');
+    rows.push({
+        desc: cells[0].innerText,
+        url: link.href,
+        hint: hidden ? hidden.value : null
+    });
+}
+return {pdf: [], rows: rows};
+"""
+
+
+def get_dropdown_options(dropdown_element):
+    """Get all options from a dropdown/select element"""
+    options = dropdown_element.parent.execute_script(_OPTIONS_JS, dropdown_element)
+    return [(value, text) for value, text in options if value]
+
+
+def find_pdf_links(driver):
+    """Find all PDF links on the page currently loaded in driver"""
+    with metrics.phase('find_pdf_links'):
+        found = driver.execute_script(_PDF_LINKS_JS)
+
+    # First try: Look for links with .pdf in URL
+    pdf_links = [{'url': link['url'], 'text': (link['text'] or '').strip()}
+                 for link in found['pdf']]
+
+    # Second try: Look for exam material download links (with ?fp= parameter)
+    # These are the actual download links on examinations.ie
+    if not pdf_links:
+        for row in found['rows']:
+            desc = (row['desc'] or '').strip()
+            href = row['url']
+            if href and '?fp=' in href and desc:
+                pdf_links.append({
+                    'url': href,
+                    'text': desc,
+                    'filename_hint': row['hint']
+                })
+
+    return pdf_links
+
+
+def paper_level(text):
+    """Higher, Ordinary, Foundation or Other from a PDF description"""
+    text = text.lower()
+    if 'higher' in text:
+        return 'Higher'
+    if 'ordinary' in text:
+        return 'Ordinary'
+    if 'foundation' in text:
+        return 'Foundation'
+    return 'Other'
+
+
+def paper_language(text):
+    """Language code of a PDF description such as 'Paper One (EV)', or None"""
+    match = re.search(r'\(([A-Za-z]{2})\)', text)
+    return match.group(1).upper() if match else None
 
 
 class ExamScraper:
-    def __init__(self, base_url, download_dir="downloads"):
+    def __init__(self, base_url, download_dir="downloads", driver=None, session=None,
+                 archive=None, engine=None, meta=None):
         """
         Initialize the exam scraper
 
         Args:
             base_url: URL to the exam archive page
             download_dir: Directory to save downloaded PDFs
+            driver: Existing WebDriver to reuse instead of starting Chrome
+            session: Shared BrowserSession to reuse instead of starting Chrome
+            archive: Discovery backend from archive_client.open_archive. When
+                     set, PDF links for explicit selections come from it.
+            engine: Shared DownloadEngine (default: a new one with default limits)
+            meta: Details added to every file's manifest entry (e.g. subject name)
         """
         self.base_url = base_url
+        self.meta = meta or {}
+        self.archive = archive
+        self.engine = engine or DownloadEngine()
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
 
-        # Setup Selenium with Chrome
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')  # Run in background
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-
-        # Check for local chromedriver first
-        local_driver = Path(__file__).parent / 'drivers' / 'chromedriver'
-        if local_driver.exists():
-            from selenium.webdriver.chrome.service import Service
-            service = Service(executable_path=str(local_driver))
-            self.driver = webdriver.Chrome(service=service, options=options)
-        else:
-            # Fall back to system chromedriver
-            self.driver = webdriver.Chrome(options=options)
-
-        self.wait = WebDriverWait(self.driver, 10)
+        # Only quit the browser at the end of a scrape if we started it
+        self.owns_session = driver is None and session is None
+        self.session = session or BrowserSession(driver)
+        self._wait = None
+        self._waiter = None
+
+    @property
+    def driver(self):
+        """Live WebDriver from the browser session (started on first use)"""
+        return self.session.driver
+
+    @property
+    def wait(self):
+        """WebDriverWait bound to the current driver"""
+        driver = self.driver
+        if self._wait is None or self._wait._driver is not driver:
+            self._wait = WebDriverWait(driver, self.session.wait_timeout,
+                                       poll_frequency=0.05)
+        return self._wait
+
+    @property
+    def waiter(self):
+        """CascadeWaiter built on self.wait; keeps timings across a browser restart"""
+        wait = self.wait
+        if self._waiter is None:
+            self._waiter = CascadeWaiter(wait)
+        elif self._waiter.wait is not wait:
+            self._waiter.wait = wait
+            self._waiter.driver = wait._driver
+        return self._waiter
+
+    def report_waits(self):
+        """Print how long page-update waits took since the last report"""
+        if self._waiter is not None:
+            self._waiter.report()
+            self._waiter.timings = []
+
+    def close(self):
+        """Quit the browser if this scraper started it"""
+        if self.owns_session:
+            self.session.close()
 
     def get_dropdown_options(self, dropdown_element):
         """Get all options from a dropdown/select element"""
-        select = Select(dropdown_element)
-        return [(option.get_attribute('value'), option.text)
-                for option in select.options if option.get_attribute('value')]
+        return get_dropdown_options(dropdown_element)
 
     def select_dropdown_option(self, dropdown_element, value):
-        """Select an option from a dropdown by value"""
-        select = Select(dropdown_element)
-        select.select_by_value(value)
-        time.sleep(0.5)  # Wait for any dynamic updates
+        """Select an option from a dropdown by value and wait for the page to update
+
+        Returns:
+            Seconds spent waiting for the update
+        """
+        return self.waiter.select(dropdown_element, value)
 
     def find_pdf_links(self):
         """Find all PDF links on the current page"""
-        pdf_links = []
-
-        # First try: Look for links with .pdf in URL
-        links = self.driver.find_elements(By.TAG_NAME, 'a')
-        for link in links:
-            href = link.get_attribute('href')
-            if href and href.lower().endswith('.pdf'):
-                text = link.text.strip()
-                pdf_links.append({
-                    'url': href,
-                    'text': text
-                })
-
-        # Second try: Look for exam material download links (with ?fp= parameter)
-        # These are the actual download links on examinations.ie
-        if not pdf_links:
-            rows = self.driver.find_elements(By.CSS_SELECTOR, 'tr')
-            for row in rows:
-                try:
-                    # Find the description cell and download link
-                    cells = row.find_elements(By.TAG_NAME, 'td')
-                    if len(cells) >= 2:
-                        desc = cells[0].text.strip()
-                        link = cells[1].find_element(By.TAG_NAME, 'a')
-                        href = link.get_attribute('href')
-
-                        if href and '?fp=' in href and desc:
-                            # Get the actual filename from hidden input if available
-                            try:
-                                hidden_input = row.find_element(
-                                    By.CSS_SELECTOR,
-                                    'input[type="hidden"][name="fileid"]'
-                                )
-                                filename_hint = hidden_input.get_attribute('value')
-                            except:
-                                filename_hint = None
-
-                            pdf_links.append({
-                                'url': href,
-                                'text': desc,
-                                'filename_hint': filename_hint
-                            })
-                except:
-                    continue
-
-        return pdf_links
+        return find_pdf_links(self.driver)
 
     def download_pdf(self, url, filename):
-        """Download a PDF file"""
-        filepath = self.download_dir / filename
-
-        # Skip if already downloaded
-        if filepath.exists():
-            print(f"  ✓ Already exists: {filename}")
-            return True
-
-        try:
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        """Download a single PDF file into download_dir"""
+        return self.engine.fetch(DownloadJob(url, self.download_dir / filename)).ok
+
+    def job_meta(self, pdf, selections=None):
+        """Manifest details of one PDF link found with the given selections"""
+        selections = selections or {}
+        meta = {
+            'text': pdf['text'],
+            'filename_hint': pdf.get('filename_hint'),
+            'material_type': selections.get(VIEW_TYPE_SELECT),
+            'year': selections.get(YEAR_SELECT),
+            'cert': selections.get(EXAMINATION_SELECT),
+            'subject_code': selections.get(SUBJECT_SELECT),
+            'level': paper_level(pdf['text']),
+            'language': paper_language(pdf['text']),
+        }
+        meta.update(self.meta)
+        return meta
+
+    def download_links(self, pdf_links, selections=None):
+        """Download every link found by find_pdf_links into download_dir"""
+        return self.download_jobs(self.link_jobs(pdf_links, selections))
+
+    def link_jobs(self, pdf_links, selections=None, tag=None):
+        """
+        DownloadJobs saving links found by find_pdf_links into download_dir
 
-            print(f"  ✓ Downloaded: {filename}")
-            return True
-        except Exception as e:
-            print(f"  ✗ Error downloading {filename}: {e}")
-            return False
+        Args:
+            tag: Prefix for every filename (e.g. the material type when
+                 several types share download_dir)
+        """
+        jobs = []
+        for pdf in pdf_links:
+            # Use filename_hint if available, otherwise sanitize the text
+            if pdf.get('filename_hint'):
+                filename = pdf['filename_hint']
+            else:
+                filename = self.sanitize_filename(pdf['text']) or 'document'
+                if not filename.endswith('.pdf'):
+                    filename = f"{filename}.pdf"
+            if tag:
+                filename = f"{tag}_{filename}"
+            jobs.append(DownloadJob(pdf['url'], self.download_dir / filename,
+                                    meta=self.job_meta(pdf, selections)))
+        return jobs
+
+    def download_jobs(self, jobs):
+        """Run DownloadJobs through the download engine and print a summary"""
+        print("\nDownloading PDFs...")
+        with metrics.phase('download'):
+            report = self.engine.run(jobs)
+        print(f"✓ {report.summary()}")
+        return report
 
     def sanitize_filename(self, text):
         """Create a safe filename from text"""
@@ -148,22 +259,18 @@ class ExamScraper:
                                 If None, will attempt to find and list all dropdowns
         """
         try:
+            if self.archive is not None and dropdown_selections:
+                with metrics.phase('discovery'):
+                    pdf_links = self.archive.find_pdf_links(dropdown_selections)
+                if not pdf_links:
+                    print("No PDF links found")
+                    return
+                print(f"\nFound {len(pdf_links)} PDF link(s)")
+                self.download_links(pdf_links, dropdown_selections)
+                return
+
             print(f"Loading page: {self.base_url}")
-            self.driver.get(self.base_url)
-
-            # Wait for page to load
-            time.sleep(2)
-
-            # Check for terms and conditions checkbox
-            try:
-                checkbox = self.driver.find_element(By.CSS_SELECTOR,
-                    'input[type="checkbox"]')
-                if not checkbox.is_selected():
-                    checkbox.click()
-                    print("✓ Accepted terms and conditions")
-                    time.sleep(1)
-            except NoSuchElementException:
-                print("No terms checkbox found")
+            self.session.load_archive(self.base_url, self.waiter)
 
             # Find all dropdown elements
             dropdowns = self.driver.find_elements(By.TAG_NAME, 'select')
@@ -192,26 +299,22 @@ class ExamScraper:
                 for selector, value in dropdown_selections.items():
                     try:
                         # Re-find dropdowns after each selection (page may update)
-                        time.sleep(1)
                         dropdowns = self.driver.find_elements(By.TAG_NAME, 'select')
 
                         if selector.isdigit():
                             # Select by index
                             idx = int(selector)
                             if idx < len(dropdowns):
-                                self.select_dropdown_option(dropdowns[idx], value)
-                                print(f"✓ Selected option '{value}' in dropdown {idx}")
+                                waited = self.select_dropdown_option(dropdowns[idx], value)
+                                print(f"✓ Selected option '{value}' in dropdown {idx} ({waited:.2f}s)")
                         else:
                             # Select by id or name
                             dropdown = self.driver.find_element(
                                 By.CSS_SELECTOR,
                                 f'select[id="{selector}"], select[name="{selector}"]'
                             )
-                            self.select_dropdown_option(dropdown, value)
-                            print(f"✓ Selected option '{value}' in '{selector}'")
-
-                        # Wait for page to update after selection
-                        time.sleep(2)
+                            waited = self.select_dropdown_option(dropdown, value)
+                            print(f"✓ Selected option '{value}' in '{selector}' ({waited:.2f}s)")
                     except Exception as e:
                         print(f"✗ Error selecting {selector}: {e}")
 
@@ -221,7 +324,6 @@ class ExamScraper:
 
             if not pdf_links:
                 # Check if there are more dropdowns to select
-                time.sleep(1)
                 dropdowns = self.driver.find_elements(By.TAG_NAME, 'select')
                 unhandled_dropdowns = [d for d in dropdowns
                                       if d.get_attribute('id') not in dropdown_selections]
@@ -247,21 +349,11 @@ class ExamScraper:
 
             print(f"\nFound {len(pdf_links)} PDF link(s)")
 
-            # Download PDFs
-            print("\nDownloading PDFs...")
-            for pdf in pdf_links:
-                # Use filename_hint if available, otherwise sanitize the text
-                if pdf.get('filename_hint'):
-                    filename = pdf['filename_hint']
-                else:
-                    filename = self.sanitize_filename(pdf['text']) or 'document'
-                    if not filename.endswith('.pdf'):
-                        filename = f"{filename}.pdf"
-
-                self.download_pdf(pdf['url'], filename)
+            self.download_links(pdf_links, dropdown_selections)
 
         finally:
-            self.driver.quit()
+            self.report_waits()
+            self.close()
 
     def interactive_scrape(self):
         """
@@ -269,19 +361,7 @@ class ExamScraper:
         """
         try:
             print(f"Loading page: {self.base_url}")
-            self.driver.get(self.base_url)
-            time.sleep(2)
-
-            # Accept terms if present
-            try:
-                checkbox = self.driver.find_element(By.CSS_SELECTOR,
-                    'input[type="checkbox"]')
-                if not checkbox.is_selected():
-                    checkbox.click()
-                    print("✓ Accepted terms and conditions")
-                    time.sleep(1)
-            except NoSuchElementException:
-                pass
+            self.session.load_archive(self.base_url, self.waiter)
 
             while True:
                 # Find dropdowns
@@ -310,11 +390,13 @@ class ExamScraper:
                     choice = input("\nDownload all PDFs? (y/n): ").lower()
 
                     if choice == 'y':
-                        print("\nDownloading PDFs...")
+                        jobs = []
                         for pdf in pdf_links:
                             filename = self.sanitize_filename(pdf['text']) or 'document'
                             filename = f"{filename}.pdf"
-                            self.download_pdf(pdf['url'], filename)
+                            jobs.append(DownloadJob(pdf['url'], self.download_dir / filename,
+                                                    meta=self.job_meta(pdf)))
+                        self.download_jobs(jobs)
                     break
 
                 # Get user input
@@ -341,10 +423,10 @@ class ExamScraper:
 
                 self.select_dropdown_option(dropdowns[dropdown_idx], value)
                 print(f"✓ Selected: {options[option_idx][1]}")
-                time.sleep(1)
 
         finally:
-            self.driver.quit()
+            self.report_waits()
+            self.close()
 
 
 def main():
@@ -369,8 +451,10 @@ def main():
         action='store_true',
         help='Run in interactive mode'
     )
+    metrics.add_metrics_arguments(parser)
 
     args = parser.parse_args()
+    metrics.start_export(args)
 
     scraper = ExamScraper(args.url, args.output)
 
@@ -384,6 +468,8 @@ def main():
         print("Run with --interactive to select options interactively")
         print("Or modify the script to provide dropdown_selections dict")
 
+    metrics.finish()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Process-wide pooled HTTP session shared by every download path
+Keeps TCP/TLS connections alive between PDFs and carries the browser's
+cookies and user agent once the archive terms have been accepted
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+DEFAULT_POOL_SIZE = 10
+
+# Sent until a browser's own user agent has been copied in
+USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+_session = None
+_pool_size = DEFAULT_POOL_SIZE
+_retry_busy = True
+_lock = threading.Lock()
+
+# TCP connects made by sessions from this module; urllib3's own
+# num_connections counts connection objects, which are reconnected in place
+# when the server closes them
+_connects = 0
+_connects_lock = threading.Lock()
+
+
+def _count_connect():
+    global _connects
+    with _connects_lock:
+        _connects += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_connect()
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_connect()
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count every TCP connect"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def _mount_adapters(session, pool_size, retry_busy=True):
+    # 429/503 are left to the caller when it adapts its own rate to them
+    busy = [429, 503] if retry_busy else []
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=2,
+        status_forcelist=sorted(busy + [500, 502, 504]),
+    )
+    adapter = _CountingAdapter(max_retries=retry_strategy,
+                          pool_connections=pool_size, pool_maxsize=pool_size,
+                          pool_block=False)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retry_busy=True):
+    """New requests.Session with the download retry policy and a keep-alive pool"""
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    _mount_adapters(session, pool_size, retry_busy)
+    return session
+
+
+def configure(pool_size, retry_busy=True):
+    """
+    Set the connection pool size of the shared session
+
+    Args:
+        pool_size: Connections kept alive per host. Should be at least the
+                   number of download workers.
+        retry_busy: Let urllib3 retry 429 and 503 answers itself. Turn off
+                    when an adaptive rate controller needs to see them.
+    """
+    global _pool_size, _retry_busy
+    with _lock:
+        _pool_size = max(1, pool_size)
+        _retry_busy = retry_busy
+        if _session is not None:
+            _mount_adapters(_session, _pool_size, _retry_busy)
+
+
+def get_session():
+    """The shared requests.Session, created on first use"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session(_pool_size, _retry_busy)
+        return _session
+
+
+def copy_browser_state(driver):
+    """
+    Copy cookies and the user agent from a WebDriver into the shared session
+
+    Call after the archive terms have been accepted so that downloads look
+    like they come from the same visitor as the browser.
+    """
+    session = get_session()
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie['name'], cookie['value'],
+                            domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    user_agent = driver.execute_script("return navigator.userAgent")
+    if user_agent:
+        session.headers['User-Agent'] = user_agent.replace('HeadlessChrome', 'Chrome')
+
+
+def connection_stats():
+    """
+    Requests made by the shared session's pools and TCP connects behind them
+
+    Returns:
+        Dict with 'requests', 'connections' (connects, including reconnects
+        after the server closed a connection) and 'reused' (requests that
+        went over an already-open connection)
+    """
+    stats = {'requests': 0, 'connections': _connects}
+    session = _session
+    if session is None:
+        stats['reused'] = 0
+        return stats
+
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['requests'] += pool.num_requests
+
+    stats['reused'] = max(0, stats['requests'] - stats['connections'])
+    return stats
+
+
+def describe_stats():
+    """One-line connection reuse summary"""
+    stats = connection_stats()
+    return (f"{stats['requests']} HTTP request(s) over {stats['connections']} "
+            f"connection(s), {stats['reused']} reused")
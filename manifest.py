@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Manifest of downloaded PDFs
+Records where every file came from, what paper it is, its size and hash,
+so skip decisions and "what do I have" queries never walk the download tree
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+FILENAME = '.manifest.sqlite'
+
+FIELDS = ['path', 'url', 'filename_hint', 'material_type', 'cert', 'year', 'subject',
+          'subject_code', 'level', 'language', 'size', 'sha256', 'fetched_at']
+
+
+class Manifest:
+    """SQLite index of downloaded files, kept in the download root"""
+
+    def __init__(self, output_dir):
+        """
+        Args:
+            output_dir: Download root; the manifest is kept inside it and
+                        paths below it are stored relative to it
+        """
+        self.root = Path(output_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / FILENAME
+        self._abs_root = Path(os.path.abspath(self.root))
+
+        self._lock = threading.Lock()
+        # Sharded runs write from several processes; wait for their locks
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                filename_hint TEXT,
+                material_type TEXT,
+                cert TEXT,
+                year INTEGER,
+                subject TEXT,
+                subject_code TEXT,
+                level TEXT,
+                language TEXT,
+                size INTEGER,
+                sha256 TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_paper ON files (cert, subject, year)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+        self._db.commit()
+
+        # Every known path in memory so existence checks are a set lookup
+        self._sizes = dict(self._db.execute("SELECT path, size FROM files"))
+
+    def _key(self, path):
+        # abspath rather than resolve(): no filesystem calls per lookup
+        path = Path(os.path.abspath(path))
+        try:
+            return str(path.relative_to(self._abs_root))
+        except ValueError:
+            return str(path)
+
+    def full_path(self, key):
+        """Filesystem path of a manifest entry's path"""
+        path = Path(key)
+        return path if path.is_absolute() else self.root / path
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def has(self, path):
+        return self._key(path) in self._sizes
+
+    def size_of(self, path):
+        return self._sizes.get(self._key(path))
+
+    def entry(self, path):
+        """Manifest fields of path as a dict, or None"""
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(FIELDS)} FROM files WHERE path = ?",
+                                   (self._key(path),)).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def record(self, job, size, sha256=None, fetched_at=None):
+        """
+        Add or replace the entry for a DownloadJob's file
+
+        Args:
+            job: DownloadJob; its meta supplies filename_hint, cert, year, ...
+            size: File size in bytes
+            sha256: Hex digest, if known
+            fetched_at: Download time (default: now)
+        """
+        meta = job.meta
+        year = meta.get('year')
+        row = {
+            'path': self._key(job.path),
+            'url': job.url,
+            'filename_hint': meta.get('filename_hint'),
+            'material_type': meta.get('material_type'),
+            'cert': meta.get('cert'),
+            'year': int(year) if str(year).isdigit() else None,
+            'subject': meta.get('subject'),
+            'subject_code': meta.get('subject_code'),
+            'level': meta.get('level'),
+            'language': meta.get('language'),
+            'size': size,
+            'sha256': sha256,
+            'fetched_at': fetched_at or time.time(),
+        }
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO files ({', '.join(FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(FIELDS))})",
+                [row[field] for field in FIELDS])
+            self._db.commit()
+            self._sizes[row['path']] = size
+
+    def forget(self, path):
+        """Drop the entry for path so the next run downloads it again"""
+        key = self._key(path)
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE path = ?", (key,))
+            self._db.commit()
+            self._sizes.pop(key, None)
+
+    def query(self, cert=None, subject=None, years=None, material_type=None, level=None,
+              language=None):
+        """
+        Entries matching every given filter, ordered by year and path
+
+        Args:
+            cert: Examination value (lc, jc, lca)
+            subject: Case-insensitive substring of the subject name or code
+            years: (first, last) inclusive year range
+            material_type: ViewType value (exampapers, markingschemes, ...)
+            level: Higher, Ordinary, Foundation or Other
+            language: Language code such as EV, IV or BV
+
+        Returns:
+            List of dicts with the manifest fields
+        """
+        clauses, params = [], []
+        for column, value in (('cert', cert), ('material_type', material_type),
+                              ('level', level), ('language', language)):
+            if value:
+                clauses.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if subject:
+            clauses.append("(subject LIKE ? OR subject_code LIKE ?)")
+            params += [f"%{subject}%"] * 2
+        if years:
+            clauses.append("year BETWEEN ? AND ?")
+            params += [int(years[0]), int(years[1])]
+
+        sql = f"SELECT {', '.join(FIELDS)} FROM files"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY year, path"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def describe_stats(self):
+        total = sum(size or 0 for size in self._sizes.values())
+        return f"{len(self._sizes)} file(s) indexed, {total / (1024 * 1024):.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='List downloaded PDFs from the manifest of a download directory'
+    )
+    parser.add_argument(
+        'output',
+        nargs='?',
+        default='downloads',
+        help='Download directory containing the manifest (default: downloads)'
+    )
+    parser.add_argument('--cert', help='Examination (lc, jc, lca)')
+    parser.add_argument('--subject', help='Subject name or code (partial match)')
+    parser.add_argument('--years', help='Year range, e.g. 2010-2024, or a single year')
+    parser.add_argument('--type', help='Material type (exampapers, markingschemes, ...)')
+    parser.add_argument('--level', help='Paper level (Higher, Ordinary, Foundation)')
+    parser.add_argument('--language', help='Language code (EV, IV, BV)')
+
+    args = parser.parse_args()
+
+    if not (Path(args.output) / FILENAME).exists():
+        print(f"✗ No manifest in {args.output}")
+        return
+
+    years = None
+    if args.years:
+        first, _, last = args.years.partition('-')
+        years = (first, last or first)
+
+    manifest = Manifest(args.output)
+    try:
+        entries = manifest.query(cert=args.cert, subject=args.subject, years=years,
+                                 material_type=args.type, level=args.level,
+                                 language=args.language)
+    finally:
+        manifest.close()
+
+    current_year = None
+    for entry in entries:
+        if entry['year'] != current_year:
+            current_year = entry['year']
+            print(f"\n{current_year or 'Unknown year'}:")
+        size = (entry['size'] or 0) / (1024 * 1024)
+        print(f"  {entry['path']} ({size:.1f} MB)")
+
+    total = sum(entry['size'] or 0 for entry in entries) / (1024 * 1024)
+    print(f"\n✓ {len(entries)} file(s), {total:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
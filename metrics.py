@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Run metrics
+Phase timers and counters shared by every part of a run, exported as JSON
+lines and in the Prometheus text format at the end of a run or periodically
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracing
+
+
+# Prefix of every exported Prometheus metric
+PREFIX = 'exam_scraper'
+
+# Counters kept for each DownloadResult status
+RESULT_COUNTERS = {
+    'downloaded': 'files_downloaded',
+    'updated': 'files_updated',
+    'unchanged': 'files_unchanged',
+    'exists': 'files_skipped',
+    'failed': 'files_failed',
+}
+
+
+class Metrics:
+    """
+    Thread-safe phase timers and counters
+
+    Phases may nest (a 'discovery' contains its 'page_load' and
+    'dropdown_wait'), and phases timed on several threads at once (such as
+    'transfer') add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}    # name -> [calls, seconds, longest]
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one call of phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        """Record one call of phase name that took seconds"""
+        with self._lock:
+            stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def count(self, name, amount=1):
+        """Add amount to counter name"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_download(self, result):
+        """Update the transfer phase and file, byte and retry counters from a DownloadResult"""
+        self.count(RESULT_COUNTERS.get(result.status, f'files_{result.status}'))
+        if result.status in ('downloaded', 'updated'):
+            self.count('bytes_downloaded', result.size)
+        if result.attempts > 1:
+            self.count('retries', result.attempts - 1)
+        if result.seconds:
+            self.observe('transfer', result.seconds)
+
+    def snapshot(self):
+        """Current values as a JSON-serialisable dict"""
+        with self._lock:
+            phases = {name: {'calls': calls, 'seconds': round(seconds, 6), 'max': round(longest, 6)}
+                      for name, (calls, seconds, longest) in sorted(self.phases.items())}
+            counters = dict(sorted(self.counters.items()))
+        now = time.time()
+        return {'time': now, 'uptime': round(now - self.started, 3),
+                'pid': os.getpid(), 'phases': phases, 'counters': counters}
+
+    def to_json_line(self, event='snapshot'):
+        """One JSON object on a single line"""
+        return json.dumps(dict(self.snapshot(), event=event), separators=(',', ':'))
+
+    def to_prometheus(self):
+        """Every metric in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = [
+            f'# HELP {PREFIX}_uptime_seconds Seconds since the run started',
+            f'# TYPE {PREFIX}_uptime_seconds gauge',
+            f'{PREFIX}_uptime_seconds {snap["uptime"]}',
+            f'# HELP {PREFIX}_phase_seconds_total Time spent in each phase',
+            f'# TYPE {PREFIX}_phase_seconds_total counter',
+        ]
+        for name, stats in snap['phases'].items():
+            lines.append(f'{PREFIX}_phase_seconds_total{{phase="{name}"}} {stats["seconds"]}')
+        lines += [
+            f'# HELP {PREFIX}_phase_calls_total Times each phase ran',
+            f'# TYPE {PREFIX}_phase_calls_total counter',
+        ]
+        for name, stats in snap['phases'].items():
+            lines.append(f'{PREFIX}_phase_calls_total{{phase="{name}"}} {stats["calls"]}')
+        lines += [
+            f'# HELP {PREFIX}_phase_max_seconds Longest single call of each phase',
+            f'# TYPE {PREFIX}_phase_max_seconds gauge',
+        ]
+        for name, stats in snap['phases'].items():
+            lines.append(f'{PREFIX}_phase_max_seconds{{phase="{name}"}} {stats["max"]}')
+        for name, value in snap['counters'].items():
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            lines.append(f'{PREFIX}_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+    def describe_stats(self):
+        """One-line summary of the slowest phases and the counters"""
+        snap = self.snapshot()
+        phases = sorted(snap['phases'].items(), key=lambda item: -item[1]['seconds'])
+        parts = [f"{name} {stats['seconds']:.1f}s/{stats['calls']}" for name, stats in phases]
+        parts += [f"{name} {value}" for name, value in snap['counters'].items()]
+        return ', '.join(parts) if parts else "nothing recorded"
+
+
+class MetricsExporter:
+    """Writes a Metrics snapshot to files at the end of a run and, optionally, every interval seconds"""
+
+    def __init__(self, metrics, json_path=None, prom_path=None, interval=0):
+        """
+        Args:
+            metrics: Metrics to export
+            json_path: File to append one JSON line per export to
+            prom_path: File rewritten with the Prometheus text format on each
+                       export (e.g. for node_exporter's textfile collector)
+            interval: Seconds between periodic exports (0 = only at the end)
+        """
+        self.metrics = metrics
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval > 0 and (self.json_path or self.prom_path):
+            self._thread = threading.Thread(target=self._loop, name='metrics', daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self, event='snapshot'):
+        if self.json_path:
+            with open(self.json_path, 'a') as f:
+                f.write(self.metrics.to_json_line(event) + '\n')
+        if self.prom_path:
+            # Write then rename so a scraper never reads half a file
+            tmp = f"{self.prom_path}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(self.metrics.to_prometheus())
+            os.replace(tmp, self.prom_path)
+
+    def stop(self):
+        """Stop periodic exports and write the final values"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.export('final')
+
+
+# Shared by every module of the process, like http_session's pooled session
+_metrics = Metrics()
+_exporter = None
+
+
+def get_metrics():
+    """The process-wide Metrics"""
+    return _metrics
+
+
+@contextlib.contextmanager
+def phase(name, **trace_args):
+    """Time the enclosed block as one call of phase name (and a trace span when tracing)"""
+    with tracing.span(name, 'phase', **trace_args), _metrics.phase(name):
+        yield
+
+
+def count(name, amount=1):
+    """Add amount to counter name"""
+    _metrics.count(name, amount)
+
+
+def record_download(result):
+    _metrics.record_download(result)
+
+
+def describe_stats():
+    return _metrics.describe_stats()
+
+
+def add_metrics_arguments(parser):
+    """Add the --metrics-json/--metrics-prom/--metrics-interval options to an argparse parser"""
+    parser.add_argument(
+        '--metrics-json',
+        help='Append phase timings and counters as JSON lines to this file'
+    )
+    parser.add_argument(
+        '--metrics-prom',
+        help='Write phase timings and counters to this file in the Prometheus text format'
+    )
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        default=0,
+        help='Also export every this many seconds while running (default: only at the end)'
+    )
+
+
+def start_export(args):
+    """Start exporting the process-wide metrics as selected by add_metrics_arguments options"""
+    global _exporter
+    _exporter = MetricsExporter(_metrics, args.metrics_json, args.metrics_prom,
+                                args.metrics_interval).start()
+    return _exporter
+
+
+def finish():
+    """Write the final export (if one was requested) and print a summary"""
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        for path in (_exporter.json_path, _exporter.prom_path):
+            if path:
+                print(f"✓ Metrics written to {path}")
+        _exporter = None
+    print(f"✓ Phases: {describe_stats()}")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the examinations.ie material archive
+Serves the four-dropdown form cascade, the terms checkbox, ?fp= result rows
+and synthetic PDFs, with configurable latency, file sizes and faults, so the
+scrapers can be exercised and timed without touching the live site
+"""
+
+import argparse
+import hashlib
+import html
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+from cascade_wait import CASCADE
+from availability_matrix import MATERIAL_TYPES
+
+
+ARCHIVE_PATH = '/exammaterialarchive/'
+
+CERTS = [('lc', 'Leaving Certificate'), ('jc', 'Junior Certificate'),
+         ('lca', 'Leaving Certificate Applied')]
+
+SUBJECTS = [
+    ('001', 'Irish'), ('002', 'English'), ('003', 'Mathematics'), ('004', 'History'),
+    ('005', 'Geography'), ('006', 'French'), ('007', 'German'), ('008', 'Spanish'),
+    ('009', 'Biology'), ('010', 'Chemistry'), ('011', 'Physics'), ('012', 'Business'),
+    ('013', 'Art'), ('014', 'Music'), ('015', 'Home Economics'), ('016', 'Accounting'),
+]
+
+TERMS_FIELD = 'MaterialArchive$noTable$cbxAgreeToTerms'
+
+
+def _field_name(select_id):
+    """Form name of a dropdown, as ASP.NET derives it from the control id"""
+    return select_id.replace('__', '$')
+
+
+def _stable_random(*parts):
+    """Random generator seeded by parts, so every request sees the same catalog"""
+    digest = hashlib.sha1('/'.join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+class MockCatalog:
+    """Synthetic archive contents: which subjects and papers exist for each selection"""
+
+    def __init__(self, years=range(2015, 2025), subjects=SUBJECTS, coverage=0.85):
+        """
+        Args:
+            years: Years offered by the year dropdown
+            subjects: (value, name) pairs that may be offered for each examination
+            coverage: Share of subjects offered in a given year and examination
+        """
+        self.years = [str(y) for y in years]
+        self.subjects = list(subjects)
+        self.coverage = coverage
+
+    def options(self, selections):
+        """(value, text) pairs of the next dropdown after selections, or None at the end"""
+        depth = len(selections)
+        if depth == 0:
+            return [(t, t.replace('exam', 'exam ').title()) for t in MATERIAL_TYPES]
+        if depth == 1:
+            return [(y, y) for y in reversed(self.years)]
+        if depth == 2:
+            return list(CERTS)
+        if depth == 3:
+            material_type, year, cert = selections
+            return [(value, name) for value, name in self.subjects
+                    if _stable_random(material_type, year, cert, value).random() < self.coverage]
+        return None
+
+    def papers(self, selections):
+        """Result rows of a full selection as (description, file id, token)"""
+        material_type, year, cert, subject = selections
+        if subject not in {value for value, _ in self.options(selections[:3])}:
+            return []
+
+        levels = ['Higher', 'Ordinary']
+        if cert == 'jc' and subject in ('001', '002', '003'):
+            levels.append('Foundation')
+        if cert == 'lca':
+            levels = ['Common']
+        languages = ['EV', 'IV'] if subject != '001' else ['IV']
+
+        prefix = 'MS' if 'marking' in material_type else 'EX'
+        papers = []
+        for level in levels:
+            for number in ('One', 'Two') if subject in ('002', '003', '001') else ('One',):
+                for language in languages:
+                    fileid = f"{prefix}{cert.upper()}{year}{subject}{level[0]}{number[0]}{language}.pdf"
+                    description = f"{level} Level Paper {number} ({language})"
+                    token = hashlib.sha1(fileid.encode()).hexdigest()[:20]
+                    papers.append((description, fileid, token))
+        return papers
+
+
+class MockConfig:
+    """Latency, size and fault settings of a mock server"""
+
+    def __init__(self, page_latency=0.0, pdf_latency=0.0, pdf_size=200_000, size_jitter=0.5,
+                 bandwidth=0, error_rate=0.0, busy_rate=0.0, drop_rate=0.0, html_rate=0.0,
+                 retry_after=1, seed=None):
+        """
+        Args:
+            page_latency: Seconds before each form page is answered
+            pdf_latency: Seconds before each PDF response starts
+            pdf_size: Average PDF size in bytes
+            size_jitter: PDF sizes vary by up to this fraction either side
+            bandwidth: Bytes/second per PDF response (0 = unlimited)
+            error_rate: Share of PDF requests answered with 500
+            busy_rate: Share of PDF requests answered with 429 and Retry-After
+            drop_rate: Share of PDF responses cut off half way
+            html_rate: Share of PDF requests answered with an HTML error page
+            retry_after: Retry-After seconds sent with 429 answers
+            seed: Seed for fault injection (default: random)
+        """
+        self.page_latency = page_latency
+        self.pdf_latency = pdf_latency
+        self.pdf_size = pdf_size
+        self.size_jitter = size_jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.busy_rate = busy_rate
+        self.drop_rate = drop_rate
+        self.html_rate = html_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    """Request counters of a running mock server"""
+
+    def __init__(self):
+        self.pages = 0
+        self.pdfs = 0
+        self.bytes_sent = 0
+        self.faults = {'error': 0, 'busy': 0, 'drop': 0, 'html': 0}
+        self._lock = threading.Lock()
+
+    def add(self, counter, amount=1):
+        with self._lock:
+            if counter in self.faults:
+                self.faults[counter] += amount
+            else:
+                setattr(self, counter, getattr(self, counter) + amount)
+
+    def describe(self):
+        faults = ', '.join(f"{count} {name}" for name, count in self.faults.items() if count)
+        return (f"{self.pages} page(s), {self.pdfs} PDF request(s), "
+                f"{self.bytes_sent / (1024 * 1024):.1f} MB sent"
+                + (f", faults: {faults}" if faults else ""))
+
+
+def synthetic_pdf(token, size):
+    """Deterministic PDF-shaped bytes of roughly size bytes for token"""
+    header = b'%PDF-1.4\n% ' + token.encode() + b'\n'
+    trailer = b'\ntrailer\n<< /Root 1 0 R >>\n%%EOF\n'
+    filler = hashlib.sha256(token.encode()).hexdigest().encode() + b'\n'
+    body_size = max(0, size - len(header) - len(trailer))
+    body = (filler * (body_size // len(filler) + 1))[:body_size]
+    return header + body + trailer
+
+
+def render_page(catalog, selections, terms_accepted):
+    """HTML of the archive page after selections (list of values in cascade order)"""
+    parts = [
+        '<!DOCTYPE html><html><head><title>Examination Material Archive</title></head><body>',
+        f'<form method="post" action="{ARCHIVE_PATH}" id="form1">',
+        '<input type="hidden" name="__EVENTTARGET" value="">',
+        '<input type="hidden" name="__VIEWSTATE" value="mock">',
+        f'<p><input type="checkbox" name="{TERMS_FIELD}" id="cbxAgreeToTerms" '
+        f'onclick="this.form.submit()"{" checked" if terms_accepted else ""}>',
+        '<label for="cbxAgreeToTerms">I agree to the terms and conditions</label></p>',
+    ]
+
+    for depth, select_id in enumerate(CASCADE):
+        if depth > len(selections):
+            break
+        options = catalog.options(selections[:depth])
+        chosen = selections[depth] if depth < len(selections) else None
+        parts.append(f'<select id="{select_id}" name="{_field_name(select_id)}" '
+                     f'onchange="this.form.submit()">')
+        parts.append('<option value="">Please select</option>')
+        for value, text in options:
+            selected = ' selected' if value == chosen else ''
+            parts.append(f'<option value="{html.escape(value)}"{selected}>{html.escape(text)}</option>')
+        parts.append('</select>')
+
+    if len(selections) == len(CASCADE):
+        if terms_accepted:
+            parts.append('<table class="materials">')
+            for description, fileid, token in catalog.papers(selections):
+                parts.append(
+                    f'<tr><td>{html.escape(description)}</td>'
+                    f'<td><a href="{ARCHIVE_PATH}?fp={token}">Click Here</a>'
+                    f'<input type="hidden" name="fileid" value="{html.escape(fileid)}"></td></tr>'
+                )
+            parts.append('</table>')
+        else:
+            parts.append('<p>Please accept the terms and conditions to view material.</p>')
+
+    parts.append('</form></body></html>')
+    return ''.join(parts)
+
+
+class MockArchiveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockArchive/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        if 'fp' in query:
+            self._send_pdf(query['fp'][0])
+            return
+        self._send_page([], terms_accepted=False)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        fields = parse_qs(self.rfile.read(length).decode(), keep_blank_values=True)
+
+        selections = []
+        for select_id in CASCADE:
+            value = fields.get(_field_name(select_id), [''])[0]
+            if not value:
+                break
+            selections.append(value)
+        # A changed dropdown resets everything after it, like the real postback
+        target = fields.get('__EVENTTARGET', [''])[0]
+        for depth, select_id in enumerate(CASCADE):
+            if target == _field_name(select_id):
+                selections = selections[:depth + 1]
+
+        catalog = self.mock.catalog
+        for depth, value in enumerate(selections):
+            if value not in {v for v, _ in catalog.options(selections[:depth])}:
+                selections = selections[:depth]
+                break
+
+        self._send_page(selections, terms_accepted=TERMS_FIELD in fields)
+
+    def _send_page(self, selections, terms_accepted):
+        config = self.mock.config
+        if config.page_latency:
+            time.sleep(config.page_latency)
+        self.mock.stats.add('pages')
+        body = render_page(self.mock.catalog, selections, terms_accepted).encode()
+        self._send(200, body, 'text/html; charset=utf-8')
+
+    def _send_pdf(self, token):
+        config = self.mock.config
+        if config.pdf_latency:
+            time.sleep(config.pdf_latency)
+        self.mock.stats.add('pdfs')
+
+        roll = config.random.random()
+        for fault, rate in (('error', config.error_rate), ('busy', config.busy_rate),
+                            ('html', config.html_rate)):
+            if roll < rate:
+                self.mock.stats.add(fault)
+                if fault == 'error':
+                    self._send(500, b'Internal Server Error', 'text/plain')
+                elif fault == 'busy':
+                    self._send(429, b'Too Many Requests', 'text/plain',
+                               {'Retry-After': str(config.retry_after)})
+                else:
+                    self._send(200, b'<html><body>Session expired</body></html>', 'text/html')
+                return
+            roll -= rate
+
+        jitter = _stable_random(token).uniform(-config.size_jitter, config.size_jitter)
+        data = synthetic_pdf(token, int(config.pdf_size * (1 + jitter)))
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', None, {'ETag': etag})
+            return
+
+        status, start, headers = 200, 0, {'ETag': etag, 'Accept-Ranges': 'bytes'}
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes=') and requested[6:].rstrip('-').isdigit():
+            start = int(requested[6:].rstrip('-'))
+            if start >= len(data):
+                self._send(416, b'', None, {'Content-Range': f'bytes */{len(data)}'})
+                return
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{len(data) - 1}/{len(data)}'
+
+        payload = data[start:]
+        dropped = config.random.random() < config.drop_rate
+        if dropped:
+            self.mock.stats.add('drop')
+        self._send(status, payload, 'application/pdf', headers,
+                   cut=len(payload) // 2 if dropped else None)
+
+    def _send(self, status, body, content_type, headers=None, cut=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if cut is not None:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+
+        data = body if cut is None else body[:cut]
+        bandwidth = self.mock.config.bandwidth
+        chunk = 64 * 1024
+        for offset in range(0, len(data), chunk):
+            piece = data[offset:offset + chunk]
+            self.wfile.write(piece)
+            if bandwidth:
+                time.sleep(len(piece) / bandwidth)
+        self.mock.stats.add('bytes_sent', len(data))
+        if cut is not None:
+            self.close_connection = True
+
+
+class MockArchiveServer:
+    """A MockArchiveHandler server running on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None, catalog=None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 = any free port)
+            config: MockConfig (default: no latency, no faults)
+            catalog: MockCatalog (default: 2015-2024, 16 subjects)
+        """
+        self.config = config or MockConfig()
+        self.catalog = catalog or MockCatalog()
+        self.stats = MockStats()
+        self.httpd = ThreadingHTTPServer((host, port), MockArchiveHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Archive page URL to pass as --url"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{ARCHIVE_PATH}?i=mock"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-archive',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def add_mock_arguments(parser):
+    """Add the latency, size and fault options of MockConfig to an argparse parser"""
+    parser.add_argument('--page-latency', type=float, default=0.0,
+                        help='Seconds before each form page is answered (default: 0)')
+    parser.add_argument('--pdf-latency', type=float, default=0.0,
+                        help='Seconds before each PDF response starts (default: 0)')
+    parser.add_argument('--pdf-size', type=int, default=200_000,
+                        help='Average PDF size in bytes (default: 200000)')
+    parser.add_argument('--bandwidth', type=int, default=0,
+                        help='Bytes/second per PDF response, 0 for unlimited (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of PDF requests answered with 500 (default: 0)')
+    parser.add_argument('--busy-rate', type=float, default=0.0,
+                        help='Share of PDF requests answered with 429 (default: 0)')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Share of PDF responses cut off half way (default: 0)')
+    parser.add_argument('--html-rate', type=float, default=0.0,
+                        help='Share of PDF requests answered with an HTML page (default: 0)')
+    parser.add_argument('--seed', type=int, help='Seed for fault injection')
+
+
+def config_from_args(args):
+    """MockConfig from the options added by add_mock_arguments"""
+    return MockConfig(page_latency=args.page_latency, pdf_latency=args.pdf_latency,
+                      pdf_size=args.pdf_size, bandwidth=args.bandwidth,
+                      error_rate=args.error_rate, busy_rate=args.busy_rate,
+                      drop_rate=args.drop_rate, html_rate=args.html_rate, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve a local imitation of the examinations.ie material archive'
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    add_mock_arguments(parser)
+
+    args = parser.parse_args()
+
+    server = MockArchiveServer(args.host, args.port, config_from_args(args))
+    print(f"✓ Mock archive at {server.url}")
+    print("  Pass it to any downloader with --url; Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n✓ Served {server.stats.describe()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of downloaded PDFs
+Every file is kept once under its SHA-256 and the organized download trees
+are made of hardlinks to it, so identical papers take disk space only once
+"""
+
+import argparse
+import errno
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+
+HASH_CHUNK = 1024 * 1024
+
+
+def sha256_file(path):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _format_size(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class ObjectStore:
+    """Directory of files named by their SHA-256 (objects/ab/cdef...)"""
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Store directory. Must be on the same filesystem as the
+                  download trees for hardlinks to work; files on another
+                  filesystem are copied instead.
+        """
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.objects.mkdir(parents=True, exist_ok=True)
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / digest[2:]
+
+    def adopt(self, path, digest):
+        """
+        Make path a link to the stored object with this digest
+
+        If the store has no such object yet, path itself becomes it.
+        Otherwise path is atomically replaced by a hardlink to the existing
+        object and its own copy of the bytes is released.
+
+        Returns:
+            True if the content was already stored (a duplicate)
+        """
+        path = Path(path)
+        target = self.object_path(digest)
+        target.parent.mkdir(exist_ok=True)
+
+        try:
+            os.link(path, target)
+            return False
+        except FileExistsError:
+            pass
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystem: keep a private copy of the object
+            if not target.exists():
+                shutil.copy2(path, target)
+                return False
+
+        if os.path.samefile(path, target):
+            return True
+        self._link_over(target, path)
+        return True
+
+    @staticmethod
+    def _link_over(target, path):
+        """Replace path with a hardlink to target without a moment where it is missing"""
+        tmp = path.with_name(path.name + '.link')
+        try:
+            os.link(target, tmp)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            return
+        os.replace(tmp, path)
+
+    def add_file(self, path):
+        """Hash an existing file and adopt it (see dedupe_tree)"""
+        return self.adopt(path, sha256_file(path))
+
+    def stats(self):
+        """
+        Space used and saved by the store
+
+        Returns:
+            Dict with 'objects', 'links' (paths outside the store pointing
+            at an object), 'stored_bytes' and 'saved_bytes' (bytes that
+            separate copies of every linked path would have used on top)
+        """
+        stats = {'objects': 0, 'links': 0, 'stored_bytes': 0, 'saved_bytes': 0}
+        for obj in self.objects.glob('*/*'):
+            st = obj.stat()
+            links = st.st_nlink - 1
+            stats['objects'] += 1
+            stats['links'] += links
+            stats['stored_bytes'] += st.st_size
+            stats['saved_bytes'] += max(0, links - 1) * st.st_size
+        return stats
+
+    def describe_stats(self):
+        stats = self.stats()
+        return (f"{stats['objects']} unique file(s) behind {stats['links']} path(s), "
+                f"{_format_size(stats['stored_bytes'])} stored, "
+                f"{_format_size(stats['saved_bytes'])} saved by deduplication")
+
+
+def dedupe_tree(store, directory):
+    """
+    Move every PDF under directory into the store and replace it with a hardlink
+
+    Returns:
+        (files seen, duplicates found)
+    """
+    seen = duplicates = 0
+    store_root = store.root.resolve()
+    for path in sorted(Path(directory).rglob('*.pdf')):
+        if not path.is_file() or store_root in path.resolve().parents:
+            continue
+        seen += 1
+        if store.add_file(path):
+            duplicates += 1
+    return seen, duplicates
+
+
+def add_store_argument(parser):
+    """Add the --store option to an argparse parser"""
+    parser.add_argument(
+        '--store',
+        help='Content-addressed store directory; downloaded PDFs are kept there once '
+             'and linked into the output tree (must be on the same filesystem)'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report on or deduplicate the content-addressed PDF store'
+    )
+    parser.add_argument(
+        'command',
+        choices=['report', 'dedupe'],
+        help='report: show space saved; dedupe: link existing PDFs into the store'
+    )
+    parser.add_argument(
+        'directories',
+        nargs='*',
+        help='Download directories to deduplicate (dedupe only)'
+    )
+    parser.add_argument(
+        '--store',
+        required=True,
+        help='Content-addressed store directory'
+    )
+
+    args = parser.parse_args()
+    store = ObjectStore(args.store)
+
+    if args.command == 'dedupe':
+        if not args.directories:
+            parser.error('dedupe needs at least one download directory')
+        for directory in args.directories:
+            seen, duplicates = dedupe_tree(store, directory)
+            print(f"✓ {directory}: {seen} PDF(s), {duplicates} duplicate(s) linked")
+
+    print(f"✓ Store: {store.describe_stats()}")
+
+
+if __name__ == '__main__':
+    main()
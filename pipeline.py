@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Discovery/download pipeline
+Runs archive discovery on its own thread, feeding a bounded queue that the
+download engine drains at the same time, so browser and network time overlap
+"""
+
+import queue
+import threading
+import time
+
+
+DEFAULT_QUEUE_SIZE = 200
+
+# Marks the end of the job stream
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    """Raised inside the producer when the download side has shut down"""
+
+
+class Pipeline:
+    """
+    Producer/consumer pair of a discovery generator and a DownloadEngine
+
+    The queue is bounded: when downloads fall behind, discovery blocks on
+    put() instead of piling up jobs; when discovery is slower, the workers
+    simply wait for the next job.
+    """
+
+    def __init__(self, engine, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            engine: DownloadEngine that runs the jobs
+            queue_size: Discovered jobs allowed to wait for a download worker
+        """
+        self.engine = engine
+        self.queue_size = max(1, queue_size)
+        self.discovery_seconds = 0.0
+        self.max_backlog = 0
+
+    def run(self, produce, on_result=None):
+        """
+        Run discovery and downloads together until both are finished
+
+        Args:
+            produce: Callable returning an iterable of DownloadJobs. It is
+                     consumed on a separate thread, so everything it touches
+                     (e.g. the browser) must only be used from there.
+            on_result: Passed on to DownloadEngine.run
+
+        Returns:
+            DownloadReport of every job
+
+        Raises:
+            Whatever produce raised, after the downloads already queued finish
+        """
+        jobs = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    jobs.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    continue
+            raise PipelineStopped()
+
+        def producer():
+            start = time.perf_counter()
+            try:
+                for job in produce():
+                    put(job)
+                    self.max_backlog = max(self.max_backlog, jobs.qsize())
+            except PipelineStopped:
+                pass
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                self.discovery_seconds = time.perf_counter() - start
+                try:
+                    put(_DONE)
+                except PipelineStopped:
+                    pass
+
+        def drain():
+            while True:
+                job = jobs.get()
+                if job is _DONE:
+                    return
+                yield job
+
+        thread = threading.Thread(target=producer, name='discovery', daemon=True)
+        thread.start()
+        try:
+            report = self.engine.run(drain(), on_result)
+        finally:
+            # Unblocks a producer waiting on a full queue if downloads stopped early
+            stop.set()
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return report
+
+    def describe_stats(self, report):
+        """How much of the run discovery and downloading overlapped"""
+        return (f"discovery {self.discovery_seconds:.1f}s, downloads finished "
+                f"{report.elapsed:.1f}s after start, up to {self.max_backlog} job(s) queued")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Adaptive download rate control
+An AIMD controller per host: concurrency and request rate grow additively
+while responses are fast and clean, and are halved on 429/503 answers,
+connection failures or latency well above the best seen
+"""
+
+import threading
+import time
+from download_engine import log
+
+
+DEFAULT_MAX_RATE = 20.0
+
+# Weight of the newest sample in the smoothed time-to-first-byte
+LATENCY_SMOOTHING = 0.2
+# Latency this many times the best smoothed value counts as congestion
+LATENCY_FACTOR = 2.5
+
+
+class _HostLimits:
+    """Current limits and measurements for one host"""
+
+    def __init__(self, concurrency, rate):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.paused_until = 0.0
+        self.latency = None       # smoothed time to first byte
+        self.best_latency = None  # lowest smoothed value seen
+        self.last_cut = 0.0
+        self.cuts = 0
+        self.raises = 0
+        self.condition = threading.Condition()
+
+
+class _Slot:
+    def __init__(self, limits):
+        self.limits = limits
+
+    def __enter__(self):
+        limits = self.limits
+        with limits.condition:
+            while limits.in_flight >= int(limits.concurrency):
+                limits.condition.wait()
+            limits.in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        limits = self.limits
+        with limits.condition:
+            limits.in_flight -= 1
+            limits.condition.notify_all()
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limits per host
+
+    Drop-in replacement for DownloadEngine's fixed per-host semaphore and
+    politeness interval (see DownloadEngine(rate_control=...)).
+    """
+
+    def __init__(self, initial_concurrency=2, max_concurrency=8, initial_rate=2.0,
+                 min_rate=0.2, max_rate=DEFAULT_MAX_RATE, rate_step=1.0, backoff=0.5):
+        """
+        Args:
+            initial_concurrency: Simultaneous requests per host to start with
+            max_concurrency: Upper bound for simultaneous requests per host
+            initial_rate: Request starts per second per host to start with
+            min_rate: Lower bound for the request rate
+            max_rate: Upper bound for the request rate
+            rate_step: Requests/second added per second of clean responses
+            backoff: Factor both limits are multiplied by on congestion
+        """
+        self.initial_concurrency = max(1, initial_concurrency)
+        self.max_concurrency = max(self.initial_concurrency, max_concurrency)
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, initial_rate)
+        self.rate_step = rate_step
+        self.backoff = backoff
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostLimits(self.initial_concurrency, self.initial_rate)
+            return self._hosts[host]
+
+    def slot(self, host):
+        """Context manager holding one of host's concurrent request slots"""
+        return _Slot(self._limits(host))
+
+    def acquire(self, host):
+        """Block until the current request rate (and any Retry-After pause) allows a start"""
+        limits = self._limits(host)
+        with limits.condition:
+            now = time.monotonic()
+            start = max(now, limits.next_start, limits.paused_until)
+            limits.next_start = start + 1.0 / limits.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def success(self, host, latency):
+        """
+        Record a clean response
+
+        Args:
+            latency: Seconds from sending the request to receiving its headers
+        """
+        limits = self._limits(host)
+        with limits.condition:
+            if limits.latency is None:
+                limits.latency = latency
+            else:
+                limits.latency += LATENCY_SMOOTHING * (latency - limits.latency)
+            if limits.best_latency is None or limits.latency < limits.best_latency:
+                limits.best_latency = limits.latency
+
+            if (latency > LATENCY_FACTOR * limits.best_latency
+                    and limits.latency > LATENCY_FACTOR * limits.best_latency):
+                self._cut(host, limits, 'latency rising')
+                return
+
+            before = int(limits.concurrency)
+            # +1 slot per window of responses, +rate_step req/s per second
+            limits.concurrency = min(self.max_concurrency,
+                                     limits.concurrency + 1.0 / limits.concurrency)
+            limits.rate = min(self.max_rate, limits.rate + self.rate_step / limits.rate)
+            if int(limits.concurrency) > before:
+                limits.raises += 1
+                limits.condition.notify_all()
+                log(f"  ⚙ {host}: raised to {self._describe(limits)}")
+
+    def congestion(self, host, reason, retry_after=None):
+        """
+        Record a sign of overload: a 429/503 answer, a failed connection or a timeout
+
+        Args:
+            reason: Short description shown in the log
+            retry_after: Seconds the server asked us to wait, if any
+        """
+        limits = self._limits(host)
+        with limits.condition:
+            if retry_after:
+                limits.paused_until = max(limits.paused_until, time.monotonic() + retry_after)
+            self._cut(host, limits, reason)
+
+    def _cut(self, host, limits, reason):
+        now = time.monotonic()
+        # Responses already in flight report the same overload; cut once per window
+        window = max(1.0, 4 * (limits.latency or 0.0))
+        if now - limits.last_cut < window:
+            return
+        limits.last_cut = now
+        limits.cuts += 1
+        limits.concurrency = max(1.0, limits.concurrency * self.backoff)
+        limits.rate = max(self.min_rate, limits.rate * self.backoff)
+        # Measure again from here: the old best may no longer be reachable
+        limits.best_latency = limits.latency
+        log(f"  ⚙ {host}: {reason}, cut to {self._describe(limits)}")
+
+    @staticmethod
+    def _describe(limits):
+        return f"{int(limits.concurrency)} concurrent, {limits.rate:.1f} req/s"
+
+    def describe_stats(self):
+        """Current limits of every host"""
+        with self._lock:
+            hosts = list(self._hosts.items())
+        if not hosts:
+            return "no requests made"
+        return '; '.join(
+            f"{host}: {self._describe(limits)} ({limits.raises} raise(s), {limits.cuts} cut(s))"
+            for host, limits in hosts)
+
+
+def add_adaptive_argument(parser):
+    """Add the --adaptive option to an argparse parser"""
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Adapt to the server: start at --per-host and --delay, speed up (up to --workers '
+             'at once) while responses are fast, back off on 429/503, errors or rising latency'
+    )
+
+
+def from_args(args):
+    """AIMDController configured from the download options, or None without --adaptive"""
+    if not args.adaptive:
+        return None
+    return AIMDController(initial_concurrency=args.per_host,
+                          max_concurrency=args.workers,
+                          initial_rate=1.0 / args.delay if args.delay > 0 else DEFAULT_MAX_RATE)
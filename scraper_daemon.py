@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+Long-running scraper daemon
+Keeps warm discovery workers (browser session, archive backend and catalog
+cache) and the pooled HTTP session alive between jobs, and takes download,
+subject-list and availability jobs over a local HTTP or Unix-socket API
+
+    python scraper_daemon.py serve --backend http
+    python scraper_daemon.py submit subjects --cert lc --year 2024 --wait
+    python scraper_daemon.py submit download --cert lc --subject Mathematics --year-range 2020-2024
+    python scraper_daemon.py status [JOB_ID]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import http_session
+import metrics
+import rate_control
+import tracing
+from download_engine import DownloadEngine, FixedRateControl, add_engine_arguments
+from download_exams_v2 import EnhancedExamScraper
+from check_available_years import check_availability
+from sync_state import SyncState
+from manifest import Manifest
+from pipeline import DEFAULT_QUEUE_SIZE, Pipeline
+from browser_session import BrowserSession
+from archive_client import BACKENDS, open_archive
+from catalog_cache import DEFAULT_PATH as CACHE_PATH, CachedArchive, CatalogCache
+from sharded import STATUSES, build_grid
+from availability_matrix import MATERIAL_TYPES
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+BASE_URL = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
+
+DEFAULT_PORT = 8750
+
+KINDS = ['download', 'subjects', 'availability']
+
+# Jobs kept for GET /jobs once finished
+MAX_FINISHED_JOBS = 200
+
+
+class JobError(ValueError):
+    """A submitted job is missing parameters or has invalid ones"""
+
+
+def _years(params):
+    """Years of a job: 'years' (list), 'year' or 'year_range' ('2020-2024'); None = every year listed"""
+    if params.get('years'):
+        return [str(y) for y in params['years']]
+    if params.get('year'):
+        return [str(params['year'])]
+    if params.get('year_range'):
+        try:
+            start, end = str(params['year_range']).split('-')
+            return [str(y) for y in range(int(start), int(end) + 1)]
+        except ValueError:
+            raise JobError(f"year_range must look like 2020-2024, not {params['year_range']!r}")
+    return None
+
+
+class Job:
+    """One request to the daemon, with its status and progress"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, params):
+        """
+        Args:
+            kind: 'download', 'subjects' or 'availability'
+            params: Dict of the job's parameters (cert, subject, year, type, ...)
+
+        Raises:
+            JobError: If the kind is unknown or a required parameter is missing
+        """
+        if kind not in KINDS:
+            raise JobError(f"Unknown job kind {kind!r} (expected one of: {', '.join(KINDS)})")
+        required = {'download': ['cert'], 'subjects': ['cert', 'year'],
+                    'availability': ['cert', 'subject']}[kind]
+        missing = [name for name in required if not params.get(name)]
+        if missing:
+            raise JobError(f"{kind} job needs: {', '.join(missing)}")
+        if params.get('type', 'exampapers') not in MATERIAL_TYPES:
+            raise JobError(f"Unknown material type {params['type']!r}")
+        _years(params)
+
+        self.id = str(next(self._ids))
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'  # queued, running, done, failed or cancelled
+        self.progress = dict.fromkeys(['discovered'] + STATUSES, 0)
+        self.progress['bytes'] = 0
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, result):
+        """Count one DownloadResult towards the progress"""
+        with self._lock:
+            self.progress[result.status] = self.progress.get(result.status, 0) + 1
+            if result.status in ('downloaded', 'updated'):
+                self.progress['bytes'] += result.size
+
+    def discovered(self, count):
+        with self._lock:
+            self.progress['discovered'] += count
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.done.set()
+
+    def as_dict(self):
+        with self._lock:
+            progress = dict(self.progress)
+        data = {'id': self.id, 'kind': self.kind, 'params': self.params, 'status': self.status,
+                'progress': progress, 'submitted': self.submitted}
+        if self.started is not None:
+            end = self.finished or time.time()
+            data['seconds'] = round(end - self.started, 3)
+            data['queued_seconds'] = round(self.started - self.submitted, 3)
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class Worker:
+    """
+    One warm discovery context: a browser session and an archive backend,
+    kept between jobs and used by one job at a time
+    """
+
+    def __init__(self, number, daemon):
+        self.number = number
+        self.daemon = daemon
+        self.session = BrowserSession(wait_timeout=daemon.wait_timeout)
+        self.backend = open_archive(daemon.backend, daemon.url, self.session)
+        self.archive = CachedArchive(self.backend, daemon.cache) if daemon.cache else self.backend
+        self.jobs_run = 0
+        self._warmed = 0.0
+
+    def warm(self, browser=False):
+        """
+        Load the archive page so the first job does not pay for it
+
+        Args:
+            browser: Also start Chrome and accept the terms even when the
+                     backend would only use it as a fallback
+        """
+        start = time.perf_counter()
+        types = self.backend.get_options({}, VIEW_TYPE_SELECT)
+        if browser:
+            self.session.load_archive(self.daemon.url)
+        self._warmed = time.time()
+        print(f"✓ Worker {self.number} warm in {time.perf_counter() - start:.2f}s "
+              f"({len(types)} material type(s))")
+
+    def refresh(self):
+        """Drop pages older than the daemon's page TTL (their form state may have expired)"""
+        if time.time() - self._warmed > self.daemon.page_ttl:
+            self.backend.close()
+            self._warmed = time.time()
+
+    def run(self, job):
+        self.refresh()
+        if job.kind == 'subjects':
+            return self.subjects(job)
+        if job.kind == 'availability':
+            return check_availability(job.params['cert'], job.params['subject'],
+                                      self.daemon.wait_timeout, archive=self.archive)
+        return self.download(job)
+
+    def subjects(self, job):
+        params = job.params
+        selections = {VIEW_TYPE_SELECT: params.get('type', 'exampapers'),
+                      YEAR_SELECT: str(params['year']),
+                      EXAMINATION_SELECT: params['cert']}
+        with metrics.phase('list_subjects'):
+            return [list(option) for option in self.archive.get_options(selections, SUBJECT_SELECT)]
+
+    def download(self, job):
+        """Discover and download a download job's files, counting progress as they finish"""
+        params = job.params
+        material_type = params.get('type', 'exampapers')
+        output = params.get('output') or self.daemon.output
+        language = params.get('language', 'EV,BV')
+        language_filter = None if language.lower() == 'all' else \
+            [lang.strip().upper() for lang in language.split(',')]
+        engine = self.daemon.engine_for(output, sync=bool(params.get('sync')))
+
+        def discover():
+            grid = build_grid(self.archive, [material_type], [params['cert']],
+                              _years(params), params.get('subject'))
+            for _, year, cert, subject_value, subject_text in grid:
+                if job.cancelled:
+                    return
+                scraper = EnhancedExamScraper(
+                    self.daemon.url,
+                    output,
+                    year,
+                    cert,
+                    subject_text.replace('/', '_'),
+                    language_filter=language_filter,
+                    session=self.session,
+                    archive=self.archive,
+                    engine=engine
+                )
+                selections = {
+                    VIEW_TYPE_SELECT: material_type,
+                    YEAR_SELECT: year,
+                    EXAMINATION_SELECT: cert,
+                    SUBJECT_SELECT: subject_value,
+                }
+                try:
+                    with tracing.span(subject_text, 'subject', year=year):
+                        jobs = scraper.discover_jobs(selections)
+                except Exception as e:
+                    print(f"✗ Job {job.id}: error discovering {subject_text} {year}: {e}")
+                    continue
+                job.discovered(len(jobs))
+                yield from jobs
+
+        pipeline = Pipeline(engine, queue_size=self.daemon.queue_size)
+        report = pipeline.run(discover, on_result=job.record)
+        return {'summary': report.summary(), 'output': str(output),
+                'failed': [r.job.label for r in report.failed]}
+
+    def close(self):
+        self.backend.close()
+        self.session.close()
+
+
+class ScraperDaemon:
+    """Job queue served by warm Workers, one job per worker at a time"""
+
+    def __init__(self, url=BASE_URL, backend='auto', workers=1, output='downloads',
+                 cache_path=None, wait_timeout=10, page_ttl=600, download_workers=4,
+                 per_host=2, delay=0.5, control=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            url: Archive page URL
+            backend: Discovery backend for every worker (see archive_client.open_archive)
+            workers: Jobs run at once, each with its own browser session
+            output: Default output directory of download jobs
+            cache_path: Catalog cache file shared by the workers (None = no cache)
+            wait_timeout: Upper bound in seconds for each page-update wait
+            page_ttl: Seconds a worker keeps archive pages before loading them again
+            download_workers, per_host, delay: DownloadEngine limits
+            control: Rate control shared by every engine (default: fixed per_host/delay),
+                     so the limits hold across concurrent jobs
+            queue_size: Discovered files allowed to wait for a download worker
+        """
+        self.url = url
+        self.backend = backend
+        self.output = output
+        self.cache = CatalogCache(cache_path) if cache_path else None
+        self.wait_timeout = wait_timeout
+        self.page_ttl = page_ttl
+        self.download_workers = download_workers
+        self.per_host = per_host
+        self.delay = delay
+        self.control = control or FixedRateControl(per_host, delay)
+        self.queue_size = queue_size
+        self.started = time.time()
+
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._engines = {}
+        self._lock = threading.Lock()
+        self.workers = [Worker(number, self) for number in range(1, max(1, workers) + 1)]
+        self._threads = []
+
+    def start(self, warm=True, warm_browser=False):
+        """Warm every worker and start taking jobs"""
+        for worker in self.workers:
+            if warm:
+                try:
+                    worker.warm(browser=warm_browser)
+                except Exception as e:
+                    print(f"✗ Worker {worker.number} could not load the archive: {e}")
+            thread = threading.Thread(target=self._loop, args=(worker,),
+                                      name=f'worker-{worker.number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def engine_for(self, output, sync=False):
+        """DownloadEngine (and manifest) for an output directory, shared by every job writing there"""
+        key = (str(Path(output).resolve()), sync)
+        with self._lock:
+            if key not in self._engines:
+                self._engines[key] = DownloadEngine(
+                    workers=self.download_workers, per_host=self.per_host, delay=self.delay,
+                    sync=SyncState(output) if sync else None,
+                    manifest=Manifest(output),
+                    rate_control=self.control)
+            return self._engines[key]
+
+    def submit(self, kind, params):
+        """Queue a job and return it"""
+        job = Job(kind, params)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._forget_finished()
+        self._queue.put(job)
+        metrics.count('jobs_submitted')
+        return job
+
+    def snapshot(self):
+        """Every known job, copied under the lock submissions take"""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        """Stop a job: a queued job never starts, a running download stops discovering"""
+        job = self.jobs.get(job_id)
+        if job is not None and not job.done.is_set():
+            job.cancelled = True
+        return job
+
+    def _loop(self, worker):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled:
+                job.finish('cancelled')
+                continue
+            job.status = 'running'
+            job.started = time.time()
+            print(f"⏳ Job {job.id} ({job.kind}) on worker {worker.number}: {job.params}")
+            try:
+                with metrics.phase(f'job_{job.kind}'):
+                    result = worker.run(job)
+            except Exception as e:
+                metrics.count('jobs_failed')
+                job.finish('failed', error=str(e))
+                print(f"✗ Job {job.id} failed: {e}")
+            else:
+                job.finish('cancelled' if job.cancelled else 'done', result=result)
+                print(f"✓ Job {job.id} {job.status} in {job.finished - job.started:.2f}s")
+            finally:
+                worker.jobs_run += 1
+
+    def health(self):
+        counts = {}
+        for job in self.snapshot():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {'uptime': round(time.time() - self.started, 3), 'backend': self.backend,
+                'workers': [{'number': w.number, 'jobs': w.jobs_run,
+                             'browser_starts': w.session.starts} for w in self.workers],
+                'jobs': counts, 'queued': self._queue.qsize(),
+                'connections': http_session.describe_stats(),
+                'catalog': self.cache.describe_stats() if self.cache else None}
+
+    def stop(self):
+        """Cancel queued jobs, finish the running ones, then close the browsers, manifests and cache"""
+        for job in self.snapshot():
+            if job.status == 'queued':
+                job.cancelled = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        for worker in self.workers:
+            worker.close()
+        for engine in self._engines.values():
+            engine.manifest.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of a ScraperDaemon
+
+        POST   /jobs           {"kind": ..., "params": {...}, "wait": false}
+        GET    /jobs           every job, newest first
+        GET    /jobs/<id>      one job with its progress and result
+        DELETE /jobs/<id>      cancel a job
+        GET    /health         workers, queue and connection pool
+        GET    /metrics        phase timings and counters (Prometheus text)
+        POST   /shutdown       stop the daemon after the running jobs
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # client_address is empty on a Unix socket; access lines only with --verbose
+        if self.server.verbose:
+            sys.stderr.write(f"{self.command} {self.path} {args[1] if len(args) > 1 else ''}\n")
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job(self):
+        job = self.server.daemon.jobs.get(self.path.rstrip('/').rsplit('/', 1)[-1])
+        if job is None:
+            self._send(404, {'error': 'no such job'})
+        return job
+
+    def do_GET(self):
+        daemon = self.server.daemon
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/jobs':
+            jobs = sorted(daemon.snapshot(), key=lambda j: -int(j.id))
+            self._send(200, [job.as_dict() for job in jobs])
+        elif path.startswith('/jobs/'):
+            job = self._job()
+            if job is not None:
+                self._send(200, job.as_dict())
+        elif path == '/health':
+            self._send(200, daemon.health())
+        elif path == '/metrics':
+            self._send(200, metrics.get_metrics().to_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f'unknown path {path}'})
+
+    def do_POST(self):
+        daemon = self.server.daemon
+        path = self.path.rstrip('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send(400, {'error': 'body is not JSON'})
+            return
+
+        if path == '/shutdown':
+            self._send(200, {'status': 'stopping'})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif path == '/jobs':
+            try:
+                job = daemon.submit(body.get('kind'), body.get('params') or {})
+            except JobError as e:
+                self._send(400, {'error': str(e)})
+                return
+            if body.get('wait'):
+                job.done.wait(body.get('timeout'))
+            self._send(200 if job.done.is_set() else 202, job.as_dict())
+        else:
+            self._send(404, {'error': f'unknown path {path}'})
+
+    def do_DELETE(self):
+        if not self.path.startswith('/jobs/'):
+            self._send(404, {'error': f'unknown path {self.path}'})
+            return
+        job = self._job()
+        if job is not None:
+            self.server.daemon.cancel(job.id)
+            self._send(200, job.as_dict())
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer's counterpart on a Unix socket"""
+
+    daemon_threads = True
+
+
+def create_server(daemon, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, verbose=False):
+    """HTTP server for daemon on host:port, or on a Unix socket when socket_path is set"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, DaemonRequestHandler)
+        os.chmod(socket_path, 0o600)
+    else:
+        server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.daemon = daemon
+    server.verbose = verbose
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """http.client connection over a Unix socket"""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def call(method, path, body=None, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None,
+         timeout=None):
+    """
+    Send one request to a running daemon
+
+    Returns:
+        (HTTP status, decoded JSON body or text)
+    """
+    if socket_path:
+        connection = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        connection.request(method, path, body=data, headers=headers)
+        response = connection.getresponse()
+        text = response.read().decode()
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            return response.status, json.loads(text)
+        return response.status, text
+    finally:
+        connection.close()
+
+
+def describe_job(job):
+    """One-line summary of a job dict"""
+    progress = job['progress']
+    parts = [f"Job {job['id']} {job['kind']} {job['status']}"]
+    if job['kind'] == 'download':
+        finished = sum(progress.get(status, 0) for status in STATUSES)
+        parts.append(f"{finished}/{progress['discovered']} file(s), "
+                     f"{progress['bytes'] / (1024 * 1024):.1f} MB, {progress.get('failed', 0)} failed")
+    if 'seconds' in job:
+        parts.append(f"{job['seconds']:.2f}s")
+    return ', '.join(parts)
+
+
+def serve(args):
+    http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+    metrics.start_export(args)
+    control = None
+    if args.adaptive:
+        control = rate_control.AIMDController(
+            initial_concurrency=args.per_host, max_concurrency=args.download_workers,
+            initial_rate=1.0 / args.delay if args.delay > 0 else rate_control.DEFAULT_MAX_RATE)
+    daemon = ScraperDaemon(url=args.url, backend=args.backend, workers=args.workers,
+                           output=args.output, cache_path=None if args.no_cache else args.cache,
+                           wait_timeout=args.wait_timeout, page_ttl=args.page_ttl,
+                           download_workers=args.download_workers, per_host=args.per_host,
+                           delay=args.delay, control=control, queue_size=args.queue_size)
+    server = create_server(daemon, args.host, args.port, args.socket, args.verbose)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Scraper daemon for {args.url}")
+    print(f"Backend: {args.backend}, {args.workers} worker(s), output: {args.output}")
+    print("="*60)
+    daemon.start(warm=not args.no_warm, warm_browser=args.warm_browser)
+    print(f"✓ Listening on {where}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n⏳ Stopping after the running jobs (queued jobs are cancelled)...")
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        daemon.stop()
+        print(f"✓ Connections: {http_session.describe_stats()}")
+        metrics.finish()
+
+
+def submit(args):
+    params = {name: getattr(args, name) for name in
+              ('cert', 'subject', 'year', 'year_range', 'type', 'language', 'output')
+              if getattr(args, name) is not None}
+    if args.sync:
+        params['sync'] = True
+    start = time.perf_counter()
+    status, job = call('POST', '/jobs', {'kind': args.kind, 'params': params, 'wait': args.wait},
+                       args.host, args.port, args.socket)
+    if status >= 400:
+        print(f"✗ {job.get('error', job)}")
+        return 1
+    print(f"{'✓' if job['status'] == 'done' else '⏳'} {describe_job(job)}")
+    if args.wait:
+        if 'result' in job:
+            print(json.dumps(job['result'], indent=2))
+        if 'error' in job:
+            print(f"✗ {job['error']}")
+        print(f"  (answered in {time.perf_counter() - start:.3f}s)")
+    return 0 if job['status'] in ('done', 'queued', 'running') else 1
+
+
+def status(args):
+    path = f"/jobs/{args.job_id}" if args.job_id else '/jobs'
+    code, body = call('GET', path, host=args.host, port=args.port, socket_path=args.socket)
+    if code >= 400:
+        print(f"✗ {body.get('error', body)}")
+        return 1
+    for job in body if isinstance(body, list) else [body]:
+        print(describe_job(job))
+        if args.job_id and 'result' in job:
+            print(json.dumps(job['result'], indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Keep warm scraper workers running and take jobs over a local API'
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on or connect to (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', help='Use this Unix socket instead of a TCP port')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='Run the daemon')
+    serve_parser.add_argument('--url', default=BASE_URL,
+                              help='Archive page URL (default: the examinations.ie material archive)')
+    serve_parser.add_argument('--backend', choices=BACKENDS, default='auto',
+                              help='Discovery backend: http, selenium, or auto (default)')
+    serve_parser.add_argument('--workers', type=int, default=1,
+                              help='Jobs run at once, each with its own browser session (default: 1)')
+    serve_parser.add_argument('--output', default='downloads',
+                              help='Output directory of download jobs that do not set one (default: downloads)')
+    add_engine_arguments(serve_parser, workers_option='--download-workers', scope={
+        '--download-workers': 'per job',
+        '--per-host': 'across all jobs',
+        '--delay': 'across all jobs',
+    })
+    rate_control.add_adaptive_argument(serve_parser)
+    serve_parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                              help=f'Discovered files allowed to wait for a download worker (default: {DEFAULT_QUEUE_SIZE})')
+    serve_parser.add_argument('--wait-timeout', type=float, default=10.0,
+                              help='Maximum seconds to wait for each dropdown update (default: 10)')
+    serve_parser.add_argument('--page-ttl', type=float, default=600,
+                              help='Seconds a worker reuses loaded archive pages (default: 600)')
+    serve_parser.add_argument('--cache', default=str(CACHE_PATH),
+                              help=f'Catalog cache file shared by the workers (default: {CACHE_PATH})')
+    serve_parser.add_argument('--no-cache', action='store_true',
+                              help='Do not read or write the catalog cache')
+    serve_parser.add_argument('--no-warm', action='store_true',
+                              help='Do not load the archive page before the first job')
+    serve_parser.add_argument('--warm-browser', action='store_true',
+                              help='Also start Chrome at startup when the backend only falls back to it')
+    serve_parser.add_argument('--verbose', action='store_true', help='Log every API request')
+    metrics.add_metrics_arguments(serve_parser)
+
+    submit_parser = commands.add_parser('submit', help='Queue a job on a running daemon')
+    submit_parser.add_argument('kind', choices=KINDS)
+    submit_parser.add_argument('--cert', choices=['lc', 'jc', 'lca'], required=True)
+    submit_parser.add_argument('--subject', help='Subject name (download: default every subject)')
+    submit_parser.add_argument('--year', help='Year (required for subjects)')
+    submit_parser.add_argument('--year-range', help='Year range for downloads (e.g. 2020-2024)')
+    submit_parser.add_argument('--type', choices=MATERIAL_TYPES, help='Material type (default: exampapers)')
+    submit_parser.add_argument('--language', help='Language versions for downloads (default: EV,BV)')
+    submit_parser.add_argument('--output', help="Output directory (default: the daemon's)")
+    submit_parser.add_argument('--sync', action='store_true',
+                               help='Re-check existing files with conditional requests')
+    submit_parser.add_argument('--wait', action='store_true',
+                               help='Wait for the job to finish and print its result')
+
+    status_parser = commands.add_parser('status', help='Show one job or every job')
+    status_parser.add_argument('job_id', nargs='?')
+
+    commands.add_parser('stop', help='Stop the daemon after its running jobs, cancelling queued ones')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args)
+        return 0
+    try:
+        if args.command == 'submit':
+            return submit(args)
+        if args.command == 'status':
+            return status(args)
+        call('POST', '/shutdown', {}, args.host, args.port, args.socket)
+        print("✓ Daemon stopping")
+        return 0
+    except OSError as e:
+        print(f"✗ Cannot reach the daemon at {args.socket or f'{args.host}:{args.port}'}: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
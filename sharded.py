@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Sharded downloader
+Splits the examination x year x subject x material type grid across worker
+processes, each with its own browser, discovery backend and download engine
+Structure: Examination/Subject/Level/YEAR_filename.pdf
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import util
+from pathlib import Path
+import http_session
+import stream_writer
+import tracing
+from rate_control import AIMDController, DEFAULT_MAX_RATE, add_adaptive_argument
+from download_engine import DownloadEngine, add_engine_arguments
+from download_exams_v2 import EnhancedExamScraper
+from sync_state import SyncState
+from object_store import ObjectStore, add_store_argument
+from manifest import Manifest
+from browser_session import BrowserSession
+from archive_client import BACKENDS, open_archive
+from catalog_cache import add_cache_arguments, wrap_archive
+from availability_matrix import MATERIAL_TYPES, TYPE_TAGS
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+BASE_URL = 'https://www.examinations.ie/exammaterialarchive/?i=91.97.108.95.95.104'
+
+CERTS = ['lc', 'jc', 'lca']
+
+# Lock files that stop two processes writing the same path, inside the output
+LOCK_DIR = '.locks'
+
+STATUSES = ['downloaded', 'updated', 'unchanged', 'exists', 'failed']
+
+
+def _split(value, choices):
+    """Comma-separated list, or every choice for 'all'"""
+    if value.lower() == 'all':
+        return list(choices)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def build_grid(archive, material_types, certs, years=None, subject=None):
+    """
+    List every (material type, year, cert, subject value, subject text) to fetch
+
+    Args:
+        archive: Discovery backend, ideally cached
+        material_types: ViewType values
+        certs: Examination values
+        years: Years to include (default: every year the archive lists)
+        subject: Case-insensitive substring of the subject name or value
+                 (default: every subject)
+    """
+    grid = []
+    for material_type in material_types:
+        selections = {VIEW_TYPE_SELECT: material_type}
+        if years is None:
+            type_years = [value for value, _ in archive.get_options(selections, YEAR_SELECT)]
+        else:
+            type_years = years
+
+        for year in type_years:
+            year_selections = dict(selections, **{YEAR_SELECT: str(year)})
+            for cert in certs:
+                cert_selections = dict(year_selections, **{EXAMINATION_SELECT: cert})
+                try:
+                    subjects = archive.get_options(cert_selections, SUBJECT_SELECT)
+                except Exception as e:
+                    print(f"  ✗ {material_type} {year} {cert.upper()}: Error - {e}")
+                    continue
+                for value, text in subjects:
+                    if subject and subject.lower() not in text.lower() and subject.lower() not in value.lower():
+                        continue
+                    grid.append((material_type, str(year), cert, value, text))
+    return grid
+
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(args, shards, output):
+    """Start one shard: its own browser session, discovery backend and engine"""
+    http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+    session = BrowserSession(wait_timeout=args.wait_timeout)
+    archive = wrap_archive(open_archive(args.backend, args.url, session), args)
+    # The polite interval is shared by every shard: each one starts requests
+    # to a host shards times less often so their sum stays at --delay
+    delay = args.delay * shards
+    control = None
+    if args.adaptive:
+        # Each shard adapts on its own, so each may only reach its share of the maximum rate
+        control = AIMDController(initial_concurrency=args.per_host, max_concurrency=args.workers,
+                                 initial_rate=1.0 / delay if delay > 0 else DEFAULT_MAX_RATE / shards,
+                                 max_rate=DEFAULT_MAX_RATE / shards)
+    engine = DownloadEngine(workers=args.workers, per_host=args.per_host,
+                            delay=delay,
+                            sync=SyncState(args.output) if args.sync else None,
+                            store=ObjectStore(args.store) if args.store else None,
+                            manifest=Manifest(args.output),
+                            lock_dir=Path(args.output) / LOCK_DIR,
+                            rate_control=control,
+                            writer=stream_writer.from_args(args))
+    profiler = None
+    if args.trace:
+        tracing.enable()
+    if args.profile:
+        profiler = tracing.ThreadProfiler()
+        profiler.start()
+    _worker.update(args=args, output=output, session=session, archive=archive, engine=engine,
+                   profiler=profiler)
+    # Pool workers skip atexit handlers but run multiprocessing finalizers
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    _worker['archive'].close()
+    _worker['session'].close()
+    _worker['engine'].manifest.close()
+    if _worker['profiler'] is not None:
+        # One statistics file per shard, next to the parent's
+        _worker['profiler'].stop(f"{_worker['args'].profile}.{os.getpid()}")
+
+
+def _run_task(task):
+    """
+    Discover and download one grid cell in a worker process
+
+    Returns:
+        (task, counts per status plus 'bytes', error message or None,
+         trace events recorded for it)
+    """
+    material_type, year, cert, subject_value, subject_text = task
+    args = _worker['args']
+    output = _worker['output']
+    # Several types share each level folder, told apart by filename prefixes
+    multi_type = len(args.material_types) > 1
+
+    counts = dict.fromkeys(STATUSES, 0)
+    counts['bytes'] = 0
+    try:
+        scraper = EnhancedExamScraper(
+            args.url,
+            output,
+            year,
+            cert,
+            subject_text.replace('/', '_'),
+            language_filter=args.language_filter,
+            session=_worker['session'],
+            archive=_worker['archive'],
+            engine=_worker['engine'],
+            type_tag=TYPE_TAGS[material_type] if multi_type else None
+        )
+        selections = {
+            VIEW_TYPE_SELECT: material_type,
+            YEAR_SELECT: year,
+            EXAMINATION_SELECT: cert,
+            SUBJECT_SELECT: subject_value,
+        }
+        with tracing.span(f"{cert.upper()} {year} {subject_text}", 'task',
+                          material_type=material_type):
+            jobs = scraper.discover_jobs(selections)
+            report = _worker['engine'].run(jobs)
+    except Exception as e:
+        return task, counts, str(e), tracing.get_tracer().drain()
+
+    for status in STATUSES:
+        counts[status] = report.count(status)
+    counts['bytes'] = report.bytes
+    return task, counts, None, tracing.get_tracer().drain()
+
+
+def run_sharded(args, grid, shards):
+    """
+    Process every grid cell on a pool of shards worker processes
+
+    Returns:
+        (totals per status plus 'bytes', list of (task, error))
+    """
+    totals = dict.fromkeys(STATUSES, 0)
+    totals['bytes'] = 0
+    errors = []
+
+    # spawn: workers must not inherit the parent's browser or open sockets
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=shards, initializer=_init_worker,
+                      initargs=(args, shards, args.output)) as pool:
+        for done, (task, counts, error, events) in enumerate(pool.imap_unordered(_run_task, grid), 1):
+            tracing.get_tracer().add_events(events)
+            material_type, year, cert, _, subject_text = task
+            if error:
+                errors.append((task, error))
+                print(f"[{done}/{len(grid)}] ✗ {cert.upper()} {year} {subject_text} ({material_type}): {error}")
+            else:
+                print(f"[{done}/{len(grid)}] ✓ {cert.upper()} {year} {subject_text} ({material_type}): "
+                      f"{counts['downloaded']} downloaded, {counts['exists']} already present, "
+                      f"{counts['failed']} failed")
+            for key in totals:
+                totals[key] += counts[key]
+        pool.close()
+        pool.join()
+
+    return totals, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Download exam materials for many examinations, years and subjects in parallel processes'
+    )
+    parser.add_argument(
+        '--cert',
+        default='all',
+        help='Comma-separated examinations (lc, jc, lca) or "all" (default: all)'
+    )
+    parser.add_argument(
+        '--subject',
+        help='Subject name or value to include (partial match, default: every subject)'
+    )
+    parser.add_argument(
+        '--year-range',
+        help='Year range, e.g. 2015-2024 (default: every year in the archive)'
+    )
+    parser.add_argument(
+        '--type',
+        default='exampapers',
+        help='Comma-separated material types or "all" (default: exampapers)'
+    )
+    parser.add_argument(
+        '--output',
+        default='downloads',
+        help='Output base directory (default: downloads)'
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=os.cpu_count(),
+        help=f'Worker processes, each with its own browser (default: {os.cpu_count()}, one per CPU)'
+    )
+    add_engine_arguments(parser, workers=2, pool_size=4, scope={
+        '--workers': 'per shard',
+        '--pool-size': 'per shard',
+        '--per-host': 'per shard',
+        '--delay': 'across all shards',
+    })
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Re-check files that already exist with conditional requests and refresh any that changed'
+    )
+    add_store_argument(parser)
+    add_adaptive_argument(parser)
+    stream_writer.add_writer_arguments(parser)
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default='auto',
+        help='Discovery backend: http, selenium, or auto (default)'
+    )
+    parser.add_argument(
+        '--wait-timeout',
+        type=float,
+        default=10.0,
+        help='Maximum seconds to wait for each dropdown update (default: 10)'
+    )
+    parser.add_argument(
+        '--language',
+        default='EV,BV',
+        help='Language codes to download: EV (English), IV (Irish), BV (Bilingual), or "all" (default: EV,BV)'
+    )
+    parser.add_argument(
+        '--url',
+        default=BASE_URL,
+        help='Archive page URL'
+    )
+    add_cache_arguments(parser)
+    tracing.add_trace_arguments(parser)
+
+    args = parser.parse_args()
+    tracing.start(args)
+
+    args.material_types = _split(args.type, MATERIAL_TYPES)
+    certs = _split(args.cert, CERTS)
+    years = None
+    if args.year_range:
+        start, end = args.year_range.split('-')
+        years = [str(y) for y in range(int(start), int(end) + 1)]
+    if args.language.lower() == 'all':
+        args.language_filter = None
+    else:
+        args.language_filter = [lang.strip().upper() for lang in args.language.split(',')]
+
+    print("Building work grid...")
+    with BrowserSession(wait_timeout=args.wait_timeout) as session:
+        archive = wrap_archive(open_archive(args.backend, args.url, session), args)
+        try:
+            grid = build_grid(archive, args.material_types, certs, years, args.subject)
+        finally:
+            archive.close()
+
+    if not grid:
+        print("✗ Nothing to download")
+        return
+
+    shards = max(1, min(args.shards, len(grid)))
+    print(f"✓ {len(grid)} examination/year/subject/type combination(s) across {shards} process(es)")
+    print("="*60)
+
+    start = time.perf_counter()
+    totals, errors = run_sharded(args, grid, shards)
+    elapsed = time.perf_counter() - start
+
+    mb = totals['bytes'] / (1024 * 1024)
+    print("\n" + "="*60)
+    print(f"✓ Complete! {len(grid) - len(errors)}/{len(grid)} combination(s) in {elapsed:.1f}s "
+          f"({len(grid) / elapsed * 60:.1f}/min)")
+    print(f"✓ Downloads: {totals['downloaded']} downloaded, {totals['exists']} already present, "
+          f"{totals['failed']} failed - {mb:.1f} MB")
+    if args.sync:
+        print(f"✓ Sync: {totals['unchanged']} unchanged, {totals['updated']} updated, "
+              f"{totals['downloaded']} new")
+    print(f"✓ Files saved to: {args.output}")
+    tracing.finish()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Streaming file writer
+Copies a response body to disk through one large reusable buffer per thread,
+preallocating the file from Content-Length, hashing as it goes and making
+finished files durable with batched fsyncs
+"""
+
+import argparse
+import os
+import threading
+
+
+# Bytes read per call. writer_benchmark.py found 1 MB no faster than this
+# and slower for typical few-hundred-KB papers
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+# Bytes kept from each end of the file for checks such as the PDF markers
+DEFAULT_WINDOW = 1024
+
+
+class StreamResult:
+    """What StreamWriter.write saw of one body"""
+
+    def __init__(self, written, head, tail, stopped=False):
+        self.written = written  # bytes written by this call
+        self.head = head        # first window bytes of the whole file
+        self.tail = tail        # last window bytes written by this call
+        self.stopped = stopped  # check_head rejected the body and writing stopped
+
+
+class FsyncBatcher:
+    """
+    Makes finished files durable in batches instead of one fsync per file
+
+    A file is added once it has been renamed into place; every batch files
+    (and on flush) each one and then each of their directories is fsynced,
+    so a crash loses at most the last batch rather than leaving empty or
+    half-written files behind.
+    """
+
+    def __init__(self, batch=32):
+        """
+        Args:
+            batch: Files collected before they are synced together
+        """
+        self.batch = max(1, batch)
+        self.files_synced = 0
+        self.flushes = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, path):
+        with self._lock:
+            self._pending.append(path)
+            if len(self._pending) < self.batch:
+                return
+            pending, self._pending = self._pending, []
+        self._sync(pending)
+
+    def flush(self):
+        """Sync every file added so far"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._sync(pending)
+
+    def _sync(self, paths):
+        directories = set()
+        for path in paths:
+            _fsync_path(path)
+            directories.add(os.path.dirname(os.path.abspath(path)))
+        for directory in directories:
+            _fsync_path(directory)
+        with self._lock:
+            self.files_synced += len(paths)
+            self.flushes += 1
+
+    def describe_stats(self):
+        return f"{self.files_synced} file(s) synced in {self.flushes} batch(es)"
+
+
+def _fsync_path(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Directories cannot be fsynced on some platforms
+        pass
+    finally:
+        os.close(fd)
+
+
+class StreamWriter:
+    """
+    Writes streamed bodies to files
+
+    Each thread reads into its own preallocated bytearray with readinto(),
+    so a file takes an eighth of the reads and writes of 8 KB chunks.
+    urllib3's readinto() still reads each chunk into a temporary bytes
+    object and copies it into the buffer.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, preallocate=True, fsync=None,
+                 window=DEFAULT_WINDOW):
+        """
+        Args:
+            buffer_size: Bytes read per call
+            preallocate: Reserve the expected size on disk before writing
+                         (posix_fallocate), so the file is laid out in one go
+            fsync: FsyncBatcher that finished files are handed to (None = no fsync)
+            window: Bytes kept from each end of the file (StreamResult.head/tail)
+        """
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate and hasattr(os, 'posix_fallocate')
+        self.fsync = fsync
+        self.window = window
+        self._local = threading.local()
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(self.buffer_size)
+        return buffer
+
+    def write(self, source, path, offset=0, expected=None, digest=None, head=b'', check_head=None):
+        """
+        Stream source into path
+
+        Args:
+            source: Readable with readinto(), such as a requests response's .raw
+            path: File to write. With an offset, the bytes before it are kept
+                  and writing continues there (a resumed download)
+            offset: Bytes of path to keep
+            expected: Size path will have once complete, if known; used to
+                      preallocate it
+            digest: hashlib object updated with every byte written
+            head: First bytes of the part already on disk (when resuming)
+            check_head: Called with the first window bytes once they are in;
+                        returning False stops without writing any more
+
+        Returns:
+            StreamResult
+        """
+        buffer = self._buffer()
+        view = memoryview(buffer)
+        window = self.window
+        tail = b''
+        written = 0
+        stopped = False
+
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | (0 if offset else os.O_TRUNC), 0o644)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            preallocated = False
+            if self.preallocate and expected and expected > offset:
+                try:
+                    os.posix_fallocate(fd, offset, expected - offset)
+                    preallocated = True
+                except OSError:
+                    pass
+
+            try:
+                while True:
+                    count = source.readinto(buffer)
+                    if not count:
+                        break
+                    chunk = view[:count]
+                    if len(head) < window:
+                        head += bytes(chunk[:window - len(head)])
+                        if len(head) >= window and check_head is not None and not check_head(head):
+                            stopped = True
+                            break
+                    _write_all(fd, chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    if count >= window:
+                        tail = bytes(chunk[count - window:count])
+                    else:
+                        tail = (tail + bytes(chunk))[-window:]
+                    written += count
+            finally:
+                if preallocated:
+                    # Drop the reserved space that was not filled, so a partial
+                    # file has its true size and can be resumed
+                    os.ftruncate(fd, offset + written)
+        finally:
+            os.close(fd)
+
+        return StreamResult(written, head, tail, stopped)
+
+    def finished(self, path):
+        """Hand a file that has been renamed into place to the fsync batcher"""
+        if self.fsync is not None:
+            self.fsync.add(path)
+
+    def flush(self):
+        if self.fsync is not None:
+            self.fsync.flush()
+
+
+def _write_all(fd, data):
+    while data:
+        count = os.write(fd, data)
+        data = data[count:]
+
+
+def buffer_kb_arg(value):
+    """argparse type for --write-buffer: a whole number of KB, at least 1"""
+    try:
+        kb = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid buffer size '{value}'")
+    if kb < 1:
+        raise argparse.ArgumentTypeError(f"buffer size must be at least 1 KB, got {kb}")
+    return kb
+
+
+def add_writer_arguments(parser):
+    """Add the --write-buffer/--fsync-batch options to an argparse parser"""
+    parser.add_argument(
+        '--write-buffer',
+        type=buffer_kb_arg,
+        default=DEFAULT_BUFFER_SIZE // 1024,
+        help=f'KB read and written at a time per download, at least 1 '
+             f'(default: {DEFAULT_BUFFER_SIZE // 1024})'
+    )
+    parser.add_argument(
+        '--fsync-batch',
+        type=int,
+        default=0,
+        help='Make downloaded files durable with one fsync pass per this many files '
+             '(default: 0, leave it to the operating system)'
+    )
+
+
+def from_args(args):
+    """StreamWriter configured from add_writer_arguments options"""
+    fsync = FsyncBatcher(args.fsync_batch) if args.fsync_batch > 0 else None
+    return StreamWriter(buffer_size=args.write_buffer * 1024, fsync=fsync)
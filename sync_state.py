@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+HTTP validators of downloaded PDFs for incremental sync
+Remembers each file's ETag, Last-Modified and Content-Length so re-runs
+can ask the server whether it changed instead of re-downloading it
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+FILENAME = '.sync_state.sqlite'
+
+
+class SyncState:
+    """SQLite store of HTTP validators keyed by local file path"""
+
+    def __init__(self, output_dir):
+        """
+        Args:
+            output_dir: Download root; the state file is kept inside it
+        """
+        self.root = Path(output_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / FILENAME
+
+        self._lock = threading.Lock()
+        # Sharded runs write from several processes; wait for their locks
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_length INTEGER,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _key(path):
+        return str(Path(path).resolve())
+
+    def get(self, path):
+        """Stored validators for path as a dict, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, etag, last_modified, content_length FROM files WHERE path = ?",
+                (self._key(path),)).fetchone()
+        if row is None:
+            return None
+        url, etag, last_modified, content_length = row
+        return {'url': url, 'etag': etag, 'last_modified': last_modified,
+                'content_length': content_length}
+
+    def record(self, path, url, headers):
+        """Store the validators from a response's headers"""
+        length = headers.get('Content-Length')
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, url, etag, last_modified, content_length, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(path), url, headers.get('ETag'), headers.get('Last-Modified'),
+                 int(length) if length and length.isdigit() else None, time.time()))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def conditional_headers(state):
+    """If-None-Match / If-Modified-Since headers for stored validators"""
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    return headers
+
+
+def unchanged(state, headers):
+    """
+    Whether a 200 response describes the same file as the stored validators
+
+    Used when a server ignores conditional headers but still sends validators.
+    """
+    etag = headers.get('ETag')
+    if etag and state.get('etag'):
+        return etag == state['etag']
+    last_modified = headers.get('Last-Modified')
+    length = headers.get('Content-Length')
+    if last_modified and state.get('last_modified') and length and state.get('content_length'):
+        return (last_modified == state['last_modified']
+                and int(length) == state['content_length'])
+    return False
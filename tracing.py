@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Trace spans and profiling
+Records nested spans (year, subject, dropdown step, PDF fetch) with their
+process and thread, saved as Chrome trace-event JSON that chrome://tracing
+or https://ui.perfetto.dev can show, and optionally a cProfile dump of every
+thread
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+
+class Tracer:
+    """
+    Collects complete ('X') trace events
+
+    Spans on the same thread nest by time, so a viewer draws a subject span
+    under its year span and a dropdown wait under its subject.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._threads = {}  # native thread id -> name
+        self._lock = threading.Lock()
+        # perf_counter for precise durations, anchored to wall time so that
+        # spans from several processes line up
+        self._origin = time.time() - time.perf_counter()
+
+    def _now_us(self):
+        return (self._origin + time.perf_counter()) * 1_000_000
+
+    @contextlib.contextmanager
+    def span(self, name, category='run', **args):
+        """
+        Record the enclosed block as one span
+
+        Yields:
+            Dict of arguments shown with the span; values added inside the
+            block (e.g. the outcome) are recorded too
+        """
+        if not self.enabled:
+            yield args
+            return
+        start = self._now_us()
+        try:
+            yield args
+        finally:
+            end = self._now_us()
+            thread = threading.current_thread()
+            tid = threading.get_native_id()
+            event = {'name': str(name), 'cat': category, 'ph': 'X', 'ts': round(start, 1),
+                     'dur': round(end - start, 1), 'pid': os.getpid(), 'tid': tid}
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            with self._lock:
+                self.events.append(event)
+                self._threads[tid] = thread.name
+
+    def drain(self):
+        """Remove and return the events recorded so far, with thread name metadata"""
+        with self._lock:
+            events, self.events = self.events, []
+            threads = dict(self._threads)
+        pid = os.getpid()
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                     'args': {'name': name}} for tid, name in threads.items()]
+        return metadata + events
+
+    def add_events(self, events):
+        """Merge events drained in another process"""
+        with self._lock:
+            self.events.extend(events)
+
+    def save(self, path):
+        """Write every recorded event as Chrome trace-event JSON"""
+        events = self.drain()
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len([e for e in events if e['ph'] == 'X'])
+
+
+class ThreadProfiler:
+    """
+    cProfile for every thread
+
+    cProfile only sees the thread that enabled it, so a profile is started
+    in each thread the first time it runs Python code and all of them are
+    merged when saving.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        # Replaces this bootstrap hook for the current thread
+        profile.enable()
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+
+    def stop(self, path):
+        """Stop profiling and write the merged statistics to path"""
+        threading.setprofile(None)
+        with self._lock:
+            profiles = list(self.profiles)
+        for profile in profiles:
+            profile.disable()
+        stats = None
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # Thread that never ran any profiled code
+                continue
+        if stats is not None:
+            stats.dump_stats(path)
+        return stats
+
+
+# Shared by every module of the process, like metrics
+_tracer = Tracer()
+_trace_path = None
+_profiler = None
+_profile_path = None
+
+
+def get_tracer():
+    return _tracer
+
+
+def span(name, category='run', **args):
+    """Record the enclosed block as a span if tracing is on (a cheap no-op otherwise)"""
+    return _tracer.span(name, category, **args)
+
+
+def enable():
+    """Start recording spans in this process (e.g. a worker of a traced run)"""
+    _tracer.enabled = True
+
+
+def add_trace_arguments(parser):
+    """Add the --trace/--profile options to an argparse parser"""
+    parser.add_argument(
+        '--trace',
+        help='Record spans of every year, subject, dropdown step and download to this '
+             'Chrome trace JSON file (open in chrome://tracing or ui.perfetto.dev)'
+    )
+    parser.add_argument(
+        '--profile',
+        help='Profile the Python code of every thread with cProfile and save the statistics to this file'
+    )
+
+
+def start(args):
+    """Start tracing and profiling as selected by add_trace_arguments options"""
+    global _trace_path, _profiler, _profile_path
+    if args.trace:
+        _trace_path = args.trace
+        enable()
+    if args.profile:
+        _profile_path = args.profile
+        _profiler = ThreadProfiler()
+        _profiler.start()
+
+
+def finish():
+    """Save the trace and profile, if requested, and print where they went"""
+    global _trace_path, _profiler
+    if _profiler is not None:
+        stats = _profiler.stop(_profile_path)
+        print(f"✓ Profile written to {_profile_path} (view with: python -m pstats {_profile_path})")
+        if stats is not None:
+            print("  Top functions by cumulative time:")
+            stats.sort_stats('cumulative').print_stats(10)
+        _profiler = None
+    if _trace_path is not None:
+        spans = _tracer.save(_trace_path)
+        print(f"✓ Trace of {spans} span(s) written to {_trace_path}")
+        _tracer.enabled = False
+        _trace_path = None
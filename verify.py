@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Verify and repair a download tree
+Checks every PDF's header, trailer and recorded size on all CPU cores and
+downloads the ones that fail again from the URLs kept in the manifest
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import http_session
+import rate_control
+from download_engine import DownloadEngine, DownloadJob, PDF_WINDOW, add_engine_arguments, pdf_problem
+from manifest import Manifest, FIELDS
+from object_store import ObjectStore, add_store_argument
+
+
+# Files handed to a worker process at a time; small files are checked in
+# microseconds, so sending them one by one would be dominated by IPC
+BATCH_SIZE = 256
+
+
+def check_file(path, expected_size=None, expected_sha256=None):
+    """
+    Check one file without reading more of it than needed
+
+    Args:
+        path: File to check
+        expected_size: Size recorded in the manifest, if any
+        expected_sha256: Hash recorded in the manifest; only compared when given
+
+    Returns:
+        Description of the problem, or None if the file looks like a complete PDF
+    """
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return 'missing'
+    if size == 0:
+        return 'empty'
+    if expected_size is not None and size != expected_size:
+        return f'size {size}, expected {expected_size}'
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        problem = pdf_problem(data[:PDF_WINDOW], data[-PDF_WINDOW:])
+        if problem is None and expected_sha256 and hashlib.sha256(data).hexdigest() != expected_sha256:
+            problem = 'content differs from the recorded SHA-256'
+    return problem
+
+
+def _check_batch(batch):
+    """Worker entry point: [(path, size, sha256)] -> [(path, problem)] for bad files"""
+    bad = []
+    for path, size, sha256 in batch:
+        problem = check_file(path, size, sha256)
+        if problem:
+            bad.append((path, problem))
+    return bad
+
+
+def collect_targets(output_dir, manifest, check_hash=False):
+    """
+    Files to verify: every manifest entry plus any PDF on disk it does not know
+
+    Returns:
+        List of (path, expected size, expected sha256) tuples
+    """
+    targets = []
+    known = set()
+    for entry in manifest.query():
+        path = str(manifest.full_path(entry['path']))
+        known.add(os.path.abspath(path))
+        targets.append((path, entry['size'], entry['sha256'] if check_hash else None))
+
+    for directory, _, filenames in os.walk(output_dir):
+        for name in filenames:
+            if not name.lower().endswith('.pdf'):
+                continue
+            path = os.path.join(directory, name)
+            if os.path.abspath(path) not in known:
+                targets.append((path, None, None))
+    return targets
+
+
+def verify_tree(output_dir, manifest, workers=None, check_hash=False):
+    """
+    Check every file of a download tree in parallel
+
+    Args:
+        output_dir: Download root
+        manifest: Manifest of the tree
+        workers: Processes to use (default: one per CPU)
+        check_hash: Also re-hash files and compare with the manifest
+
+    Returns:
+        (number of files checked, list of (path, problem) for bad files,
+        number of processes that checked them)
+    """
+    targets = collect_targets(output_dir, manifest, check_hash)
+    batches = [targets[i:i + BATCH_SIZE] for i in range(0, len(targets), BATCH_SIZE)]
+
+    bad = []
+    processes = min(workers or os.cpu_count() or 1, len(batches))
+    if processes <= 1:
+        # A single batch or a single worker is not worth a process pool
+        processes = 1
+        for batch in batches:
+            bad.extend(_check_batch(batch))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for batch_bad in pool.map(_check_batch, batches):
+                bad.extend(batch_bad)
+    return len(targets), sorted(bad), processes
+
+
+def repair_jobs(bad, manifest):
+    """
+    Build replacing DownloadJobs for the bad files the manifest has a URL for
+
+    Those files and their manifest entries are left alone: the engine renames
+    the new copy over the old one and records it only once it is complete, so
+    a failed repair is reported again by the next verify. Files the manifest
+    does not know are deleted, so the next run of the downloader that created
+    them fetches them again.
+    """
+    jobs = []
+    for path, problem in bad:
+        if not manifest.has(path):
+            Path(path).unlink(missing_ok=True)
+            print(f"  ✗ Removed {path} ({problem}); not in the manifest, re-run its downloader")
+            continue
+
+        entry = manifest.entry(path)
+        meta = {field: entry[field] for field in FIELDS
+                if field not in ('path', 'url', 'size', 'sha256', 'fetched_at')}
+        jobs.append(DownloadJob(entry['url'], path, meta=meta, replace=True))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check every PDF in a download directory and re-download corrupt ones'
+    )
+    parser.add_argument(
+        'output',
+        nargs='?',
+        default='downloads',
+        help='Download directory to verify (default: downloads)'
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=os.cpu_count(),
+        help=f'Processes used for checking (default: {os.cpu_count()}, one per CPU)'
+    )
+    parser.add_argument(
+        '--hash',
+        action='store_true',
+        help='Also re-hash every file and compare with the SHA-256 in the manifest (slower)'
+    )
+    parser.add_argument(
+        '--repair',
+        action='store_true',
+        help='Download corrupt files again from the URLs in the manifest, replacing them'
+    )
+    add_engine_arguments(parser, scope={'--workers': 'when repairing'})
+    add_store_argument(parser)
+    rate_control.add_adaptive_argument(parser)
+
+    args = parser.parse_args()
+
+    manifest = Manifest(args.output)
+    start = time.perf_counter()
+    checked, bad, processes = verify_tree(args.output, manifest, args.processes, args.hash)
+    elapsed = time.perf_counter() - start
+
+    for path, problem in bad:
+        print(f"  ✗ {path}: {problem}")
+    print(f"✓ Checked {checked} file(s) in {elapsed:.1f}s on {processes} process(es): "
+          f"{len(bad)} bad")
+
+    if bad and args.repair:
+        jobs = repair_jobs(bad, manifest)
+        if jobs:
+            print(f"\nRe-downloading {len(jobs)} file(s)...")
+            http_session.configure(pool_size=args.pool_size, retry_busy=not args.adaptive)
+            engine = DownloadEngine(workers=args.workers, per_host=args.per_host, delay=args.delay,
+                                    store=ObjectStore(args.store) if args.store else None,
+                                    manifest=manifest,
+                                    rate_control=rate_control.from_args(args))
+            report = engine.run(jobs)
+            print(f"✓ Repair: {report.summary()}")
+            for result in report.failed:
+                print(f"  ✗ Not repaired: {result.job.path} ({result.error})")
+            if report.failed:
+                print("Run verify again to retry them")
+            if args.adaptive:
+                print(f"✓ Rate: {engine.rate_control.describe_stats()}")
+    elif bad:
+        print("Run again with --repair to download them again")
+
+    manifest.close()
+
+
+if __name__ == '__main__':
+    main()
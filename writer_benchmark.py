@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming file writer
+Downloads the same PDFs from a mock archive (in its own process) with the
+old iter_content(8192) loop and with stream_writer.StreamWriter, and reports
+throughput and the CPU time each spends per MB
+"""
+
+import argparse
+import hashlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import http_session
+from archive_client import ArchiveClient
+from stream_writer import DEFAULT_BUFFER_SIZE, FsyncBatcher, StreamWriter, buffer_kb_arg
+from download_engine import PDF_HEADER, PDF_WINDOW
+from cascade_wait import VIEW_TYPE_SELECT, YEAR_SELECT, EXAMINATION_SELECT, SUBJECT_SELECT
+
+
+HERE = Path(__file__).parent
+
+METHODS = ['loop', 'writer', 'writer-fsync-each', 'writer-fsync-batch']
+
+
+def chunk_loop(response, path, digest):
+    """The download loop DownloadEngine used before StreamWriter"""
+    head = tail = b''
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            if len(head) < PDF_WINDOW:
+                head += chunk[:PDF_WINDOW - len(head)]
+                if len(head) >= PDF_WINDOW and PDF_HEADER not in head:
+                    break
+            f.write(chunk)
+            digest.update(chunk)
+            tail = (tail + chunk)[-PDF_WINDOW:]
+            size += len(chunk)
+    return size
+
+
+def make_fetch(method, buffer_kb, batch):
+    """Function saving one response to a path with method, and the writer it uses (if any)"""
+    if method == 'loop':
+        return chunk_loop, None
+
+    fsync = None
+    if method == 'writer-fsync-each':
+        fsync = FsyncBatcher(1)
+    elif method == 'writer-fsync-batch':
+        fsync = FsyncBatcher(batch)
+    writer = StreamWriter(buffer_size=buffer_kb * 1024, fsync=fsync)
+
+    def fetch(response, path, digest):
+        response.raw.decode_content = True
+        length = response.headers.get('Content-Length')
+        result = writer.write(response.raw, path, expected=int(length) if length else None,
+                              digest=digest, check_head=lambda head: PDF_HEADER in head)
+        writer.finished(path)
+        return result.written
+
+    return fetch, writer
+
+
+def run_method(method, urls, directory, args):
+    """Download every URL once with method; returns (wall seconds, CPU seconds, bytes)"""
+    session = http_session.get_session()
+    fetch, writer = make_fetch(method, args.buffer, args.fsync_batch)
+    total = 0
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for i, url in enumerate(urls):
+        path = Path(directory) / f"{method}-{i}.pdf"
+        response = session.get(url, stream=True, timeout=30)
+        try:
+            response.raise_for_status()
+            total += fetch(response, path, hashlib.sha256())
+        finally:
+            response.close()
+    if writer is not None:
+        writer.flush()
+    return time.perf_counter() - wall, time.process_time() - cpu, total
+
+
+def start_mock(args):
+    """Start mock_archive_server.py in a child process and return (process, url)"""
+    command = [sys.executable, '-u', str(HERE / 'mock_archive_server.py'), '--port', '0',
+               '--pdf-size', str(args.pdf_size)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=HERE)
+    line = process.stdout.readline()
+    if 'Mock archive at' not in line:
+        process.kill()
+        raise RuntimeError(f"Mock archive did not start: {line.strip()}")
+    return process, line.split(' at ', 1)[1].strip()
+
+
+def pdf_urls(url, count):
+    """count download URLs from the archive, taken subject by subject"""
+    archive = ArchiveClient(url)
+    selections = {VIEW_TYPE_SELECT: 'exampapers', YEAR_SELECT: '2024', EXAMINATION_SELECT: 'lc'}
+    urls = []
+    for value, _ in archive.get_options(selections, SUBJECT_SELECT):
+        for pdf in archive.find_pdf_links(dict(selections, **{SUBJECT_SELECT: value})):
+            urls.append(pdf['url'])
+            if len(urls) == count:
+                return urls
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the old 8 KB download loop with the streaming file writer'
+    )
+    parser.add_argument('--url', help='Archive to download from (default: a mock archive in a child process)')
+    parser.add_argument('--methods', default=','.join(METHODS),
+                        help=f'Comma-separated methods to compare (default: {",".join(METHODS)})')
+    parser.add_argument('--files', type=int, default=20, help='Files per run (default: 20)')
+    parser.add_argument('--pdf-size', type=int, default=8_000_000,
+                        help='Bytes per mock PDF (default: 8000000)')
+    parser.add_argument('--buffer', type=buffer_kb_arg, default=DEFAULT_BUFFER_SIZE // 1024,
+                        help=f'Writer buffer in KB (default: {DEFAULT_BUFFER_SIZE // 1024})')
+    parser.add_argument('--fsync-batch', type=int, default=32,
+                        help='Files per fsync pass for writer-fsync-batch (default: 32)')
+    parser.add_argument('--repeat', type=int, default=9,
+                        help='Runs of each method; short runs need many for a stable median (default: 9)')
+    parser.add_argument('--dir', help='Directory to write into (default: a temporary directory)')
+
+    args = parser.parse_args()
+
+    methods = [m.strip() for m in args.methods.split(',') if m.strip()]
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        parser.error(f"unknown method(s): {', '.join(unknown)}")
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_mock(args)
+    try:
+        urls = pdf_urls(url, args.files)
+        print(f"Writing {len(urls)} file(s) per run from {url}")
+        print("="*60)
+
+        results = {method: [] for method in methods}
+        if args.dir:
+            Path(args.dir).mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='writer-bench-', dir=args.dir) as directory:
+            for run in range(1, args.repeat + 1):
+                # Alternate the order so no method always runs on a warm page cache
+                order = methods if run % 2 else list(reversed(methods))
+                for method in order:
+                    wall, cpu, size = run_method(method, urls, directory, args)
+                    results[method].append((wall, cpu, size))
+                    print(f"⏳ run {run}/{args.repeat} {method:20s} {wall:6.2f}s")
+                    for name in os.listdir(directory):
+                        os.unlink(os.path.join(directory, name))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print("\n" + "="*60)
+    print(f"{'method':20s} {'wall':>8s} {'MB/s':>8s} {'CPU s/GB':>9s}")
+    for method, runs in results.items():
+        wall = statistics.median(r[0] for r in runs)
+        cpu = statistics.median(r[1] for r in runs)
+        mb = runs[0][2] / (1024 * 1024)
+        print(f"{method:20s} {wall:7.2f}s {mb / wall:8.1f} {cpu / (mb / 1024):9.2f}")
+    print("(medians; CPU time covers the whole process, including the HTTP client)")
+
+
+if __name__ == '__main__':
+    main()